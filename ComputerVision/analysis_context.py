@@ -0,0 +1,139 @@
+"""Decode-once image context shared by the analysis stages of one upload.
+
+The upload is decoded a single time; its BGR pixels, grayscale and the inverted
+adaptive threshold (used by both OCR and contour detection) are computed once
+and written to ``.npy`` memmaps in a scratch folder. Rendered PDF pages add a
+separate, higher-resolution threshold for OCR (see ``rasterize.py``). Stages running in worker
+processes receive a small picklable ``SharedImage`` handle and map the same
+pages read-only, so nothing is copied or recomputed per stage. The model gets
+the encoded bytes when they are small enough, otherwise a compact re-encoding
+of the decoded pixels (see ``model_image.py``); the digest of the encoded
+bytes keys its response cache.
+
+Stage functions also accept a plain file path, in which case they decode it
+themselves (see ``load_views``).
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+MIME_TYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png'}
+
+ImageViews = namedtuple('ImageViews', 'path bgr gray binary ocr_binary')
+
+
+def binarize(gray, dst=None):
+    """Inverted adaptive threshold: dark linework and text become foreground."""
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 5, dst=dst)
+
+
+class SharedImage:
+    """Picklable handle to the memmapped views of an ``AnalysisContext``."""
+
+    def __init__(self, folder, path, ocr_view):
+        self.folder = folder
+        self.path = path  # image file the results refer to (visualization names derive from it)
+        self.ocr_view = ocr_view  # whether OCR has its own, higher-resolution threshold
+
+    def open(self):
+        """Map the views read-only; no pixels are copied."""
+        load = lambda name: np.load(os.path.join(self.folder, f"{name}.npy"), mmap_mode='r')
+        binary = load('binary')
+        return ImageViews(self.path, load('bgr'), load('gray'), binary,
+                          load('ocr_binary') if self.ocr_view else binary)
+
+
+class AnalysisContext:
+    """One decoded upload: shared views for the OCR/OpenCV stages and the digest of its encoded bytes.
+
+    Use as a context manager; the scratch folder holding the views is removed on exit.
+    """
+
+    def __init__(self, image_path, encoded, mime_type, bgr=None, ocr_gray=None, scratch_dir=None):
+        self.image_path = image_path
+        self.encoded = encoded
+        self.mime_type = mime_type
+        self.digest = hashlib.sha256(encoded).hexdigest()
+        if bgr is None:
+            bgr = cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_COLOR)
+            if bgr is None:
+                raise ValueError(f"Could not decode image: {image_path}")
+
+        self.folder = tempfile.mkdtemp(prefix='analysis-', dir=scratch_dir)
+        self.bgr = self._create('bgr', bgr.shape)
+        self.bgr[...] = bgr
+        self.gray = self._create('gray', bgr.shape[:2])
+        cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        self.binary = self._create('binary', bgr.shape[:2])
+        binarize(self.gray, dst=self.binary)
+        self.ocr_binary = self.binary
+        if ocr_gray is not None:
+            self.ocr_binary = self._create('ocr_binary', ocr_gray.shape)
+            binarize(ocr_gray, dst=self.ocr_binary)
+        for view in (self.bgr, self.gray, self.binary, self.ocr_binary):
+            view.flush()
+        self.shared = SharedImage(self.folder, image_path, ocr_gray is not None)
+
+    @classmethod
+    def from_file(cls, image_path, scratch_dir=None):
+        """Context for an uploaded image file."""
+        with open(image_path, 'rb') as f:
+            encoded = f.read()
+        mime_type = MIME_TYPES.get(os.path.splitext(image_path)[1].lower(), 'image/jpeg')
+        return cls(image_path, encoded, mime_type, scratch_dir=scratch_dir)
+
+    @classmethod
+    def from_render(cls, ocr_gray, contour_gray, image_path, scratch_dir=None):
+        """Context for a rendered PDF page: a high-DPI grayscale render for OCR and a lower-DPI one for contours.
+
+        The contour render is encoded once and saved to ``image_path`` for display.
+        """
+        ext = os.path.splitext(image_path)[1].lower()
+        ok, buffer = cv2.imencode(ext, contour_gray)
+        if not ok:
+            raise ValueError(f"Could not encode image as {ext}")
+        encoded = buffer.tobytes()
+        with open(image_path, 'wb') as f:
+            f.write(encoded)
+        bgr = cv2.cvtColor(contour_gray, cv2.COLOR_GRAY2BGR)
+        return cls(image_path, encoded, MIME_TYPES.get(ext, 'image/png'), bgr=bgr, ocr_gray=ocr_gray,
+                   scratch_dir=scratch_dir)
+
+    def views(self):
+        return ImageViews(self.image_path, self.bgr, self.gray, self.binary, self.ocr_binary)
+
+    def _create(self, name, shape):
+        return np.lib.format.open_memmap(os.path.join(self.folder, f"{name}.npy"), mode='w+', dtype=np.uint8,
+                                         shape=shape)
+
+    def close(self):
+        self.bgr = self.gray = self.binary = self.ocr_binary = None
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_views(image):
+    """Views for a stage: mapped from a ``SharedImage`` or an ``AnalysisContext``, or decoded from a file path.
+
+    Returns ``None`` when a path cannot be read.
+    """
+    if isinstance(image, SharedImage):
+        return image.open()
+    if isinstance(image, AnalysisContext):
+        return image.views()
+    bgr = cv2.imread(image)
+    if bgr is None:
+        return None
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    binary = binarize(gray)
+    return ImageViews(image, bgr, gray, binary, binary)
@@ -0,0 +1,112 @@
+"""Server-side store of finished analyses, so the session cookie only carries an ID.
+
+Results (OCR dimensions, OpenCV results, the raw model response) are too large
+for Flask's cookie session, which is sent with every request and response. They
+are stored as JSON in a single SQLite file (WAL mode) under a short analysis ID,
+with the most recently used ones also kept in an in-process LRU, so a lookup is
+a dictionary hit or one primary-key read.
+
+Entries expire ``ttl`` seconds after they were stored. Stored analyses are
+shared between requests: treat them as read-only.
+
+Usage:
+    python analysis_store.py .analysis_store.sqlite            # show the number and size of stored analyses
+    python analysis_store.py .analysis_store.sqlite --clear
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+TTL_SECONDS = 24 * 3600
+LRU_SIZE = 128
+PURGE_INTERVAL = 60  # seconds between deletions of expired entries, done on a put
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created);
+"""
+
+
+class AnalysisStore:
+    """Analyses by ID: an LRU of ``lru_size`` entries in front of a SQLite table (``':memory:'`` for no file)."""
+
+    def __init__(self, path, ttl=TTL_SECONDS, lru_size=LRU_SIZE):
+        self.path = str(path)
+        self.ttl = ttl
+        self.lru_size = lru_size
+        # One connection shared by the request threads, serialized by a lock
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()  # id -> (created, analysis)
+        self._purged = 0.0
+
+    def put(self, analysis_id, analysis):
+        """Store (or replace) an analysis results dict; it must be JSON-serializable."""
+        data = json.dumps(analysis)
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO analyses VALUES (?, ?, ?)", (analysis_id, now, data))
+            self._remember(analysis_id, now, json.loads(data))  # the same plain lists and dicts a read returns
+            if now - self._purged > PURGE_INTERVAL:
+                self._db.execute("DELETE FROM analyses WHERE created < ?", (now - self.ttl,))
+                self._purged = now
+
+    def get(self, analysis_id):
+        """The stored analysis, or ``None`` if it is unknown or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(analysis_id)
+            if entry is None:
+                row = self._db.execute("SELECT created, data FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+                if row is None:
+                    return None
+                entry = self._remember(analysis_id, row[0], json.loads(row[1]))
+            else:
+                self._lru.move_to_end(analysis_id)
+            created, analysis = entry
+            if now - created > self.ttl:
+                del self._lru[analysis_id]
+                self._db.execute("DELETE FROM analyses WHERE id = ?", (analysis_id,))
+                return None
+        return analysis
+
+    def _remember(self, analysis_id, created, analysis):
+        self._lru[analysis_id] = entry = (created, analysis)
+        self._lru.move_to_end(analysis_id)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self._db.execute("DELETE FROM analyses")
+
+    def stats(self):
+        """Number and total JSON size of the stored analyses, and how many are in the LRU."""
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM analyses").fetchone()
+            return {"entries": entries, "bytes": size, "lru_entries": len(self._lru), "lru_size": self.lru_size,
+                    "ttl": self.ttl}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the analysis store.")
+    parser.add_argument("path", help="Store database file")
+    parser.add_argument("--clear", action="store_true", help="Delete all stored analyses")
+    args = parser.parse_args()
+    store = AnalysisStore(args.path)
+    if args.clear:
+        store.clear()
+    for name, value in store.stats().items():
+        print(f"{name}: {value}")
@@ -1,50 +1,32 @@
 import os
 import google.generativeai as genai
-from flask import Flask, request, render_template, flash, redirect, url_for, send_from_directory, session
+from flask import Flask, Response, request, render_template, render_template_string, flash, redirect, url_for, send_from_directory, session, jsonify
 from werkzeug.utils import secure_filename
-from PIL import Image
-from pdf2image import convert_from_path
+from pdf2image import pdfinfo_from_path
 from pdf2image.exceptions import PDFInfoNotInstalledError
 from dotenv import load_dotenv
-import cv2
-import numpy as np
-import pytesseract
-import re
 import time
-import uuid
-import platform
 import json
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from jobs import JobQueue, QUEUED, RUNNING, DONE, FAILED
+from analysis_store import AnalysisStore
+from metrics import Metrics, run_timed
+from storage import UploadStore
+from llm_cache import LLMCache, file_digest
+import ocr_engine
+from stub_model import StubModel
+from analysis_context import AnalysisContext
+import model_image
+from plan_set import analyze_plan_set
+from rasterize import render_dpis, render_page, downsample
+from vision import verify_file_saved, extract_dimensions_with_ocr, find_room_contours, apply_scale_heuristic
 
 # --- Load Environment Variables ---
 load_dotenv()
 
-# --- Configure Tesseract OCR ---
-# Check if running on Windows and set Tesseract path
-if platform.system() == 'Windows':
-    # Try to get path from environment variable first
-    tesseract_path = os.getenv('TESSERACT_PATH')
-    
-    # If not set, use common installation paths
-    if not tesseract_path:
-        common_paths = [
-            r'C:\Program Files\Tesseract-OCR\tesseract.exe',
-            r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
-            r'C:\Tesseract-OCR\tesseract.exe'
-        ]
-        
-        for path in common_paths:
-            if os.path.exists(path):
-                tesseract_path = path
-                break
-    
-    # Set the path if found
-    if tesseract_path:
-        pytesseract.pytesseract.tesseract_cmd = tesseract_path
-        print(f"Tesseract OCR path set to: {tesseract_path}")
-    else:
-        print("WARNING: Tesseract OCR executable not found. OCR functionality may not work.")
-        print("Please set the TESSERACT_PATH environment variable or install Tesseract in a standard location.")
-
 # --- Configuration ---
 # Make sure UPLOAD_FOLDER is correctly defined with an absolute path
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
@@ -60,30 +42,59 @@ if not os.path.exists(UPLOAD_FOLDER):
 else:
     print(f"Upload folder exists at: {UPLOAD_FOLDER}")
 
+# Model name; 'stub' selects an offline stand-in (see stub_model.py) that needs no API key
+LLM_MODEL_NAME = os.getenv('LLM_MODEL', 'gemini-2.0-flash')
+
 # Get Google API key from environment
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-if not GOOGLE_API_KEY:
+if not GOOGLE_API_KEY and LLM_MODEL_NAME != 'stub':
     raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
 
-# Function to verify file exists and log result
-def verify_file_saved(filepath, context=""):
-    if os.path.exists(filepath):
-        file_size = os.path.getsize(filepath)
-        print(f"✓ File verified [{context}]: {filepath} ({file_size} bytes)")
-        return True
-    else:
-        print(f"✗ File NOT found [{context}]: {filepath}")
-        return False
-
 # --- Configure Gemini ---
-genai.configure(api_key=GOOGLE_API_KEY)
-# Use the updated model
-llm_model = genai.GenerativeModel('gemini-2.0-flash')
+if LLM_MODEL_NAME == 'stub':
+    upload_mbps = float(os.getenv('LLM_STUB_UPLOAD_MBPS', '0')) or None
+    llm_model = StubModel(latency=float(os.getenv('LLM_STUB_LATENCY', '0')), upload_mbps=upload_mbps,
+                          chunk_delay=float(os.getenv('LLM_STUB_CHUNK_DELAY', '0')))
+    print("Using the offline stub model instead of Gemini.")
+else:
+    genai.configure(api_key=GOOGLE_API_KEY)
+    # Use the updated model
+    llm_model = genai.GenerativeModel(LLM_MODEL_NAME)
+
+# --- Model Image Payload ---
+# Images within LLM_IMAGE_MAX_KB are sent as uploaded; larger ones are cropped to the drawing, converted
+# (LLM_IMAGE_MODE: gray, bilevel or color), downsampled to LLM_IMAGE_MAX_MEGAPIXELS and re-encoded (see model_image.py)
+LLM_IMAGE_MODE = os.getenv('LLM_IMAGE_MODE', 'gray')
+LLM_IMAGE_MAX_MEGAPIXELS = float(os.getenv('LLM_IMAGE_MAX_MEGAPIXELS', '4'))
+LLM_IMAGE_MAX_KB = int(os.getenv('LLM_IMAGE_MAX_KB', '1024'))
+if LLM_IMAGE_MODE not in model_image.MODES:
+    raise ValueError(f"LLM_IMAGE_MODE must be one of {', '.join(model_image.MODES)}, not '{LLM_IMAGE_MODE}'")
+# Prepared payloads of the most recent images, by image digest: an analysis and its follow-up questions share one
+LLM_PAYLOAD_CACHE_SIZE = int(os.getenv('LLM_PAYLOAD_CACHE_SIZE', '32'))
+_payloads = OrderedDict()
+_payloads_lock = threading.Lock()
+
+# --- Model Response Cache ---
+# Responses keyed by image content, prompt and model; set LLM_CACHE_PATH to an empty string to disable
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.llm_cache.sqlite'))
+LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = int(os.getenv('LLM_CACHE_MAX_MB', '64'))
+# The payload settings change what the model sees, so they are part of the key
+LLM_CACHE_KEY_MODEL = f"{LLM_MODEL_NAME}|{LLM_IMAGE_MODE}|{LLM_IMAGE_MAX_MEGAPIXELS:g}MP|{LLM_IMAGE_MAX_KB}KB"
+llm_cache = LLMCache(LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024, ttl=LLM_CACHE_TTL_SECONDS) if LLM_CACHE_PATH else None
+
+# --- Metrics ---
+# Stage latency histograms and error/cache counters, served in the Prometheus text format at /metrics
+metrics = Metrics()
+metrics.describe('stage_seconds', "Duration of each stage: upload_save, pdf_rasterize, ocr, opencv, llm_payload, llm, "
+                                  "llm_first_chunk, template_render, and whole analyses and plan sets.")
+metrics.describe('errors', "Errors by stage.")
+metrics.describe('llm_cache_requests', "Model response cache lookups by result (hit or miss).")
 
 # --- Flask App Setup ---
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 # 16MB max upload
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', '16')) * 1024 * 1024 # 16MB max upload by default; raise for large plan sets
 # Load secret key from environment variable for security
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'a_default_secret_key_for_dev') 
 if app.secret_key == 'a_default_secret_key_for_dev':
@@ -92,6 +103,66 @@ if app.secret_key == 'a_default_secret_key_for_dev':
 # Session setup for storing analysis results
 app.config['SESSION_TYPE'] = 'filesystem'
 
+# --- Analysis Store ---
+# Finished analyses are kept server-side (SQLite plus an in-process LRU); the session cookie only holds the
+# analysis ID. Set ANALYSIS_STORE_PATH to an empty string to keep them in memory only
+ANALYSIS_STORE_PATH = os.getenv('ANALYSIS_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.analysis_store.sqlite'))
+ANALYSIS_TTL_SECONDS = int(os.getenv('ANALYSIS_TTL_SECONDS', str(24 * 3600)))
+ANALYSIS_LRU_SIZE = int(os.getenv('ANALYSIS_LRU_SIZE', '128'))
+analysis_store = AnalysisStore(ANALYSIS_STORE_PATH or ':memory:', ttl=ANALYSIS_TTL_SECONDS, lru_size=ANALYSIS_LRU_SIZE)
+
+# --- Upload Storage ---
+# Each upload gets its own folder under UPLOAD_FOLDER; a background janitor removes folders unused for
+# UPLOAD_TTL_SECONDS, then the least recently used ones while the uploads take more than UPLOAD_QUOTA_MB
+UPLOAD_TTL_SECONDS = int(os.getenv('UPLOAD_TTL_SECONDS', str(24 * 3600)))
+UPLOAD_QUOTA_MB = int(os.getenv('UPLOAD_QUOTA_MB', '1024'))
+upload_store = UploadStore(UPLOAD_FOLDER, ttl=UPLOAD_TTL_SECONDS, quota_bytes=UPLOAD_QUOTA_MB * 1024 * 1024)
+
+# --- Background Analysis Jobs ---
+# Uploads are analyzed by background workers; clients poll /jobs/<id> for the result
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '4'))
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', '3600'))  # how long finished results stay available
+job_queue = JobQueue(workers=ANALYSIS_WORKERS, ttl=JOB_TTL_SECONDS)
+
+# --- Analysis Stage Pools ---
+# OCR and OpenCV are CPU-bound and run in worker processes; the Gemini call waits on the network and runs in threads
+STAGE_PROCESSES = int(os.getenv('STAGE_PROCESSES', str(os.cpu_count() or 2)))
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '8'))  # also caps concurrent Gemini requests
+llm_pool = ThreadPoolExecutor(max_workers=LLM_CONCURRENCY, thread_name_prefix='llm')
+_cpu_pool = None
+_cpu_pool_lock = threading.Lock()
+
+def cpu_pool():
+    """Process pool for the OCR and OpenCV stages, started on first use.
+
+    Uses 'spawn' so workers do not inherit the threads (and locks) of the running server.
+    """
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is None:
+            _cpu_pool = ProcessPoolExecutor(max_workers=STAGE_PROCESSES,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _cpu_pool
+
+# OCR engine (OCR_ENGINE): checked here, in the server process, so a fallback is reported once at startup
+ocr_engine.check_engine()
+
+# Multi-page PDFs (plan sets): pdftoppm processes per render batch, and sheets rendered ahead of the analysis
+PLAN_SET_RENDER_THREADS = int(os.getenv('PLAN_SET_RENDER_THREADS', '4'))
+PLAN_SET_MAX_IN_FLIGHT = int(os.getenv('PLAN_SET_MAX_IN_FLIGHT', str(2 * STAGE_PROCESSES)))
+
+# PDF rasterization: OCR reads a lossless grayscale render at OCR_DPI (lowered for sheets above
+# OCR_MAX_MEGAPIXELS); contours, the displayed image and the AI estimate use a CONTOUR_DPI downsample
+OCR_DPI = int(os.getenv('OCR_DPI', '300'))
+CONTOUR_DPI = int(os.getenv('CONTOUR_DPI', '100'))
+OCR_MAX_MEGAPIXELS = int(os.getenv('OCR_MAX_MEGAPIXELS', '80'))
+
+# Shown while a browser waits for its analysis; reloads until the result is ready
+PENDING_PAGE = """<!doctype html>
+<html><head><meta http-equiv="refresh" content="2"><title>Analyzing...</title></head>
+<body><p>Analyzing <strong>{{ filename }}</strong> ({{ status }}). This page refreshes automatically.</p></body></html>
+"""
+
 # Make sure static files are served correctly by checking if the static folder exists
 static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
 if not os.path.exists(static_folder):
@@ -108,232 +179,105 @@ def allowed_file(filename):
     """Checks if the file extension is allowed."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def cleanup_old_files(current_files):
-    """Delete old files from the uploads folder except the ones needed for current analysis."""
+def convert_pdf_to_image(pdf_path, output_folder, ocr_dpi, contour_dpi):
+    """Converts the first page of a PDF to a PNG image.
+
+    The page is rendered once, in grayscale at ``ocr_dpi``; the PNG written for display is a
+    ``contour_dpi`` downsample. Returns an ``AnalysisContext`` holding both resolutions.
+    """
     try:
-        for filename in os.listdir(UPLOAD_FOLDER):
-            # Skip current files we need to keep
-            if filename in current_files:
-                continue
-                
-            file_path = os.path.join(UPLOAD_FOLDER, filename)
-            if os.path.isfile(file_path):
-                try:
-                    os.remove(file_path)
-                    print(f"Deleted old file: {filename}")
-                except Exception as e:
-                    print(f"Error deleting {filename}: {e}")
-        print(f"Cleanup complete. Kept files: {current_files}")
+        # Create a unique name for the output image
+        pdf_filename = os.path.basename(pdf_path)
+        image_filename = f"{os.path.splitext(pdf_filename)[0]}.png"
+        image_path = os.path.join(output_folder, image_filename)
+        with metrics.timer('pdf_rasterize'):
+            ocr_gray = render_page(pdf_path, 1, ocr_dpi)
+            # Save the display image (encoded once)
+            context = AnalysisContext.from_render(ocr_gray, downsample(ocr_gray, ocr_dpi, contour_dpi), image_path)
+        print(f"Converted '{pdf_filename}' to '{image_filename}' (OCR at {ocr_dpi} DPI, contours at {contour_dpi} DPI)")
+        return context
+    # Runs in a background worker: no request context to flash into, the message ends up in the job error
+    except PDFInfoNotInstalledError:
+        raise RuntimeError("PDF processing error: Poppler not installed or not in PATH. Please install Poppler.")
     except Exception as e:
-        print(f"Error cleaning uploads folder: {e}")
+        raise RuntimeError(f"Error converting PDF: {e}")
 
-def convert_pdf_to_image(pdf_path, output_folder):
-    """Converts the first page of a PDF to a JPG image."""
+def read_pdf_info(pdf_path):
+    """``pdfinfo`` fields of a PDF (page count, page size, ...)."""
     try:
-        # Convert PDF to a list of PIL images
-        images = convert_from_path(pdf_path, first_page=1, last_page=1, fmt='jpeg')
-        if images:
-            # Create a unique name for the output image
-            pdf_filename = os.path.basename(pdf_path)
-            image_filename = f"{os.path.splitext(pdf_filename)[0]}.jpg"
-            image_path = os.path.join(output_folder, image_filename)
-            # Save the first image
-            images[0].save(image_path, 'JPEG')
-            print(f"Converted '{pdf_filename}' to '{image_filename}'")
-            return image_path
-        else:
-            raise ValueError("Could not extract image from PDF.")
+        return pdfinfo_from_path(pdf_path)
     except PDFInfoNotInstalledError:
-        flash("PDF processing error: Poppler not installed or not in PATH. Please install Poppler.")
-        raise # Re-raise to stop processing
+        raise RuntimeError("PDF processing error: Poppler not installed or not in PATH. Please install Poppler.")
     except Exception as e:
-        flash(f"Error converting PDF: {e}")
-        raise # Re-raise
+        raise RuntimeError(f"Error reading PDF: {e}")
 
-def extract_dimensions_with_ocr(image_path):
-    """Use OCR to extract linear dimensions (meters, feet, inches)."""
-    extracted_dimensions = []
-    try:
-        # Check if Tesseract is properly configured
-        if platform.system() == 'Windows' and not hasattr(pytesseract.pytesseract, 'tesseract_cmd'):
-            print("WARNING: Tesseract OCR path not set. OCR dimension extraction skipped.")
-            return []
-            
-        img = cv2.imread(image_path)
-        if img is None:
-            print(f"Failed to read image for OCR: {image_path}")
-            return []
+def model_payload(image):
+    """Encoding of a file path or an ``AnalysisContext`` for the model: as uploaded if it fits, else compacted."""
+    budget = (int(LLM_IMAGE_MAX_MEGAPIXELS * 1_000_000), LLM_IMAGE_MAX_KB * 1024, LLM_IMAGE_MODE)
+    if isinstance(image, AnalysisContext):
+        # Reuses the bytes and decoded pixels the context already holds
+        payload = model_image.passthrough(image.encoded, budget[1])
+        return payload or model_image.prepare(image.bgr if LLM_IMAGE_MODE == 'color' else image.gray, *budget)
+    return model_image.load(image, *budget)
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        # Experiment with thresholding, maybe adaptive?
-        # _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY_INV)
-        binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 5)
+def image_digest(image):
+    """SHA-256 of the encoded image of a file path or an ``AnalysisContext``."""
+    if isinstance(image, AnalysisContext):
+        return image.digest
+    return llm_cache.image_digest(image) if llm_cache else file_digest(image)
 
-        try:
-            # Use pytesseract, get text
-            # Consider using image_to_data for bounding boxes later if needed
-            text = pytesseract.image_to_string(binary)
-            
-            # --- Regex patterns for linear dimensions --- 
-            # Pattern for meters (e.g., 5.2m, 10 m, 3 meters)
-            meter_pattern = r'(\d+(?:\.\d+)?)\s*(?:m|meters?|metre)s?\b'
-            # Pattern for feet (e.g., 12ft, 15 ft, 20 feet, 10')
-            # Need to be careful not to match inches mark here
-            feet_pattern = r'(\d+(?:\.\d+)?)\s*(?:ft|feet|foot|\'(?!["]))' # Match ' but not "
-            # Pattern for inches (e.g., 6in, 8 inches, 10")
-            inch_pattern = r'(\d+(?:\.\d+)?)\s*(?:in|inch|inches|\")\b' # Use word boundary
-            
-            # Combine patterns and extract
-            # Store as (value, unit, raw_text)
-            for match in re.finditer(meter_pattern, text, re.IGNORECASE):
-                try: extracted_dimensions.append((float(match.group(1)), 'm', match.group(0))) 
-                except ValueError: pass
-            
-            for match in re.finditer(feet_pattern, text, re.IGNORECASE):
-                try: extracted_dimensions.append((float(match.group(1)), 'ft', match.group(0))) 
-                except ValueError: pass
-                
-            for match in re.finditer(inch_pattern, text, re.IGNORECASE):
-                try: extracted_dimensions.append((float(match.group(1)), 'in', match.group(0))) 
-                except ValueError: pass
-                
-            if not extracted_dimensions:
-                print("No linear dimensions (m, ft, in) found with OCR.")
-            else:
-                print(f"Found linear dimensions via OCR: {extracted_dimensions}")
-            
-            return extracted_dimensions
-            
-        except pytesseract.pytesseract.TesseractNotFoundError:
-            print("Tesseract executable not found. OCR dimension extraction skipped.")
-            return []
-            
-    except Exception as e:
-        print(f"OCR dimension extraction error: {e}")
-        return []
+def cached_model_payload(image, digest):
+    """``model_payload`` of an image, prepared once and then reused while it stays among the most recent ones."""
+    with _payloads_lock:
+        payload = _payloads.get(digest)
+        if payload is not None:
+            _payloads.move_to_end(digest)
+            return payload
+    with metrics.timer('llm_payload'):
+        payload = model_payload(image)
+    print(f"Model image: {payload.size[0]}x{payload.size[1]} {payload.mime_type}, {len(payload.data) / 1024:.0f} KB")
+    with _payloads_lock:
+        _payloads[digest] = payload
+        while len(_payloads) > LLM_PAYLOAD_CACHE_SIZE:
+            _payloads.popitem(last=False)
+    return payload
 
-def analyze_with_opencv(image_path, linear_dimensions):
-    """Analyze the floor plan using OpenCV and attempt scale calculation from OCR dimensions."""
-    try:
-        img = cv2.imread(image_path)
-        if img is None:
-            return None
-            
-        visual_img = img.copy()
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        blur = cv2.GaussianBlur(gray, (5, 5), 0)
-        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 5)
-        
-        # Improve contour finding (optional: morphological operations)
-        # kernel = np.ones((3,3),np.uint8)
-        # thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations = 2)
-        
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        min_contour_area = 1000 # Adjust as needed
-        room_contours = [cnt for cnt in contours if cv2.contourArea(cnt) > min_contour_area]
-        
-        if not room_contours:
-            print("OpenCV: No significant contours found.")
-            return {
-                'visual_filename': None, # No visual if no contours
-                'area_pixels': 0,
-                'num_rooms': 0,
-                'scale_used': None,
-                'calculated_area_sqm': None,
-                'calculated_area_sqft': None,
-                'calculation_method': 'No contours found'
-            }
-        
-        # Draw contours
-        cv2.drawContours(visual_img, room_contours, -1, (0, 255, 0), 2)
-        total_area_px = sum(cv2.contourArea(cnt) for cnt in room_contours)
-        
-        # --- Heuristic Scale Calculation --- 
-        scale_used = None
-        pixels_per_meter = None
-        calculated_area_sqm = None
-        calculated_area_sqft = None
-        calculation_method = "No linear dimensions found by OCR"
-        
-        if linear_dimensions:
-            # Convert all dimensions to meters for comparison
-            dimensions_in_meters = []
-            for val, unit, raw in linear_dimensions:
-                if unit == 'm':
-                    dimensions_in_meters.append((val, raw))
-                elif unit == 'ft':
-                    dimensions_in_meters.append((val * 0.3048, raw))
-                elif unit == 'in':
-                     dimensions_in_meters.append((val * 0.0254, raw))
-            
-            if dimensions_in_meters:
-                # Find the largest dimension provided by OCR
-                dimensions_in_meters.sort(key=lambda x: x[0], reverse=True)
-                largest_ocr_dimension_m, ocr_ref_text = dimensions_in_meters[0]
-                
-                # Find the largest contour
-                largest_contour = max(room_contours, key=cv2.contourArea)
-                x, y, w, h = cv2.boundingRect(largest_contour)
-                largest_contour_dimension_px = max(w, h)
-                
-                # Heuristic: Assume largest OCR dimension corresponds to largest contour dimension
-                if largest_ocr_dimension_m > 0 and largest_contour_dimension_px > 0:
-                    pixels_per_meter = largest_contour_dimension_px / largest_ocr_dimension_m
-                    scale_used = f"{pixels_per_meter:.2f} px/m (derived from OCR text '{ocr_ref_text}' and largest contour)"
-                    calculation_method = f"Heuristic scale ({scale_used}) applied to total pixel area."
-                    print(f"OpenCV Scale Calculation: {scale_used}")
-                    
-                    # Calculate area
-                    calculated_area_sqm = total_area_px / (pixels_per_meter ** 2)
-                    calculated_area_sqft = calculated_area_sqm * 10.7639
-                else:
-                     calculation_method = "Could not derive scale (dimension or contour size zero)"
-            else:
-                 calculation_method = "No valid metric dimensions found after conversion"
-        
-        # --- Save Visualization --- 
-        base_name = os.path.basename(image_path)
-        name_without_ext, ext = os.path.splitext(base_name)
-        visual_filename = f"{name_without_ext}_opencv{ext}"
-        visual_path = os.path.join(os.path.dirname(image_path), visual_filename)
-        
-        # Save visualization and verify
-        print(f"Saving OpenCV visualization to: {visual_path}")
-        cv2.imwrite(visual_path, visual_img)
-        if not verify_file_saved(visual_path, "OpenCV visualization"):
-            # If saving failed, try with a full absolute path
-            alt_visual_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
-                                          'static', 'uploads', visual_filename)
-            print(f"Attempt to save to alternative path: {alt_visual_path}")
-            cv2.imwrite(alt_visual_path, visual_img)
-            verify_file_saved(alt_visual_path, "OpenCV visualization (alt path)")
-            # Update the filename to reflect the new location
-            visual_filename = os.path.basename(alt_visual_path)
-        
-        return {
-            'visual_filename': visual_filename,
-            'area_pixels': total_area_px,
-            'num_rooms': len(room_contours),
-            'scale_used': scale_used,
-            'calculated_area_sqm': calculated_area_sqm,
-            'calculated_area_sqft': calculated_area_sqft,
-            'calculation_method': calculation_method
-        }
-        
-    except Exception as e:
-        print(f"OpenCV processing error: {e}")
-        import traceback
-        traceback.print_exc() # Print detailed traceback
+def llm_cache_key(prompt, digest):
+    """Response cache key for a prompt and an image digest; None when caching is off."""
+    if not llm_cache:
         return None
+    return llm_cache.key_for_digest(digest, prompt, LLM_CACHE_KEY_MODEL)
+
+def cached_llm_call(prompt, image):
+    """Send the prompt and image to the model, unless the response is already cached.
+
+    ``image`` is a file path or an ``AnalysisContext``; its payload is only prepared on a cache miss, and
+    only once per image (``cached_model_payload``).
+    Returns ``(response_text, cached, cache_key)``. Callers store a fresh response with
+    ``llm_cache.put(cache_key, ...)`` once they have checked it is usable.
+    """
+    digest = image_digest(image)
+    cache_key = llm_cache_key(prompt, digest)
+    if cache_key:
+        cached_text = llm_cache.get(cache_key)
+        metrics.count('llm_cache_requests', result='miss' if cached_text is None else 'hit')
+        if cached_text is not None:
+            return cached_text, True, cache_key
 
-def get_area_estimate_from_llm(image_path):
-    """Sends image to Gemini and asks for area estimation in JSON format."""
+    payload = cached_model_payload(image, digest)
+    # Generate content using the vision model
+    with metrics.timer('llm'):
+        response = llm_model.generate_content([prompt, payload.part()])
+        response.resolve()
+    return response.text, False, cache_key
+
+def get_area_estimate_from_llm(image):
+    """Sends image (a file path or an ``AnalysisContext``) to Gemini and asks for area estimation in JSON format."""
+    image_path = image.image_path if isinstance(image, AnalysisContext) else image
     print(f"Sending image to LLM: {image_path}")
     start_time = time.time()
     
     try:
-        img = Image.open(image_path)
-        
         prompt = """
         Analyze this floor plan image carefully.
         
@@ -355,14 +299,12 @@ def get_area_estimate_from_llm(image_path):
         }
         """
 
-        # Generate content using the vision model
-        response = llm_model.generate_content([prompt, img])
-        response.resolve() 
+        response_text, cached, cache_key = cached_llm_call(prompt, image)
 
         processing_time = time.time() - start_time
-        print(f"LLM response received in {processing_time:.2f} seconds")
+        print(f"LLM response received in {processing_time:.2f} seconds" + (" (cached)" if cached else ""))
         
-        raw_response_text = response.text.strip()
+        raw_response_text = response_text.strip()
         print(f"LLM Raw Response Text: {raw_response_text}")
         
         # Attempt to parse the response as JSON
@@ -378,11 +320,15 @@ def get_area_estimate_from_llm(image_path):
             # Validate expected keys
             required_keys = ["found_dimensions", "estimated_area_sqft", "estimated_area_sqm", "explanation"]
             if all(key in parsed_json for key in required_keys):
+                # Only well-formed estimates are cached, so a format error is retried next time
+                if cache_key and not cached:
+                    llm_cache.put(cache_key, response_text, LLM_MODEL_NAME)
                 return {
                     "data": parsed_json, 
                     "error": None, 
                     "processing_time": processing_time,
-                    "raw_response": raw_response_text # Keep raw text for debugging tab
+                    "raw_response": raw_response_text, # Keep raw text for debugging tab
+                    "cached": cached
                 }
             else:
                 print("LLM JSON response missing required keys.")
@@ -390,6 +336,7 @@ def get_area_estimate_from_llm(image_path):
                 
         except (json.JSONDecodeError, ValueError) as json_error:
             print(f"Failed to parse LLM response as JSON: {json_error}")
+            metrics.count('errors', stage='llm_format')
             # Fallback: return the raw text with an error message
             return {
                 "data": None, # Indicate data is not structured
@@ -400,45 +347,16 @@ def get_area_estimate_from_llm(image_path):
 
     except FileNotFoundError:
          error_msg = f"Image file not found at {image_path}"
-         flash(f"Error: {error_msg}")
+         print(f"Error: {error_msg}")
          return {"data": None, "error": error_msg, "raw_response": "File not found"}
     except Exception as e:
         error_msg = str(e)
         print(f"Error calling LLM API: {e}")
-        flash(f"Error contacting AI service: {e}")
         return {"data": None, "error": error_msg, "raw_response": f"API Error: {e}"}
 
-def ask_followup_question(image_path, question):
-    """
-    Ask a follow-up question about a floor plan to the Gemini model.
-    
-    Args:
-        image_path: Path to the floor plan image
-        question: The follow-up question from the user
-    
-    Returns:
-        Dictionary with response text and any error
-    """
-    print(f"Processing follow-up question about image: {image_path}")
-    print(f"Question: {question}")
-    start_time = time.time()
-    
-    try:
-        # Construct full path to the image file
-        full_image_path = os.path.join(UPLOAD_FOLDER, image_path)
-        
-        # Verify image exists
-        if not os.path.exists(full_image_path):
-            return {
-                "response": None,
-                "error": f"Image file not found: {image_path}",
-                "processing_time": 0
-            }
-        
-        img = Image.open(full_image_path)
-        
-        # Formulate prompt for the follow-up question
-        prompt = f"""
+def followup_prompt(question):
+    """Prompt for a follow-up question about a previously analyzed plan."""
+    return f"""
         This is a follow-up question about a floor plan image that was previously analyzed.
         
         User's question: {question}
@@ -447,28 +365,236 @@ def ask_followup_question(image_path, question):
         Base your answer on what you can see in the floor plan and explain your reasoning.
         If you cannot confidently answer based on the image, please explain why.
         """
-        
-        # Generate content using the vision model
-        response = llm_model.generate_content([prompt, img])
-        response.resolve()
-        
+
+def stream_followup(image_path, question):
+    """
+    Answer a follow-up question about a floor plan while the model generates it.
+    
+    Yields ``(event, data)`` pairs: ``('chunk', {'text': ...})`` for each piece of the answer as
+    the model streams it (a cached answer is a single chunk), then ``('done', {...})`` with the
+    timings, or ``('error', {'error': ...})``.
+    """
+    print(f"Processing follow-up question about image: {image_path}")
+    print(f"Question: {question}")
+    start_time = time.time()
+
+    # Construct full path to the image file (None if it points outside the upload folders)
+    full_image_path = upload_store.path(image_path)
+    if full_image_path is None or not os.path.exists(full_image_path):
+        yield 'error', {'error': f"Image file not found: {image_path}", 'processing_time': 0}
+        return
+
+    # Asking about an upload keeps it from expiring; released when the stream ends or the client leaves
+    upload_id = upload_store.upload_id(image_path)
+    upload_store.pin(upload_id)
+    try:
+        prompt = followup_prompt(question)
+        digest = image_digest(full_image_path)
+        cache_key = llm_cache_key(prompt, digest)
+        cached_text = llm_cache.get(cache_key) if cache_key else None
+        if cache_key:
+            metrics.count('llm_cache_requests', result='miss' if cached_text is None else 'hit')
+        first_chunk_time = None
+        if cached_text is not None:
+            first_chunk_time = time.time() - start_time
+            yield 'chunk', {'text': cached_text}
+        else:
+            # Usually already prepared by the analysis of the same upload
+            payload = cached_model_payload(full_image_path, digest)
+            llm_start = time.perf_counter()
+            response = llm_model.generate_content([prompt, payload.part()], stream=True)
+            parts = []
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:  # a chunk without text parts, e.g. only the finish reason
+                    continue
+                if not text:
+                    continue
+                if first_chunk_time is None:
+                    first_chunk_time = time.time() - start_time
+                    metrics.observe('llm_first_chunk', time.perf_counter() - llm_start)
+                parts.append(text)
+                yield 'chunk', {'text': text}
+            metrics.observe('llm', time.perf_counter() - llm_start)
+            if cache_key and parts:
+                llm_cache.put(cache_key, ''.join(parts), LLM_MODEL_NAME)
+
         processing_time = time.time() - start_time
-        print(f"Follow-up response received in {processing_time:.2f} seconds")
-        
-        return {
-            "response": response.text,
-            "error": None,
-            "processing_time": processing_time
+        print(f"Follow-up response received in {processing_time:.2f} seconds"
+              + (" (cached)" if cached_text is not None else f", first chunk after {first_chunk_time or 0:.2f} s"))
+        yield 'done', {
+            'processing_time': processing_time,
+            'first_chunk_time': first_chunk_time,
+            'cached': cached_text is not None
         }
-            
     except Exception as e:
-        error_msg = str(e)
         print(f"Error processing follow-up question: {e}")
-        return {
-            "response": None, 
-            "error": error_msg,
-            "processing_time": time.time() - start_time
-        }
+        metrics.count('errors', stage='followup')
+        yield 'error', {'error': str(e), 'processing_time': time.time() - start_time}
+    finally:
+        upload_store.unpin(upload_id)
+
+def ask_followup_question(image_path, question):
+    """
+    Ask a follow-up question about a floor plan to the Gemini model.
+    
+    Args:
+        image_path: Path to the floor plan image
+        question: The follow-up question from the user
+    
+    Returns:
+        Dictionary with response text and any error
+    """
+    chunks, result = [], {}
+    for event, data in stream_followup(image_path, question):
+        if event == 'chunk':
+            chunks.append(data['text'])
+        else:
+            result = data
+    return {
+        "response": ''.join(chunks) if result.get('error') is None else None,
+        "error": result.get('error'),
+        "processing_time": result.get('processing_time', 0),
+        "cached": result.get('cached', False)
+    }
+
+def run_analysis(upload_id, filepath):
+    """Full analysis of one saved upload (runs in a background worker).
+
+    Everything it writes goes to the upload's own folder, which stays pinned until it returns.
+    Returns the analysis results dict; file names in it are relative to the uploads folder.
+    """
+    try:
+        with metrics.timer('analysis'):
+            return analyze_upload(filepath)
+    finally:
+        upload_store.unpin(upload_id)
+
+def analyze_upload(filepath):
+    """Convert (if a PDF) and analyze an upload saved in its own folder; see ``run_analysis``."""
+    folder = os.path.dirname(filepath)
+    # This will be the image we analyze and display, decoded once and shared by all stages
+    display_path = filepath  # Default to the uploaded file
+
+    # Convert PDF to image if necessary
+    file_ext = filepath.rsplit('.', 1)[1].lower()
+    if file_ext == 'pdf':
+        pdf_info = read_pdf_info(filepath)
+        ocr_dpi, contour_dpi = render_dpis(pdf_info, OCR_DPI, CONTOUR_DPI, OCR_MAX_MEGAPIXELS * 1_000_000)
+        page_count = int(pdf_info['Pages'])
+        if page_count > 1:
+            return run_plan_set(filepath, page_count, ocr_dpi, contour_dpi)
+        context = convert_pdf_to_image(filepath, folder, ocr_dpi, contour_dpi)
+        # Update the image for display
+        display_path = context.image_path
+
+        # Verify the converted image exists
+        verify_file_saved(context.image_path, "PDF conversion")
+    else:
+        context = AnalysisContext.from_file(filepath)
+
+    with context:
+        analysis_results = analyze_context(context, upload_store.relative(display_path))
+
+    # The visualization is saved next to the analyzed image
+    if analysis_results['opencv_visual']:
+        analysis_results['opencv_visual'] = upload_store.relative(os.path.join(folder, analysis_results['opencv_visual']))
+
+    return {'analysis': analysis_results}
+
+def run_plan_set(filepath, page_count, ocr_dpi, contour_dpi):
+    """Per-sheet OCR/OpenCV analysis of a multi-page PDF (runs in a background worker).
+
+    The top-level results describe the first sheet; every sheet and the totals are under 'plan_set'.
+    The AI estimate is not run: one Gemini call per sheet would be too slow and costly for 200-page sets.
+    """
+    folder = os.path.dirname(filepath)
+    start_time = time.time()
+    with metrics.timer('plan_set'):
+        plan_set = analyze_plan_set(filepath, folder, cpu_pool(), page_count, PLAN_SET_RENDER_THREADS,
+                                    PLAN_SET_MAX_IN_FLIGHT, ocr_dpi, contour_dpi)
+    print(f"Plan set analyzed in {time.time() - start_time:.2f} seconds")
+
+    # Sheet images are named relative to the upload's folder; serve them relative to the uploads folder
+    sheets = plan_set['sheets']
+    for sheet in sheets:
+        # Each sheet's OCR and OpenCV stages were timed in its worker process
+        for stage, (seconds, error) in sheet.pop('stage_timings').items():
+            record_stage(stage, seconds, error)
+        sheet['display_filename'] = upload_store.relative(os.path.join(folder, sheet['display_filename']))
+        if sheet['opencv_visual']:
+            sheet['opencv_visual'] = upload_store.relative(os.path.join(folder, sheet['opencv_visual']))
+
+    first = sheets[0]
+    analysis_results = {
+        'display_filename': first['display_filename'],
+        'opencv_results': first['opencv_results'],
+        'ocr_dimensions': first['ocr_dimensions'],
+        'ai_estimate': {'data': None, 'error': "AI estimate is not run for multi-page plan sets", 'raw_response': ''},
+        'opencv_visual': first['opencv_visual'],
+        'plan_set': plan_set
+    }
+
+    return {'analysis': analysis_results}
+
+def record_stage(stage, seconds, error):
+    """Record the duration of a stage timed in a worker process (``run_timed``), counting it as an error if it failed."""
+    metrics.observe(stage, seconds)
+    if error:
+        metrics.count('errors', stage=stage)
+
+def analyze_context(context, display_filename):
+    """Run the OCR, OpenCV and AI stages on one decoded image and combine their results."""
+    # Initialize results
+    analysis_results = {
+        'display_filename': display_filename,
+        'opencv_results': None,
+        'ocr_dimensions': [], # Now stores list of Dimension (val, unit, raw, bbox) records
+        'ai_estimate': None,
+        'opencv_visual': None
+    }
+
+    # OCR, the contour analysis and the AI estimate do not depend on each other: run them side by side
+    start_time = time.time()
+    # Worker processes map the context's shared views and time their own stage (run_timed); errors come back with
+    # the timing instead of being swallowed in the worker, so they are counted here
+    ocr_future = cpu_pool().submit(run_timed, extract_dimensions_with_ocr, context.shared, strict=True)
+    contour_future = cpu_pool().submit(run_timed, find_room_contours, context.shared, strict=True)
+    llm_future = llm_pool.submit(get_area_estimate_from_llm, context)
+
+    # OCR to detect linear dimensions
+    ocr_seconds, ocr_linear_dimensions, ocr_error = ocr_future.result()
+    record_stage('ocr', ocr_seconds, ocr_error)
+    if ocr_error:
+        print(f"OCR dimension extraction failed: {ocr_error}")
+        ocr_linear_dimensions = []
+    analysis_results['ocr_dimensions'] = ocr_linear_dimensions
+
+    # Only the heuristic scale calculation needs both the OCR dimensions and the contours
+    contour_seconds, contour_results, contour_error = contour_future.result()
+    record_stage('opencv', contour_seconds, contour_error)
+    if contour_error:
+        print(f"OpenCV processing failed: {contour_error}")
+    opencv_results = apply_scale_heuristic(contour_results, ocr_linear_dimensions)
+    if opencv_results:
+        analysis_results['opencv_results'] = opencv_results
+        analysis_results['opencv_visual'] = opencv_results.get('visual_filename')
+
+    # Get AI estimate from LLM
+    ai_response = llm_future.result()
+    analysis_results['ai_estimate'] = ai_response
+    print(f"Analysis stages finished in {time.time() - start_time:.2f} seconds")
+    return analysis_results
+
+def render_html(template_name, **context):
+    """``render_template``, timed for /metrics."""
+    with metrics.timer('template_render'):
+        return render_template(template_name, **context)
+
+def wants_json():
+    """True when the client prefers a JSON response over HTML (API clients, fetch/XHR polling)."""
+    return request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'application/json'
 
 # --- Flask Routes ---
 @app.route("/", methods=["GET", "POST"])
@@ -485,124 +611,123 @@ def index():
             return redirect(request.url)
         
         if file and allowed_file(file.filename):
-            # Create unique filename to avoid overwrites
+            # Each upload gets its own folder, so names never collide and analyses never share files
             original_filename = secure_filename(file.filename)
-            name, extension = os.path.splitext(original_filename)
-            unique_filename = f"{name}_{uuid.uuid4().hex[:8]}{extension}"
-            
-            # Track files that need to be kept
-            files_to_keep = set()
+            if '.' not in original_filename:  # e.g. a name with only non-ASCII characters
+                original_filename = f"upload.{file.filename.rsplit('.', 1)[1].lower()}"
+            upload_id, folder = upload_store.create()
             
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+            filepath = os.path.join(folder, original_filename)
             print(f"Saving uploaded file to: {filepath}")
-            file.save(filepath)
-            
-            # Add uploaded file to keep list
-            files_to_keep.add(unique_filename)
-            
+            with metrics.timer('upload_save'):
+                file.save(filepath)
+
             # Verify file was saved
             verify_file_saved(filepath, "Original upload")
-            
-            # This will be the image we analyze and display
-            image_path_for_analysis = filepath
-            display_filename = unique_filename  # Default to the uploaded file
-            
-            # Convert PDF to image if necessary
-            file_ext = unique_filename.rsplit('.', 1)[1].lower()
-            if file_ext == 'pdf':
-                try:
-                    image_path_for_analysis = convert_pdf_to_image(filepath, app.config['UPLOAD_FOLDER'])
-                    if not image_path_for_analysis:
-                        flash("Failed to convert PDF to image")
-                        return redirect(request.url)
-                    # Update the filename for display
-                    display_filename = os.path.basename(image_path_for_analysis)
-                    
-                    # Add converted image to keep list
-                    files_to_keep.add(display_filename)
-                    
-                    # Verify the converted image exists
-                    verify_file_saved(image_path_for_analysis, "PDF conversion")
-                    
-                    # Log current directory contents for debugging
-                    print(f"Contents of {app.config['UPLOAD_FOLDER']}:")
-                    for file in os.listdir(app.config['UPLOAD_FOLDER']):
-                        print(f"  - {file}")
-                        
-                except Exception as e:
-                    print(f"PDF Conversion failed: {e}")
-                    # Flash message already set in convert_pdf_to_image
-                    return redirect(request.url)
-            
-            # Initialize results
-            analysis_results = {
-                'display_filename': display_filename,
-                'opencv_results': None,
-                'ocr_dimensions': [], # Now stores list of (val, unit, raw) tuples
-                'ai_estimate': None,
-                'opencv_visual': None
-            }
-            
-            # OCR to detect linear dimensions
-            ocr_linear_dimensions = extract_dimensions_with_ocr(image_path_for_analysis)
-            analysis_results['ocr_dimensions'] = ocr_linear_dimensions
-            
-            # Try OpenCV analysis with heuristic scale calculation
-            opencv_results = analyze_with_opencv(image_path_for_analysis, ocr_linear_dimensions)
-            if opencv_results:
-                analysis_results['opencv_results'] = opencv_results
-                # Get visual filename if it exists and add to files to keep
-                cv_visual_filename = opencv_results.get('visual_filename')
-                if cv_visual_filename:
-                    analysis_results['opencv_visual'] = cv_visual_filename
-                    files_to_keep.add(cv_visual_filename)
-            
-            # Get AI estimate from LLM
-            ai_response = get_area_estimate_from_llm(image_path_for_analysis)
-            analysis_results['ai_estimate'] = ai_response
-            
-            # Store analysis results in session for follow-up questions
-            session['last_analysis'] = analysis_results
-            session['last_files'] = list(files_to_keep)
-            
-            # Now clean up old files, keeping only the ones needed for this analysis
-            cleanup_old_files(files_to_keep)
-            
-            # Pass all results to the template
-            return render_template(
-                "index.html", 
-                analysis=analysis_results,
-                area_estimate_str=(analysis_results.get('ai_estimate', {}).get('data') or {}).get('estimated_area_sqft', 'N/A')
-            )
+
+            # Analysis runs in a background worker; the request returns as soon as the job is queued
+            # The folder stays pinned (never evicted) until the job has finished with it
+            job = job_queue.submit(run_analysis, upload_id, filepath,
+                                   meta={'upload_id': upload_id, 'filename': original_filename})
+            print(f"Queued analysis job {job.id} for {upload_store.relative(filepath)}")
+
+            if wants_json():
+                return jsonify({
+                    **job.to_dict(),
+                    'status_url': url_for('job_status', job_id=job.id),
+                    'result_url': url_for('job_result', job_id=job.id)
+                }), 202
+            return redirect(url_for('job_result', job_id=job.id))
             
         else:
             flash(f"Invalid file type: '{file.filename}'. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}")
             return redirect(request.url)
 
     # Initial GET request
-    return render_template("index.html", area_estimate=None, analysis=None)
+    return render_html("index.html", area_estimate=None, analysis=None)
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Poll the status of an analysis job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': f"Unknown or expired job: {job_id}"}), 404
+    return jsonify({**job.to_dict(), 'result_url': url_for('job_result', job_id=job.id)})
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Result of an analysis job: 202 while it is still queued or running."""
+    job = job_queue.get(job_id)
+    if job is None:
+        if wants_json():
+            return jsonify({'error': f"Unknown or expired job: {job_id}"}), 404
+        flash("This analysis has expired. Please upload the file again.")
+        return redirect(url_for('index'))
+
+    if job.status == FAILED:
+        if wants_json():
+            return jsonify(job.to_dict()), 500
+        flash(f"Analysis failed: {job.error}")
+        return redirect(url_for('index'))
+
+    if job.status != DONE:
+        if wants_json():
+            return jsonify(job.to_dict()), 202
+        with metrics.timer('template_render'):
+            page = render_template_string(PENDING_PAGE, filename=job.meta.get('filename'), status=job.status)
+        return page, 202
+
+    analysis_results = job.result['analysis']
+    # Keep the results server-side for follow-up questions; the session only remembers their ID
+    if session.get('analysis_id') != job.id:
+        analysis_store.put(job.id, analysis_results)
+        session['analysis_id'] = job.id
+        session.pop('last_analysis', None)  # results stored in the cookie by earlier versions
+
+    if wants_json():
+        return jsonify({**job.to_dict(), 'analysis': analysis_results})
+    # Pass all results to the template
+    return render_html(
+        "index.html", 
+        analysis=analysis_results,
+        area_estimate_str=((analysis_results.get('ai_estimate') or {}).get('data') or {}).get('estimated_area_sqft', 'N/A')
+    )
 
 # Route to serve uploaded files
-@app.route('/static/uploads/<filename>')
+# Files are named '<upload id>/<file name>'; send_from_directory rejects paths outside the uploads folder
+@app.route('/static/uploads/<path:filename>')
 def uploaded_file(filename):
     print(f"Browser requested file: {filename}")
     file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     
-    if os.path.exists(file_path):
-        print(f"File found at: {file_path}")
-        file_size = os.path.getsize(file_path)
-        print(f"File size: {file_size} bytes")
-    else:
-        print(f"WARNING: File not found at: {file_path}")
-        print(f"Available files in directory:")
-        try:
-            for file in os.listdir(app.config['UPLOAD_FOLDER']):
-                print(f"  - {file}")
-        except Exception as e:
-            print(f"Error listing directory: {e}")
+    if not os.path.exists(file_path):
+        print(f"WARNING: File not found at: {file_path} (the upload may have expired)")
             
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
+def sse(event, data):
+    """One server-sent event. The data is JSON, so newlines in the answer cannot end the event early."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/ask-followup/stream', methods=['GET', 'POST'])
+def ask_followup_stream():
+    """Stream the answer to a follow-up question as server-sent events.
+
+    Takes the same ``image_path`` and ``question`` as /ask-followup, in the query string for
+    ``EventSource`` or as a form. Sends ``chunk`` events (``{"text": ...}``) as the model produces
+    them, then one ``done`` event with the timings, or an ``error`` event.
+    """
+    image_path = request.values.get('image_path')
+    question = request.values.get('question')
+
+    if not image_path or not question:
+        return jsonify({'error': "Missing image or question"}), 400
+
+    events = (sse(event, data) for event, data in stream_followup(image_path, question))
+    # No caching or proxy buffering, or the chunks would only arrive at the end
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/ask-followup', methods=['POST'])
 def ask_followup():
     """Process a follow-up question about a floor plan."""
@@ -617,8 +742,9 @@ def ask_followup():
     # Process the follow-up question
     followup_result = ask_followup_question(image_path, question)
     
-    # Get the original analysis results from the session if available
-    analysis_results = session.get('last_analysis')
+    # Get the original analysis results of this session if they are still stored
+    analysis_id = session.get('analysis_id')
+    analysis_results = analysis_store.get(analysis_id) if analysis_id else None
     
     # If no stored analysis, create a minimal one
     if not analysis_results:
@@ -634,14 +760,8 @@ def ask_followup():
             'opencv_visual': None
         }
     
-    # Ensure files needed for this analysis aren't deleted
-    files_to_keep = session.get('last_files', [])
-    if image_path not in files_to_keep:
-        files_to_keep.append(image_path)
-        session['last_files'] = files_to_keep
-    
     # Render the template with the original analysis and follow-up response
-    return render_template(
+    return render_html(
         "index.html",
         analysis=analysis_results,
         followup_question=question,
@@ -649,6 +769,14 @@ def ask_followup():
         followup_error=followup_result.get('error')
     )
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Stage latency histograms, error and cache counters and job queue sizes, in the Prometheus text format."""
+    job_stats = job_queue.stats()
+    gauges = {'jobs': ("Analysis jobs by status (finished ones until they expire).",
+                       {(('status', status),): job_stats[status] for status in (QUEUED, RUNNING, DONE, FAILED)})}
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
 # --- Run App ---
 if __name__ == "__main__":
     print(f"Starting server...")
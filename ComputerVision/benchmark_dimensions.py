@@ -0,0 +1,135 @@
+"""Micro-benchmark and fuzz check of the OCR dimension parser.
+
+Times ``dimensions.parse_dimensions`` against the three per-unit regex scans
+it replaced on synthetic OCR page text, checks it on the cases in
+``dimension_corpus.json`` and feeds it random and adversarial strings: every
+input must parse without errors, into finite values whose raw text is in the
+input, and in time linear in its length.
+
+Usage:
+    python benchmark_dimensions.py
+    python benchmark_dimensions.py --pages 200 --fuzz 100000 --seed 7
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+
+from dimensions import parse_dimensions
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dimension_corpus.json')
+FUZZ_ALPHABET = "0123456789 ..--//,'\"’”′″xXmMcfteinso²\n"
+MAX_SECONDS_PER_KB = 0.01  # far above the normal rate; catches catastrophic backtracking
+
+
+def legacy_parse(text):
+    """The per-unit scans used before ``dimensions.py``."""
+    meter_pattern = r'(\d+(?:\.\d+)?)\s*(?:m|meters?|metre)s?\b'
+    feet_pattern = r'(\d+(?:\.\d+)?)\s*(?:ft|feet|foot|\'(?!["]))'
+    inch_pattern = r'(\d+(?:\.\d+)?)\s*(?:in|inch|inches|\")\b'
+    dimensions = []
+    for pattern, unit in ((meter_pattern, 'm'), (feet_pattern, 'ft'), (inch_pattern, 'in')):
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            dimensions.append((float(match.group(1)), unit, match.group(0)))
+    return dimensions
+
+
+def synthetic_page(rng, lines=300):
+    """OCR-like text of one sheet: room names, dimension strings, notes and noise."""
+    words = ["KITCHEN", "BED 2", "LIVING", "BATH", "NOTE:", "SEE DETAIL", "TYP.", "A-101", "1:50", "UP", "DN"]
+    out = []
+    for _ in range(lines):
+        kind = rng.random()
+        if kind < 0.3:
+            out.append(f"{rng.randint(2, 40)}'-{rng.randint(0, 11)}\"")
+        elif kind < 0.45:
+            out.append(f"{rng.choice(words)} {rng.randint(20, 60) / 10:g} m x {rng.randint(20, 60) / 10:g} m")
+        elif kind < 0.55:
+            out.append(f"{rng.randint(500, 9000)} mm")
+        else:
+            out.append(" ".join(rng.choice(words) for _ in range(rng.randint(1, 6))))
+    return "\n".join(out)
+
+
+def bench(pages, repeat):
+    results = {}
+    for name, parse in (("legacy", legacy_parse), ("single-pass", parse_dimensions)):
+        best = math.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            found = sum(len(parse(page)) for page in pages)
+            best = min(best, time.perf_counter() - start)
+        results[name] = {'us_per_page': best / len(pages) * 1e6, 'dimensions': found}
+    return results
+
+
+def check_corpus():
+    with open(CORPUS, encoding='utf-8') as f:
+        cases = json.load(f)
+    failures = []
+    for case in cases:
+        found = [[d.value, d.unit] for d in parse_dimensions(case['text'])]
+        expected = case['expected']
+        if len(found) != len(expected) or any(unit != e_unit or not math.isclose(value, e_value)
+                                              for (value, unit), (e_value, e_unit) in zip(found, expected)):
+            failures.append((case['text'], found, expected))
+    return len(cases), failures
+
+
+def check_input(text):
+    """Problems with parsing one fuzz input, or an empty list."""
+    start = time.perf_counter()
+    try:
+        dimensions = parse_dimensions(text)
+    except Exception as e:
+        return [f"{type(e).__name__}: {e}"]
+    elapsed = time.perf_counter() - start
+    problems = [f"bad value {d}" for d in dimensions if not math.isfinite(d.value) or d.value < 0]
+    problems += [f"raw text not in input: {d.raw!r}" for d in dimensions if d.raw not in text]
+    if elapsed > MAX_SECONDS_PER_KB * max(1, len(text) / 1024):
+        problems.append(f"slow: {elapsed * 1000:.1f} ms for {len(text)} characters")
+    return problems
+
+
+def fuzz(count, rng):
+    inputs = ["".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 80))) for _ in range(count)]
+    # Long runs that could make a backtracking pattern blow up
+    inputs += ["1" * 20000, "1 " * 10000 + "/", "1-" * 10000, "1'" * 10000, "1,000" * 4000, "1 1/" * 5000]
+    failures = []
+    for text in inputs:
+        problems = check_input(text)
+        if problems:
+            failures.append((text[:60], problems))
+    return len(inputs), failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark and fuzz the OCR dimension parser.")
+    parser.add_argument("--pages", type=int, default=50, help="Synthetic OCR pages to parse")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repeats (best is reported)")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Random fuzz inputs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    pages = [synthetic_page(rng) for _ in range(args.pages)]
+    timings = bench(pages, args.repeat)
+    for name, row in timings.items():
+        print(f"{name:<12} {row['us_per_page']:>9.1f} us/page  {row['dimensions']:>6} dimensions")
+    print(f"speedup: {timings['legacy']['us_per_page'] / timings['single-pass']['us_per_page']:.2f}x")
+
+    total, corpus_failures = check_corpus()
+    print(f"corpus: {total - len(corpus_failures)}/{total} cases pass")
+    for text, found, expected in corpus_failures:
+        print(f"  {text!r}: got {found}, expected {expected}")
+
+    total, fuzz_failures = fuzz(args.fuzz, rng)
+    print(f"fuzz: {total - len(fuzz_failures)}/{total} inputs pass")
+    for text, problems in fuzz_failures[:20]:
+        print(f"  {text!r}: {'; '.join(problems)}")
+
+    sys.exit(1 if corpus_failures or fuzz_failures else 0)
@@ -0,0 +1,229 @@
+"""Benchmark PDF rasterization settings for the OCR and contour stages.
+
+Each PDF in the corpus is rendered with the legacy pipeline (200 DPI color
+JPEG, shared by OCR and contours) and with every ``--ocr-dpi`` /
+``--contour-dpi`` combination of the lossless grayscale pipeline in
+``rasterize.py``. For each run the render, OCR and contour times are reported,
+plus the OCR dimension recall and the number of rooms found when the PDF has a
+``<name>.json`` ground truth next to it. ``islands`` (optional) are fixture
+outlines standing in rooms, as ``[x, y, w, h]`` in inches; their interiors
+must not be listed as rooms::
+
+    {"dimensions": [[12.0, "ft"], [3.6, "m"]], "rooms": 6, "islands": [[5.5, 3.0, 1.0, 0.75]]}
+
+``--synthetic N`` writes N generated plans (rooms labelled with their
+dimensions, every other large room with a closed island, drawn at 400 DPI on a tabloid sheet) with their ground truth into
+the corpus folder first. Needs Poppler and Tesseract, like the app.
+
+Usage:
+    python benchmark_dpi.py plans/                       # every *.pdf in plans/
+    python benchmark_dpi.py plans/ --synthetic 5 --ocr-dpi 200 300 400 --contour-dpi 75 100 150
+    python benchmark_dpi.py plans/ --json results.json
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from analysis_context import AnalysisContext
+from rasterize import render_dpis, render_page, downsample
+from vision import extract_dimensions_with_ocr, find_room_contours
+
+LEGACY_DPI = 200  # pdf2image's default, used before the OCR and contour renders were split
+SYNTHETIC_DPI = 400
+SYNTHETIC_PAGE = (17, 11)  # tabloid landscape, inches
+SYNTHETIC_ISLAND = (4, 3)  # feet, drawn in every other room of at least twice that size
+
+
+def draw_synthetic_plan(seed, dpi=SYNTHETIC_DPI):
+    """A grayscale sheet of separate rooms, each labelled with its width and depth, and its ground truth.
+
+    Every other room large enough gets a closed island outline in its middle, which is still one room.
+    """
+    rng = random.Random(seed)
+    width, height = (side * dpi for side in SYNTHETIC_PAGE)
+    page = np.full((height, width), 255, np.uint8)
+    dimensions, rooms, islands = [], 0, []
+    px_per_ft = dpi / 4  # 1/4" = 1'-0"
+    x = y = dpi
+    s = dpi / SYNTHETIC_DPI  # line widths and text sizes below are for SYNTHETIC_DPI
+    row_height = 0
+    while True:
+        w_ft, h_ft = rng.randint(8, 20), rng.randint(8, 16)
+        w, h = int(w_ft * px_per_ft), int(h_ft * px_per_ft)
+        if x + w > width - dpi:
+            x, y, row_height = dpi, y + row_height + dpi // 2, 0
+        if y + h > height - dpi:
+            break
+        cv2.rectangle(page, (x, y), (x + w, y + h), 0, round(12 * s))
+        metric = rng.random() < 0.3
+        labels = [(round(w_ft * 0.3048, 1), 'm'), (round(h_ft * 0.3048, 1), 'm')] if metric else \
+                 [(float(w_ft), 'ft'), (float(h_ft), 'ft')]
+        for i, (value, unit) in enumerate(labels):
+            text = f"{value:g} {unit}"
+            # About 8 pt text, as on a printed dimension string
+            cv2.putText(page, text, (x + round(40 * s), y + round((90 + i * 70) * s)), cv2.FONT_HERSHEY_SIMPLEX,
+                        1.6 * s, 0, max(1, round(3 * s)), cv2.LINE_AA)
+            dimensions.append([value, unit])
+        island_w, island_h = SYNTHETIC_ISLAND
+        if rooms % 2 and w_ft >= 2 * island_w and h_ft >= 2 * island_h:
+            iw, ih = int(island_w * px_per_ft), int(island_h * px_per_ft)
+            ix, iy = x + (w - iw) // 2, y + (h - ih) // 2
+            cv2.rectangle(page, (ix, iy), (ix + iw, iy + ih), 0, round(8 * s))
+            islands.append([ix / dpi, iy / dpi, iw / dpi, ih / dpi])
+        rooms += 1
+        x += w + dpi // 2
+        row_height = max(row_height, h)
+    return page, {'dimensions': dimensions, 'rooms': rooms, 'islands': islands}
+
+
+def make_synthetic_plan(pdf_path, seed):
+    """Draw a synthetic plan at ``SYNTHETIC_DPI``; writes the PDF and its truth JSON."""
+    page, truth = draw_synthetic_plan(seed)
+    Image.fromarray(page).save(pdf_path, 'PDF', resolution=SYNTHETIC_DPI)
+    with open(os.path.splitext(pdf_path)[0] + '.json', 'w') as f:
+        json.dump(truth, f)
+
+
+def load_truth(pdf_path):
+    truth_path = os.path.splitext(pdf_path)[0] + '.json'
+    if not os.path.exists(truth_path):
+        return None
+    with open(truth_path) as f:
+        return json.load(f)
+
+
+def dimension_recall(found, truth):
+    """Fraction of the expected ``(value, unit)`` dimensions found by OCR, counting repeats."""
+    expected = Counter((float(value), unit) for value, unit in truth)
+    matched = expected & Counter((float(value), unit) for value, unit, *_ in found)
+    return sum(matched.values()) / sum(expected.values()) if expected else None
+
+
+def islands_listed(contours, islands, dpi):
+    """How many island outlines (``[x, y, w, h]`` in inches) are listed as a room of their own.
+
+    A room with an island in it has its center there too, so only rooms not much larger than the island count.
+    """
+    listed = 0
+    for x, y, w, h in islands:
+        x0, y0, x1, y1 = (side * dpi for side in (x, y, x + w, y + h))
+        for room in contours['rooms'] if contours else []:
+            rx, ry, rw, rh = room['bbox']
+            if x0 < rx + rw / 2 < x1 and y0 < ry + rh / 2 < y1 and rw * rh < 2 * (x1 - x0) * (y1 - y0):
+                listed += 1
+                break
+    return listed
+
+
+def run_stages(context):
+    """Time the OCR and contour stages on one context, as the app runs them."""
+    start = time.perf_counter()
+    dimensions = extract_dimensions_with_ocr(context)
+    ocr_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    contours = find_room_contours(context)
+    contour_seconds = time.perf_counter() - start
+    return dimensions, contours, ocr_seconds, contour_seconds
+
+
+def bench_legacy(pdf_path, scratch):
+    start = time.perf_counter()
+    image = convert_from_path(pdf_path, first_page=1, last_page=1)[0]
+    image_path = os.path.join(scratch, 'legacy.jpg')
+    image.save(image_path, 'JPEG')
+    render_seconds = time.perf_counter() - start
+    with AnalysisContext.from_file(image_path) as context:
+        return (render_seconds,) + run_stages(context)
+
+
+def bench_split(pdf_path, scratch, ocr_dpi, contour_dpi):
+    start = time.perf_counter()
+    ocr_gray = render_page(pdf_path, 1, ocr_dpi)
+    contour_gray = downsample(ocr_gray, ocr_dpi, contour_dpi)
+    render_seconds = time.perf_counter() - start
+    with AnalysisContext.from_render(ocr_gray, contour_gray, os.path.join(scratch, 'split.png')) as context:
+        return (render_seconds,) + run_stages(context)
+
+
+def benchmark(pdf_paths, ocr_dpis, contour_dpis):
+    configs = [('legacy', LEGACY_DPI, LEGACY_DPI)]
+    configs += [('split', ocr_dpi, contour_dpi) for ocr_dpi in ocr_dpis for contour_dpi in contour_dpis
+                if contour_dpi <= ocr_dpi]
+    rows = []
+    for pdf_path in pdf_paths:
+        truth = load_truth(pdf_path)
+        info = pdfinfo_from_path(pdf_path)
+        print(f"{os.path.basename(pdf_path)}: {info.get('Page size')}, app default DPIs {render_dpis(info)}")
+        for mode, ocr_dpi, contour_dpi in configs:
+            scratch = tempfile.mkdtemp(prefix='dpi-bench-')
+            try:
+                if mode == 'legacy':
+                    render_s, dimensions, contours, ocr_s, contour_s = bench_legacy(pdf_path, scratch)
+                else:
+                    render_s, dimensions, contours, ocr_s, contour_s = bench_split(pdf_path, scratch, ocr_dpi,
+                                                                                   contour_dpi)
+            finally:
+                shutil.rmtree(scratch, ignore_errors=True)
+            rows.append({
+                'pdf': os.path.basename(pdf_path),
+                'mode': mode,
+                'ocr_dpi': ocr_dpi,
+                'contour_dpi': contour_dpi,
+                'render_s': render_s,
+                'ocr_s': ocr_s,
+                'contour_s': contour_s,
+                'dimensions': len(dimensions),
+                'recall': dimension_recall(dimensions, truth['dimensions']) if truth else None,
+                'rooms': contours['num_rooms'] if contours else 0,
+                'rooms_expected': truth['rooms'] if truth else None,
+                'islands_listed': islands_listed(contours, truth.get('islands', []), contour_dpi) if truth else None
+            })
+    return rows
+
+
+def print_table(rows):
+    header = f"{'pdf':<24} {'mode':<7} {'ocr':>4} {'cnt':>4} {'render':>7} {'ocr_s':>7} {'cnt_s':>7} " \
+             f"{'dims':>5} {'recall':>7} {'rooms':>9} {'islands':>7}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        recall = f"{row['recall']:.0%}" if row['recall'] is not None else '-'
+        rooms = f"{row['rooms']}/{row['rooms_expected']}" if row['rooms_expected'] is not None else str(row['rooms'])
+        islands = str(row['islands_listed']) if row['islands_listed'] is not None else '-'
+        print(f"{row['pdf'][:24]:<24} {row['mode']:<7} {row['ocr_dpi']:>4} {row['contour_dpi']:>4} "
+              f"{row['render_s']:>7.2f} {row['ocr_s']:>7.2f} {row['contour_s']:>7.2f} "
+              f"{row['dimensions']:>5} {recall:>7} {rooms:>9} {islands:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark OCR and contour rasterization DPIs on a plan corpus.")
+    parser.add_argument("corpus", help="Folder of PDF plans (with optional <name>.json ground truth)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many synthetic plans first")
+    parser.add_argument("--ocr-dpi", type=int, nargs='+', default=[200, 300, 400])
+    parser.add_argument("--contour-dpi", type=int, nargs='+', default=[75, 100, 150])
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    os.makedirs(args.corpus, exist_ok=True)
+    for i in range(args.synthetic):
+        make_synthetic_plan(os.path.join(args.corpus, f"synthetic_{i:02d}.pdf"), seed=i)
+    pdf_paths = sorted(glob.glob(os.path.join(args.corpus, '*.pdf')))
+    if not pdf_paths:
+        parser.error(f"No PDF files in {args.corpus}")
+
+    rows = benchmark(pdf_paths, args.ocr_dpi, args.contour_dpi)
+    print_table(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
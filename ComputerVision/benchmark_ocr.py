@@ -0,0 +1,108 @@
+"""Benchmark OCR throughput: per-call ``tesseract`` processes vs warm tesserocr instances.
+
+Runs ``--calls`` recognitions of small dimension-text images (or of the given
+image files) through each available engine of ``ocr_engine.py`` at every
+``--concurrency`` level, and reports the first (cold) call, throughput and
+p50/p95 latency. With both engines available it also reports how often they
+read the same text.
+
+Usage:
+    python benchmark_ocr.py                                  # synthetic crops
+    python benchmark_ocr.py --calls 500 --concurrency 1 2 4 8
+    python benchmark_ocr.py --images crop1.png crop2.png --json results.json
+"""
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import ocr_engine
+
+
+def synthetic_crops(count, seed=0):
+    """Small images of dimension strings (e.g. ``12'-6"``, ``3.6 m``), dark text on white."""
+    rng = random.Random(seed)
+    crops = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            text = f"{rng.randint(2, 40)}'-{rng.randint(0, 11)}\""
+        else:
+            text = f"{rng.randint(10, 150) / 10:g} m"
+        (width, height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 1.2, 2)
+        crop = np.full((height + baseline + 20, width + 20), 255, np.uint8)
+        cv2.putText(crop, text, (10, height + 10), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2, cv2.LINE_AA)
+        crops.append(crop)
+    return crops
+
+
+def run(engine, images, calls, concurrency):
+    """Time ``calls`` recognitions (cycling through ``images``) on ``concurrency`` threads."""
+    start = time.perf_counter()
+    engine.image_to_data(images[0])
+    cold = time.perf_counter() - start
+
+    def timed(index):
+        start = time.perf_counter()
+        data = engine.image_to_data(images[index % len(images)])
+        return time.perf_counter() - start, " ".join(word for word in data['text'] if word.strip())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(calls)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'engine': engine.name,
+        'concurrency': concurrency,
+        'cold_ms': cold * 1000,
+        'calls_per_s': calls / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+        'texts': [text for _, text in results[:len(images)]]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare OCR throughput of per-call tesseract and tesserocr.")
+    parser.add_argument("--images", nargs='+', help="Image files to OCR (default: synthetic dimension crops)")
+    parser.add_argument("--crops", type=int, default=50, help="Number of synthetic crops")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs='+', default=[1, 4])
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.images:
+        images = [cv2.imread(path, cv2.IMREAD_GRAYSCALE) for path in args.images]
+        if any(image is None for image in images):
+            parser.error("Could not read all --images")
+    else:
+        images = synthetic_crops(args.crops)
+
+    engines = ['cli'] + (['tesserocr'] if ocr_engine.tesserocr is not None else [])
+    if len(engines) == 1:
+        print("tesserocr is not installed; only the per-call engine is measured (pip install tesserocr).")
+    rows = []
+    for name in engines:
+        for concurrency in args.concurrency:
+            engine = ocr_engine.create_engine(name, size=concurrency)
+            try:
+                rows.append(run(engine, images, args.calls, concurrency))
+            finally:
+                engine.close()
+
+    print(f"{'engine':<10} {'threads':>7} {'cold ms':>8} {'calls/s':>8} {'p50 ms':>7} {'p95 ms':>7}")
+    for row in rows:
+        print(f"{row['engine']:<10} {row['concurrency']:>7} {row['cold_ms']:>8.1f} {row['calls_per_s']:>8.1f} "
+              f"{row['p50_ms']:>7.1f} {row['p95_ms']:>7.1f}")
+    if len(engines) > 1:
+        reference = rows[0]['texts']
+        for row in rows:
+            same = sum(a == b for a, b in zip(reference, row['texts'])) / len(reference)
+            print(f"{row['engine']} x{row['concurrency']}: {same:.0%} of texts match the first cli run")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([{k: v for k, v in row.items() if k != 'texts'} for row in rows], f, indent=2)
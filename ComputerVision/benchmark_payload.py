@@ -0,0 +1,118 @@
+"""Benchmark the image payload sent to the model: the uploaded file as-is vs ``model_image.py``.
+
+Every image (the given files, or synthetic 300 DPI plans saved as a clean PNG
+and as a noisy scan-like JPEG) is sent to the offline stub model
+(``stub_model.py``) the way the app used to send it, a ``PIL.Image.open`` of
+the upload, and as ``model_image.load`` builds it in each ``--modes`` (the file
+itself when it already fits the byte budget, otherwise ``prepare``-d). The stub
+answers after ``--latency`` seconds plus the time the payload takes to upload
+at ``--upload-mbps``, so the end-to-end latency (preparation + call) shows what
+the smaller payload saves. Reports payload bytes, the image size sent,
+preparation time and end-to-end latency.
+
+Usage:
+    python benchmark_payload.py                                  # synthetic plans
+    python benchmark_payload.py --images plan1.png scan.jpg --upload-mbps 5 --max-kb 512
+    python benchmark_payload.py --modes gray bilevel --json results.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import model_image
+from benchmark_dpi import draw_synthetic_plan
+from stub_model import StubModel
+
+PROMPT = "Analyze this floor plan image carefully. Respond ONLY with a valid JSON object."
+SYNTHETIC_DPI = 300
+
+
+def synthetic_images(folder, count):
+    """Write ``count`` synthetic plans as a lossless PNG and as a scan-like JPEG (off-white, noisy, tilted)."""
+    rng = np.random.default_rng(0)
+    paths = []
+    for seed in range(count):
+        page, _ = draw_synthetic_plan(seed, SYNTHETIC_DPI)
+        png_path = os.path.join(folder, f"plan_{seed:02d}.png")
+        cv2.imwrite(png_path, page)
+        height, width = page.shape
+        rotation = cv2.getRotationMatrix2D((width / 2, height / 2), 0.4, 1.0)
+        scan = cv2.warpAffine(page, rotation, (width, height), borderValue=255).astype(np.int16)
+        scan = scan * 0.85 + 25 + rng.normal(0, 6, page.shape)
+        scan = cv2.cvtColor(np.clip(scan, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+        jpg_path = os.path.join(folder, f"scan_{seed:02d}.jpg")
+        cv2.imwrite(jpg_path, scan, [cv2.IMWRITE_JPEG_QUALITY, 92])
+        paths += [png_path, jpg_path]
+    return paths
+
+
+def timed_call(model, part):
+    start = time.perf_counter()
+    model.generate_content([PROMPT, part]).resolve()
+    return time.perf_counter() - start
+
+
+def bench_image(path, model, modes, max_pixels, max_bytes):
+    rows = []
+    start = time.perf_counter()
+    with Image.open(path) as image:  # what the app sent before: the uploaded file's bytes
+        size, mime_type = image.size, image.get_format_mimetype()
+        sent = model.bytes_sent
+        timed_call(model, image)
+    rows.append({'image': os.path.basename(path), 'mode': 'as-is', 'bytes': model.bytes_sent - sent,
+                 'size': f"{size[0]}x{size[1]}", 'mime_type': mime_type,
+                 'prepare_s': 0.0, 'end_to_end_s': time.perf_counter() - start})
+    for mode in modes:
+        start = time.perf_counter()
+        payload = model_image.load(path, max_pixels, max_bytes, mode)
+        prepare_s = time.perf_counter() - start
+        call = timed_call(model, payload.part())
+        rows.append({'image': os.path.basename(path), 'mode': mode, 'bytes': len(payload.data),
+                     'size': f"{payload.size[0]}x{payload.size[1]}", 'mime_type': payload.mime_type,
+                     'prepare_s': prepare_s, 'end_to_end_s': prepare_s + call})
+    return rows
+
+
+def print_table(rows):
+    header = f"{'image':<16} {'mode':<8} {'size':>10} {'type':<11} {'KB':>8} {'prep s':>7} {'e2e s':>7} {'vs as-is':>8}"
+    print(header)
+    print('-' * len(header))
+    baseline = {}
+    for row in rows:
+        if row['mode'] == 'as-is':
+            baseline[row['image']] = row
+        base = baseline[row['image']]
+        print(f"{row['image'][:16]:<16} {row['mode']:<8} {row['size']:>10} {row['mime_type'] or '?':<11} "
+              f"{row['bytes'] / 1024:>8.0f} {row['prepare_s']:>7.2f} {row['end_to_end_s']:>7.2f} "
+              f"{base['end_to_end_s'] / row['end_to_end_s']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare model image payloads and latency on the stub model.")
+    parser.add_argument("--images", nargs='+', help="Image files (default: synthetic 300 DPI plans)")
+    parser.add_argument("--synthetic", type=int, default=2, help="Number of synthetic plans")
+    parser.add_argument("--modes", nargs='+', default=list(model_image.MODES), choices=model_image.MODES)
+    parser.add_argument("--max-megapixels", type=float, default=model_image.MAX_PIXELS / 1e6)
+    parser.add_argument("--max-kb", type=int, default=model_image.MAX_BYTES // 1024)
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub model latency per call, seconds")
+    parser.add_argument("--upload-mbps", type=float, default=10.0, help="Simulated upload bandwidth")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    model = StubModel(latency=args.latency, upload_mbps=args.upload_mbps)
+    with tempfile.TemporaryDirectory() as folder:
+        paths = args.images or synthetic_images(folder, args.synthetic)
+        rows = []
+        for path in paths:
+            rows += bench_image(path, model, args.modes, int(args.max_megapixels * 1e6), args.max_kb * 1024)
+
+    print_table(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
@@ -0,0 +1,87 @@
+"""Linear dimensions in OCR text, parsed in a single pass.
+
+One precompiled pattern finds every unit at once: metric (``3.6 m``,
+``360 cm``, ``3,600 mm``), imperial (``12 ft``, ``12'``, ``6 in``, ``6"``),
+compound feet-inches (``12'-6"``, ``12' 6 1/2"``, ``12ft 6in``) and fractions
+(``1/2"``, ``6-1/2"``). Curly quotes and primes, which OCR often produces, count
+as foot and inch marks. Numbers glued to letters or digits (``5.2m2``, ``A12``)
+are not dimensions.
+
+``python benchmark_dimensions.py`` times the parser against the regexes it
+replaced and checks it on ``dimension_corpus.json`` plus random fuzz input.
+"""
+import re
+from collections import namedtuple
+
+UNIT_METERS = {'mm': 0.001, 'cm': 0.01, 'm': 1.0, 'in': 0.0254, 'ft': 0.3048}
+
+FOOT_MARK = "'’′"  # ' ’ ′
+INCH_MARK = '"”″'  # " ” ″
+
+# 12, 12.5, 3,600 (thousands), a fraction 1/2, or a whole number with a fraction: 6 1/2, 6-1/2
+NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+MIXED = rf"(?:\d+[\s-]+)?\d+\s*/\s*[1-9]\d*|{NUMBER}"
+END = r"(?![a-z0-9²³])"  # not part of a word, and not an area (m2, m²)
+FEET_MARK = rf"[{FOOT_MARK}](?![{FOOT_MARK}])"  # '' is an inch mark
+FEET_WORD = r"(?:ft\.?|feet|foot)"
+INCHES_MARK = rf"(?:[{INCH_MARK}]|[{FOOT_MARK}]{{2}})"
+INCHES_WORD = r"(?:in\.?|inch(?:es)?)"
+METRIC = r"(?:mm|millimet(?:er|re)s?|cm|centimet(?:er|re)s?|m|met(?:er|re)s?)"
+
+# The number is matched once, followed by its unit; feet may be followed by inches
+INCHES = rf"(?:{INCHES_MARK}|{INCHES_WORD}{END})"
+DIMENSION_PATTERN = re.compile(
+    # Starts at a digit (checked first: cheap) not inside a number or word, but 12'x14' is two dimensions
+    rf"(?=\d)(?<![0-9a-wyz_.,/])"
+    rf"(?P<number>{MIXED})\s*(?:"
+    # Feet, then optionally inches (12'-6", 12ft 6in); the inch mark may be missing after a hyphen (12'-6).
+    # A bare foot mark may touch the next token (12'x14')
+    rf"(?P<feet>{FEET_MARK}|{FEET_WORD})"
+    rf"(?:\s*(?:-\s*(?P<inches>{MIXED})(?:\s*{INCHES})?|(?P<inches2>{MIXED})\s*{INCHES})|(?<![a-z])|{END})"
+    rf"|(?P<metric>{METRIC}){END}"
+    rf"|(?P<inch>{INCHES})"
+    rf")",
+    re.IGNORECASE)
+FRACTION_PATTERN = re.compile(r"(?:(\d+)[\s-]+)?(\d+)\s*/\s*(\d+)")
+
+
+class Dimension(namedtuple('Dimension', 'value unit raw bbox', defaults=(None,))):
+    """A linear dimension: ``value`` in ``unit`` (mm, cm, m, in or ft), the matched ``raw`` text and its ``bbox``.
+
+    Feet-inches are stored in feet (``12'-6"`` is 12.5 ft).
+    """
+    __slots__ = ()
+
+    @property
+    def meters(self):
+        return self.value * UNIT_METERS[self.unit]
+
+
+METRIC_UNITS = {'mm': 'mm', 'mi': 'mm', 'cm': 'cm', 'ce': 'cm'}  # by the unit's first two letters; else meters
+
+
+def parse_number(text):
+    """Value of a decimal, thousands-grouped number, fraction or whole number with a fraction."""
+    if '/' not in text:
+        return float(text.replace(',', '') if ',' in text else text)
+    whole, numerator, denominator = FRACTION_PATTERN.fullmatch(text).groups()
+    return float(whole or 0) + float(numerator) / float(denominator)
+
+
+def parse_dimensions(text, bbox=None):
+    """All linear dimensions in ``text``, in reading order, as ``Dimension`` records."""
+    dimensions = []
+    for match in DIMENSION_PATTERN.finditer(text):
+        number, feet, inches, inches2, metric, _ = match.groups()
+        value = parse_number(number)
+        if feet is not None:
+            inches = inches or inches2
+            if inches is not None:
+                value += parse_number(inches) / 12
+            unit = 'ft'
+        elif metric is not None:
+            unit = METRIC_UNITS.get(metric[:2].lower(), 'm')
+        else:
+            unit = 'in'
+        dimensions.append(Dimension(value, unit, match.group(), bbox))
+    return dimensions
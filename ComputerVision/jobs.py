@@ -0,0 +1,108 @@
+"""In-process job queue for long-running analyses.
+
+Uploads are handed to a pool of background worker threads through a local
+``queue.Queue``, so no external broker is needed. Each job gets a short ID that
+clients poll for status and result. Finished jobs are kept for ``ttl`` seconds
+and then dropped.
+"""
+import queue
+import threading
+import time
+import uuid
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    """One unit of work and its outcome."""
+
+    def __init__(self, func, args, kwargs, meta):
+        self.id = uuid.uuid4().hex[:12]
+        self.func, self.args, self.kwargs = func, args, kwargs
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = self.finished = None
+
+    def to_dict(self):
+        """Status summary, safe to serialize as JSON (the result itself is not included)."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "queue_seconds": (self.started or time.time()) - self.created,
+            "run_seconds": ((self.finished or time.time()) - self.started) if self.started else None,
+        }
+
+
+class JobQueue:
+    """A fixed pool of worker threads consuming jobs from a local queue.
+
+    Workers start on the first ``submit``, so importing the module (or the
+    Flask reloader's parent process) does not spawn threads.
+    """
+
+    def __init__(self, workers=4, ttl=3600):
+        self.workers = workers
+        self.ttl = ttl
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, func, *args, meta=None, **kwargs):
+        """Enqueue ``func(*args, **kwargs)``; returns the new ``Job``."""
+        job = Job(func, args, kwargs, meta)
+        with self._lock:
+            self._purge()
+            self._jobs[job.id] = job
+            self._start()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """All jobs not yet expired: queued, running and recently finished."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self):
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {"workers": self.workers, **counts}
+
+    def _start(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job.id for job in self._jobs.values() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.status, job.started = RUNNING, time.time()
+            try:
+                job.result = job.func(*job.args, **job.kwargs)
+                job.status = DONE
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                job.error, job.status = str(e), FAILED
+            finally:
+                job.finished = time.time()
+                job.func = job.args = job.kwargs = None
+                self._queue.task_done()
@@ -0,0 +1,161 @@
+"""Persistent cache of model responses for floor-plan estimates and follow-ups.
+
+Entries are keyed by the SHA-256 of the image file, the prompt text and the
+model name, so re-uploading the same plan or repeating a follow-up question
+skips the Gemini round-trip. Responses are stored as text in a single SQLite
+file (WAL mode, so a hit is one indexed lookup and never waits for an fsync).
+
+Entries expire ``ttl`` seconds after they were written; once the stored text
+exceeds ``max_bytes`` the least recently used entries are evicted. Hit, miss,
+expiry and eviction counters are kept in the same database.
+
+Usage:
+    python llm_cache.py .llm_cache.sqlite            # show entries, size and hit/miss counts
+    python llm_cache.py .llm_cache.sqlite --clear
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_VERSION = 1  # bump when the prompts' expected response format changes
+MAX_BYTES = 64 * 1024 * 1024
+TTL_SECONDS = 7 * 24 * 3600
+HASH_CHUNK = 1 << 20
+DIGEST_MEMO_SIZE = 256  # image digests remembered by (path, size, mtime)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    response TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """TTL- and size-bounded cache of response text per image, prompt and model."""
+
+    def __init__(self, path, max_bytes=MAX_BYTES, ttl=TTL_SECONDS):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # One connection shared by the request and worker threads, serialized by a lock
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._digests = {}
+
+    def image_digest(self, image_path):
+        """SHA-256 of the image, remembered while the file's size and mtime are unchanged."""
+        st = os.stat(image_path)
+        memo_key = (os.path.abspath(image_path), st.st_size, st.st_mtime_ns)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            digest = file_digest(image_path)
+            if len(self._digests) >= DIGEST_MEMO_SIZE:
+                self._digests.pop(next(iter(self._digests)))
+            self._digests[memo_key] = digest
+        return digest
+
+    def key(self, image_path, prompt, model_name):
+        """Cache key for an image file, a prompt and a model name."""
+        return self.key_for_digest(self.image_digest(image_path), prompt, model_name)
+
+    def key_for_digest(self, image_digest, prompt, model_name):
+        """Cache key for an image's SHA-256 (e.g. of bytes already in memory), a prompt and a model name."""
+        payload = "\0".join([str(CACHE_VERSION), image_digest, model_name, prompt])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached response text, or ``None`` on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            response, created = row
+            if now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count("expired")
+                self._count("misses")
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._count("hits")
+        return response
+
+    def put(self, key, response, model_name):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, model_name, now, now, len(response.encode()), response))
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits in ``max_bytes``."""
+        with self._lock:
+            expired = self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)).rowcount
+            self._count("expired", expired)
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evicted = 0
+            for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+            self._count("evictions", evicted)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("DELETE FROM counters")
+
+    def _count(self, name, n=1):
+        if n:
+            self._db.execute("INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+                             (name, n, n))
+
+    def stats(self):
+        """Hit/miss/expiry/eviction counters plus the current number and size of entries."""
+        with self._lock:
+            stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+            stats.update(self._db.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(entries=entries, bytes=size, max_bytes=self.max_bytes, ttl=self.ttl,
+                     hit_rate=stats["hits"] / lookups if lookups else 0.0)
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the model response cache.")
+    parser.add_argument("path", help="Cache database file")
+    parser.add_argument("--clear", action="store_true", help="Delete all entries and counters")
+    args = parser.parse_args()
+    cache = LLMCache(args.path)
+    if args.clear:
+        cache.clear()
+    for name, value in cache.stats().items():
+        print(f"{name}: {value}")
@@ -0,0 +1,123 @@
+"""Per-stage latency histograms and counters, exposed in the Prometheus text format.
+
+Stages are timed with ``metrics.timer('ocr')`` (a context manager) or, for
+work running in the OCR/OpenCV worker processes, by submitting
+``run_timed(func, ...)``: the worker returns the duration and any error with
+the result and the server process records them, so all metrics live in the
+process that serves ``/metrics``. An exception inside a timer also counts as an
+error of its stage.
+
+Recording is a ``bisect`` into the bucket bounds and a few additions under one
+lock, a microsecond or two, so the hooks can stay on the hot path. Cumulative
+bucket counts are only computed when ``/metrics`` is scraped.
+
+With several server processes (e.g. gunicorn workers), each one reports its own
+metrics; Prometheus sums them over the scraped instances.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = 'floorplan'
+# Seconds; stages range from a few milliseconds (template render) to a minute (large plan sets)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def run_timed(func, *args, **kwargs):
+    """``(seconds, result, error)`` of ``func(*args, **kwargs)``; submit this to a process pool to time the stage in the worker.
+
+    An exception is not raised but returned as ``error`` (its message; ``result`` is then None), so the
+    caller gets the duration either way and can count the failure.
+    """
+    start = time.perf_counter()
+    try:
+        result, error = func(*args, **kwargs), None
+    except Exception as e:
+        result, error = None, str(e) or type(e).__name__
+    return time.perf_counter() - start, result, error
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in sorted(labels.items())) + '}'
+
+
+class Metrics:
+    """Stage duration histograms (``<prefix>_stage_seconds``) and labelled counters (``<prefix>_<name>_total``)."""
+
+    def __init__(self, prefix=PREFIX, buckets=BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._stages = {}  # stage -> [bucket counts (non-cumulative, last is +Inf), sum]
+        self._counters = {}  # (name, sorted label items) -> value
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        """Record one duration of ``stage``."""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the block as one run of ``stage``; an exception also counts as an error of the stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.count('errors', stage=stage)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name, n=1, **labels):
+        """Add ``n`` to the counter ``<prefix>_<name>_total`` with these labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def describe(self, name, text):
+        """HELP text of a counter (or of ``stage_seconds``)."""
+        self._help[name] = text
+
+    def render(self, gauges=None):
+        """All metrics in the Prometheus text exposition format (0.0.4).
+
+        ``gauges`` maps a name to ``(help, {label dict as tuple of items: value})`` for values
+        read at scrape time, such as queue lengths.
+        """
+        with self._lock:
+            stages = {stage: ([*counts], total) for stage, (counts, total) in self._stages.items()}
+            counters = dict(self._counters)
+        lines = []
+        name = f'{self.prefix}_stage_seconds'
+        lines += [f'# HELP {name} {self._help.get("stage_seconds", "Duration of each analysis stage.")}',
+                  f'# TYPE {name} histogram']
+        for stage in sorted(stages):
+            counts, total = stages[stage]
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels({"stage": stage, "le": bound})} {cumulative}')
+            lines.append(f'{name}_sum{_labels({"stage": stage})} {total}')
+            lines.append(f'{name}_count{_labels({"stage": stage})} {cumulative}')
+        for counter in sorted({name for name, _ in counters}):
+            full_name = f'{self.prefix}_{counter}_total'
+            lines += [f'# HELP {full_name} {self._help.get(counter, counter.replace("_", " ").capitalize() + ".")}',
+                      f'# TYPE {full_name} counter']
+            for (name, labels), value in sorted(counters.items()):
+                if name == counter:
+                    lines.append(f'{full_name}{_labels(dict(labels))} {value}')
+        for gauge, (help_text, values) in (gauges or {}).items():
+            full_name = f'{self.prefix}_{gauge}'
+            lines += [f'# HELP {full_name} {help_text}', f'# TYPE {full_name} gauge']
+            for labels, value in values.items():
+                lines.append(f'{full_name}{_labels(dict(labels))} {value}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,170 @@
+"""Compact image payloads for the model.
+
+Uploads are often 300 DPI rasterized plans of several megabytes, and both the
+upload to Gemini and its latency grow with the payload. An upload that already
+fits ``max_bytes`` (a PNG, JPEG or WebP) is sent unchanged, whatever its pixel
+size: a clean 300 DPI plan is often under 100 KB as a PNG, and decoding,
+cropping and re-encoding it would take longer than its bytes take to upload.
+Any other image is reduced to what the model can use:
+
+1. Converted to grayscale (``gray``, the default) or to black and white with
+   an Otsu threshold (``bilevel``); ``color`` keeps the colors, unless the
+   image has none.
+2. Cropped to the drawing: the white margins around the dark content are
+   removed, leaving ``MARGIN`` of the longer side as padding.
+3. Downsampled (area interpolation) to at most ``max_pixels``. Gemini scales
+   large images down to tiles of a few hundred pixels anyway.
+4. Encoded as a lossless PNG (1-bit when bilevel). A PNG over ``max_bytes``
+   by less than ``WEBP_REACH`` is tried as lossless WebP, which is often half
+   the size; scans and other noisy images that still do not fit losslessly
+   become a JPEG. If that is still too large, the image is shrunk and encoded
+   again until it fits.
+
+``python benchmark_payload.py`` compares payload bytes and end-to-end latency
+against sending the uploaded file as-is, on the offline stub model.
+"""
+import hashlib
+import io
+import math
+from collections import namedtuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+MAX_PIXELS = 4_000_000
+MAX_BYTES = 1024 * 1024
+MODES = ('gray', 'bilevel', 'color')
+MARGIN = 0.01  # padding kept around the cropped drawing, as a fraction of its longer side
+CONTENT_THRESHOLD = 200  # gray levels below this are drawing, not paper
+JPEG_QUALITY = 85
+WEBP_REACH = 2.0  # try lossless WebP for PNGs up to this multiple of the byte budget (it is slow on noise)
+PASSTHROUGH_FORMATS = ('PNG', 'JPEG', 'WEBP')  # encoded uploads the model accepts as they are
+GRAY_TOLERANCE = 8  # a color image whose channels differ by less than this is treated as gray
+MIN_SIDE = 256  # never shrink the longer side below this to meet the byte budget
+
+
+class ModelImage(namedtuple('ModelImage', 'data mime_type size')):
+    """An encoded image for ``generate_content``: its bytes, MIME type and ``(width, height)``."""
+    __slots__ = ()
+
+    @property
+    def digest(self):
+        return hashlib.sha256(self.data).hexdigest()
+
+    def part(self):
+        """The image as an inline blob for ``generate_content``."""
+        return {'mime_type': self.mime_type, 'data': self.data}
+
+
+def passthrough(data, max_bytes=MAX_BYTES):
+    """The encoded image ``data`` as a ``ModelImage``, unchanged, if it fits in ``max_bytes``; otherwise None.
+
+    Only the image header is read, so this costs well under a millisecond.
+    """
+    if len(data) > max_bytes:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            size, image_format = image.size, image.format
+    except (OSError, ValueError):
+        return None
+    if image_format not in PASSTHROUGH_FORMATS:
+        return None
+    return ModelImage(bytes(data), Image.MIME[image_format], size)
+
+
+def content_box(gray, threshold=CONTENT_THRESHOLD, margin=MARGIN):
+    """``(x, y, w, h)`` of the dark content of a grayscale image plus a margin; the whole image if blank."""
+    height, width = gray.shape[:2]
+    # Look for content on a small copy: margins are wide, so a few pixels of precision do not matter
+    step = max(1, max(height, width) // 1000)
+    small = gray[::step, ::step]
+    points = cv2.findNonZero((small < threshold).view(np.uint8))
+    if points is None:
+        return 0, 0, width, height
+    x, y, w, h = cv2.boundingRect(points)
+    pad = int(max(w, h) * step * margin) + step
+    x0, y0 = max(0, x * step - pad), max(0, y * step - pad)
+    x1, y1 = min(width, (x + w) * step + pad), min(height, (y + h) * step + pad)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def fit_pixels(image, max_pixels):
+    """``image`` downsampled to at most ``max_pixels``; unchanged when already small enough."""
+    height, width = image.shape[:2]
+    if width * height <= max_pixels:
+        return image
+    scale = math.sqrt(max_pixels / (width * height))
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def is_gray(bgr, tolerance=GRAY_TOLERANCE):
+    """True when a BGR image has (almost) no color, judged on a sample of its pixels."""
+    step = max(1, max(bgr.shape[:2]) // 500)
+    sample = bgr[::step, ::step].astype(np.int16)
+    return int((sample.max(axis=2) - sample.min(axis=2)).max()) < tolerance
+
+
+def _encode(image, ext, params):
+    ok, buffer = cv2.imencode(ext, image, params)
+    if not ok:
+        raise ValueError(f"Could not encode image as {ext}")
+    return buffer.tobytes()
+
+
+def encode(image, max_bytes=MAX_BYTES, bilevel=False):
+    """A suitable encoding of ``image`` as ``(bytes, mime type)``: lossless PNG when it fits in ``max_bytes``.
+
+    Smaller encodings are only tried when the PNG does not fit.
+    """
+    png_params = [cv2.IMWRITE_PNG_COMPRESSION, 9] + ([cv2.IMWRITE_PNG_BILEVEL, 1] if bilevel else [])
+    best = (_encode(image, '.png', png_params), 'image/png')
+    if len(best[0]) <= max_bytes:
+        return best
+    if bilevel or len(best[0]) <= max_bytes * WEBP_REACH:
+        webp = _encode(image, '.webp', [cv2.IMWRITE_WEBP_QUALITY, 101])  # quality above 100: lossless
+        if len(webp) < len(best[0]):
+            best = (webp, 'image/webp')
+    if not bilevel and len(best[0]) > max_bytes:
+        jpeg = _encode(image, '.jpg', [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if len(jpeg) < len(best[0]):
+            best = (jpeg, 'image/jpeg')
+    return best
+
+
+def prepare(image, max_pixels=MAX_PIXELS, max_bytes=MAX_BYTES, mode='gray'):
+    """A ``ModelImage`` of a BGR or grayscale ``image`` within the pixel and byte budgets."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown image mode: {mode} (expected one of {', '.join(MODES)})")
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    x, y, w, h = content_box(gray)
+    if mode != 'color' or image.ndim == 2 or is_gray(image):
+        image = gray
+    image = image[y:y + h, x:x + w]
+    image = fit_pixels(image, max_pixels)
+    bilevel = mode == 'bilevel'
+    while True:
+        if bilevel:
+            # Thresholded after resizing, so thin lines survive the downsample as gray and then as black
+            _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        data, mime_type = encode(image, max_bytes, bilevel)
+        height, width = image.shape[:2]
+        if len(data) <= max_bytes or max(width, height) <= MIN_SIDE:
+            return ModelImage(data, mime_type, (width, height))
+        # Encoded size roughly follows the pixel count; aim a little below the budget
+        image = fit_pixels(image, width * height * min(0.8, 0.9 * max_bytes / len(data)))
+
+
+def load(path, max_pixels=MAX_PIXELS, max_bytes=MAX_BYTES, mode='gray'):
+    """The payload for an image file: the file itself if it fits (``passthrough``), otherwise ``prepare``-d."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    payload = passthrough(data, max_bytes)
+    if payload is not None:
+        return payload
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR if mode == 'color' else cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise FileNotFoundError(f"Could not read image: {path}")
+    return prepare(image, max_pixels, max_bytes, mode)
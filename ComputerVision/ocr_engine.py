@@ -0,0 +1,162 @@
+"""Warm Tesseract instances shared by the OCR threads of a process.
+
+pytesseract starts a new ``tesseract`` process for every call, writes the
+image to a temp file and reloads the language data each time; for the many
+small mosaics of ``text_regions.py`` that start-up cost dominates. When the
+optional ``tesserocr`` package (bindings to the Tesseract C API) is installed,
+each process instead keeps a pool of initialized ``PyTessBaseAPI`` instances,
+created on first use and reused by every later call. A call waits for an idle
+instance, so at most ``OCR_POOL_SIZE`` recognitions run at once per process;
+the API releases the GIL while recognizing, so the calling threads really run
+in parallel. The analysis worker processes are long-lived, so their instances
+stay warm across uploads.
+
+``OCR_ENGINE`` selects ``tesserocr``, ``cli`` (per-call pytesseract) or
+``auto`` (the default: tesserocr when installed, otherwise the CLI). The app
+calls ``check_engine`` once at startup, which warns when ``auto`` falls back.
+"""
+import os
+import queue
+import threading
+
+# OCR runs in parallel threads and processes; one Tesseract thread per recognition avoids oversubscribing the CPU.
+# Must be set before the Tesseract library is loaded.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:  # warm instances are optional; pytesseract spawns a process per call instead
+    tesserocr = None
+
+LANG = 'eng'
+POOL_SIZE = 4
+PSM_SINGLE_BLOCK = 6
+FIELDS = ('text', 'left', 'top', 'width', 'height', 'conf')
+
+
+class CliEngine:
+    """pytesseract: one ``tesseract`` process per call."""
+
+    name = 'cli'
+
+    def __init__(self, psm=PSM_SINGLE_BLOCK, lang=LANG):
+        self.config = f'--psm {psm}'
+        self.lang = lang
+
+    def image_to_data(self, image):
+        data = pytesseract.image_to_data(image, lang=self.lang, config=self.config,
+                                         output_type=pytesseract.Output.DICT)
+        return {field: data[field] for field in FIELDS}
+
+    def close(self):
+        pass
+
+
+class TesserocrPool:
+    """Up to ``size`` initialized Tesseract API instances, handed out to one caller at a time."""
+
+    name = 'tesserocr'
+
+    def __init__(self, size=POOL_SIZE, psm=PSM_SINGLE_BLOCK, lang=LANG):
+        self.size = size
+        self.psm = psm
+        self.lang = lang
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                api = tesserocr.PyTessBaseAPI(lang=self.lang, psm=self.psm)
+                self._created += 1
+                return api
+        # All instances are busy: wait for one
+        return self._idle.get()
+
+    def image_to_data(self, image):
+        """Word boxes in the same layout as ``pytesseract.image_to_data(..., output_type=DICT)``."""
+        api = self._acquire()
+        try:
+            api.SetImage(Image.fromarray(np.ascontiguousarray(image)) if isinstance(image, np.ndarray) else image)
+            api.Recognize()
+            data = {field: [] for field in FIELDS}
+            iterator = api.GetIterator()
+            if iterator is None:
+                return data
+            level = tesserocr.RIL.WORD
+            for word in tesserocr.iterate_level(iterator, level):
+                text, box = word.GetUTF8Text(level), word.BoundingBox(level)
+                if text is None or box is None:
+                    continue
+                x1, y1, x2, y2 = box
+                for field, value in zip(FIELDS, (text, x1, y1, x2 - x1, y2 - y1, word.Confidence(level))):
+                    data[field].append(value)
+            return data
+        finally:
+            api.Clear()
+            self._idle.put(api)
+
+    def close(self):
+        with self._lock:
+            while self._created:
+                self._idle.get().End()
+                self._created -= 1
+
+
+def pool_size():
+    """``OCR_POOL_SIZE``: warm instances per process, and OCR threads per image (``text_regions.py``)."""
+    return int(os.getenv('OCR_POOL_SIZE', str(POOL_SIZE)))
+
+
+def engine_name(name=None):
+    """The engine ``name`` (default: ``OCR_ENGINE``) resolves to: ``tesserocr`` or ``cli``."""
+    name = name or os.getenv('OCR_ENGINE', 'auto')
+    if name == 'tesserocr' and tesserocr is None:
+        raise ImportError("OCR_ENGINE=tesserocr but the tesserocr package is not installed")
+    if name not in ('auto', 'tesserocr', 'cli'):
+        raise ValueError(f"Unknown OCR engine: {name}")
+    return 'tesserocr' if name != 'cli' and tesserocr is not None else 'cli'
+
+
+def check_engine(name=None):
+    """Validate ``OCR_ENGINE`` at startup and warn when ``auto`` falls back to a process per call."""
+    resolved = engine_name(name)
+    if resolved == 'cli' and (name or os.getenv('OCR_ENGINE', 'auto')) == 'auto':
+        print("WARNING: tesserocr is not installed; OCR starts one tesseract process per call. "
+              "Install it for warm Tesseract instances (see requirements.txt).")
+    return resolved
+
+
+def create_engine(name=None, size=None, psm=PSM_SINGLE_BLOCK):
+    """An OCR engine by name (``auto``, ``tesserocr`` or ``cli``); defaults come from the environment."""
+    if engine_name(name) == 'tesserocr':
+        return TesserocrPool(size or pool_size(), psm)
+    return CliEngine(psm)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(psm=PSM_SINGLE_BLOCK):
+    """The engine of this process for a page segmentation mode, created on first use."""
+    with _engines_lock:
+        engine = _engines.get(psm)
+        if engine is None:
+            engine = _engines[psm] = create_engine(psm=psm)
+            print(f"OCR engine: {engine.name} (pid {os.getpid()})")
+        return engine
+
+
+def image_to_data(image, psm=PSM_SINGLE_BLOCK):
+    """OCR word boxes of an image (``text``, ``left``, ``top``, ``width``, ``height``, ``conf`` lists)."""
+    return get_engine(psm).image_to_data(image)
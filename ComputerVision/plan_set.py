@@ -0,0 +1,121 @@
+"""Multi-page PDF plan sets: streamed, parallel rasterization and per-sheet analysis.
+
+Pages are rasterized a batch at a time with pdf2image, ``thread_count``
+pdftoppm processes per batch, straight to lossless grayscale PGM files at the
+OCR resolution (``paths_only``), so no list of PIL images is ever held in
+memory. Each raw sheet is handed to a worker process, which reads it once,
+downsamples it for the contour analysis and the display image (see
+``rasterize.py``) and runs OCR and contours with its own scale heuristic. Rendering pauses while ``max_in_flight`` sheets are
+waiting for analysis, so memory and scratch space are bounded by that number
+(plus one render batch), not by the page count.
+"""
+import os
+import tempfile
+from collections import deque
+
+import cv2
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from analysis_context import AnalysisContext
+from metrics import run_timed
+from rasterize import OCR_DPI, CONTOUR_DPI, downsample
+from vision import extract_dimensions_with_ocr, find_room_contours, apply_scale_heuristic
+
+RENDER_THREADS = 4  # pdftoppm processes per batch
+MAX_IN_FLIGHT = 8  # sheets rendered but not yet analyzed
+
+
+def pdf_page_count(pdf_path):
+    return int(pdfinfo_from_path(pdf_path)['Pages'])
+
+
+def iter_pdf_pages(pdf_path, output_folder, page_count, thread_count=RENDER_THREADS, dpi=OCR_DPI):
+    """Yield ``(page_number, raw_path)`` for every page, rendering ``thread_count`` pages at a time.
+
+    Raw sheets are saved as ``<pdf name>_p0001.pgm``, ... in ``output_folder``; ``analyze_sheet`` removes them.
+    """
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    for first in range(1, page_count + 1, thread_count):
+        last = min(first + thread_count - 1, page_count)
+        # pdf2image collects its output by listing the folder, so each batch gets a fresh one
+        with tempfile.TemporaryDirectory(dir=output_folder) as batch_folder:
+            paths = convert_from_path(pdf_path, dpi=dpi, first_page=first, last_page=last, thread_count=thread_count,
+                                      output_folder=batch_folder, fmt='ppm', grayscale=True, paths_only=True)
+            if len(paths) != last - first + 1:
+                raise RuntimeError(f"Expected pages {first}-{last} from {pdf_path}, got {len(paths)} images")
+            sheets = []
+            # pdf2image returns the files in page order
+            for page_number, path in zip(range(first, last + 1), paths):
+                sheet_path = os.path.join(output_folder, f"{stem}_p{page_number:04d}.pgm")
+                os.replace(path, sheet_path)
+                sheets.append((page_number, sheet_path))
+        yield from sheets
+
+
+def analyze_sheet(page_number, raw_path, ocr_dpi=OCR_DPI, contour_dpi=CONTOUR_DPI):
+    """OCR and contour analysis of one raw sheet render (runs in a worker process).
+
+    Writes the display image ``<pdf name>_p0001.png`` at ``contour_dpi`` and removes the raw render.
+    ``stage_timings`` maps ``ocr`` and ``opencv`` to ``(seconds, error)`` for the server's metrics.
+    """
+    ocr_gray = cv2.imread(raw_path, cv2.IMREAD_GRAYSCALE)
+    if ocr_gray is None:
+        raise ValueError(f"Could not read rendered page {page_number}: {raw_path}")
+    os.remove(raw_path)
+    image_path = os.path.splitext(raw_path)[0] + '.png'
+    contour_gray = downsample(ocr_gray, ocr_dpi, contour_dpi)
+    with AnalysisContext.from_render(ocr_gray, contour_gray, image_path) as context:
+        ocr_seconds, ocr_dimensions, ocr_error = run_timed(extract_dimensions_with_ocr, context, strict=True)
+        contour_seconds, contour_results, contour_error = run_timed(find_room_contours, context, strict=True)
+        ocr_dimensions = ocr_dimensions or []
+        opencv_results = apply_scale_heuristic(contour_results, ocr_dimensions)
+    for stage, error in (('OCR', ocr_error), ('OpenCV', contour_error)):
+        if error:
+            print(f"Sheet {page_number}: {stage} failed: {error}")
+    return {
+        'page': page_number,
+        'display_filename': os.path.basename(image_path),
+        'ocr_dimensions': ocr_dimensions,
+        'opencv_results': opencv_results,
+        'opencv_visual': opencv_results.get('visual_filename') if opencv_results else None,
+        'stage_timings': {'ocr': (ocr_seconds, ocr_error), 'opencv': (contour_seconds, contour_error)}
+    }
+
+
+def iter_sheet_results(pages, pool, max_in_flight=MAX_IN_FLIGHT, ocr_dpi=OCR_DPI, contour_dpi=CONTOUR_DPI):
+    """Analyze ``(page_number, raw_path)`` pairs on ``pool``; yields sheet results in page order."""
+    pending = deque()
+    for page_number, raw_path in pages:
+        pending.append(pool.submit(analyze_sheet, page_number, raw_path, ocr_dpi, contour_dpi))
+        # Back-pressure: stop rendering until the oldest sheet is done
+        while len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def aggregate_sheets(sheets):
+    """Totals over all sheets; areas only add up over sheets whose scale could be derived."""
+    scaled = [s for s in sheets if s['opencv_results'] and s['opencv_results']['calculated_area_sqm'] is not None]
+    return {
+        'sheets': len(sheets),
+        'sheets_with_scale': len(scaled),
+        'num_rooms': sum(s['opencv_results']['num_rooms'] for s in sheets if s['opencv_results']),
+        'calculated_area_sqm': sum(s['opencv_results']['calculated_area_sqm'] for s in scaled) if scaled else None,
+        'calculated_area_sqft': sum(s['opencv_results']['calculated_area_sqft'] for s in scaled) if scaled else None,
+        'ocr_dimensions': sum(len(s['ocr_dimensions']) for s in sheets)
+    }
+
+
+def analyze_plan_set(pdf_path, output_folder, pool, page_count=None, thread_count=RENDER_THREADS,
+                     max_in_flight=MAX_IN_FLIGHT, ocr_dpi=OCR_DPI, contour_dpi=CONTOUR_DPI):
+    """Rasterize and analyze every page of a PDF plan set; returns ``{'sheets': [...], 'aggregate': {...}}``."""
+    page_count = page_count or pdf_page_count(pdf_path)
+    print(f"Plan set: {page_count} pages in {pdf_path}, rendered at {ocr_dpi} DPI (contours at {contour_dpi} DPI)")
+    pages = iter_pdf_pages(pdf_path, output_folder, page_count, thread_count, ocr_dpi)
+    sheets = []
+    for sheet in iter_sheet_results(pages, pool, max_in_flight, ocr_dpi, contour_dpi):
+        rooms = sheet['opencv_results']['num_rooms'] if sheet['opencv_results'] else 0
+        print(f"Sheet {sheet['page']}/{page_count}: {rooms} rooms, {len(sheet['ocr_dimensions'])} OCR dimensions")
+        sheets.append(sheet)
+    return {'sheets': sheets, 'aggregate': aggregate_sheets(sheets)}
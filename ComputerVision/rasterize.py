@@ -0,0 +1,62 @@
+"""PDF rasterization tuned separately for OCR and for contour analysis.
+
+A page is rendered once, lossless and in grayscale (``pdftoppm -gray``, PGM),
+at a DPI suited to Tesseract on small dimension text. Large sheets get a lower
+DPI so the render stays within ``OCR_MAX_PIXELS``. The contour stage does not
+need that detail: it works on an area-averaged downsample to ``CONTOUR_DPI``,
+which is also the image shown to the user and sent to the model. No JPEG step
+is involved, so the adaptive threshold never sees compression artifacts.
+"""
+import math
+import re
+
+import cv2
+import numpy as np
+from pdf2image import convert_from_path
+
+OCR_DPI = 300  # Tesseract works best with text x-height around 20-30 px
+OCR_MAX_PIXELS = 80_000_000  # cap for large sheets, e.g. ARCH E at 300 DPI would be 155 MP
+CONTOUR_DPI = 100
+MIN_DPI = 72
+POINTS_PER_INCH = 72
+
+PAGE_SIZE = re.compile(r'([\d.]+)\s*x\s*([\d.]+)\s*pts')
+
+
+def page_size_inches(pdf_info):
+    """``(width, height)`` in inches from ``pdfinfo`` output, or ``None`` if it is missing."""
+    match = PAGE_SIZE.search(str(pdf_info.get('Page size', '')))
+    if not match:
+        return None
+    return float(match.group(1)) / POINTS_PER_INCH, float(match.group(2)) / POINTS_PER_INCH
+
+
+def choose_dpi(page_size, dpi, max_pixels):
+    """``dpi``, lowered if needed so a page of ``page_size`` inches stays within ``max_pixels``."""
+    if page_size is None:
+        return dpi
+    width, height = page_size
+    return max(MIN_DPI, min(dpi, int(math.sqrt(max_pixels / (width * height)))))
+
+
+def render_dpis(pdf_info, ocr_dpi=OCR_DPI, contour_dpi=CONTOUR_DPI, max_pixels=OCR_MAX_PIXELS):
+    """``(ocr_dpi, contour_dpi)`` for a PDF, from the size of its first page."""
+    ocr_dpi = choose_dpi(page_size_inches(pdf_info), ocr_dpi, max_pixels)
+    return ocr_dpi, min(contour_dpi, ocr_dpi)
+
+
+def render_page(pdf_path, page, dpi):
+    """Lossless grayscale render of one page as a uint8 array."""
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page, last_page=page, grayscale=True)
+    if not images:
+        raise ValueError(f"Could not render page {page} of {pdf_path}")
+    return np.asarray(images[0].convert('L'))
+
+
+def downsample(gray, from_dpi, to_dpi):
+    """Area-averaged resize of a ``from_dpi`` render to ``to_dpi``."""
+    if to_dpi >= from_dpi:
+        return gray
+    scale = to_dpi / from_dpi
+    size = (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale)))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
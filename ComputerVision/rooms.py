@@ -0,0 +1,165 @@
+"""Room segmentation of a thresholded floor plan, with per-room areas.
+
+Rooms are the free space between walls, so they are found on the inverted
+threshold directly rather than as outer contours:
+
+1. Components too small to be walls (text, symbols, hatching specks) are
+   dropped through a lookup table over the component labels.
+2. The walls are dilated by ``door_gap`` pixels, which closes door openings
+   and small breaks, and the free space left over is labelled.
+3. Free space outside the building is not a room: components touching the
+   image border, and those enclosing the wall component that holds the rooms
+   in the contour hierarchy (``RETR_TREE``), e.g. between the building and the
+   sheet frame. Free space inside a closed outline standing in a room (a
+   kitchen island, a tub) is not a room either; it counts towards the area of
+   the room around the fixture.
+4. A watershed grows the rooms back over the dilated band, so their areas
+   are not shrunk by the door closing; a door opening is split between the
+   two rooms it joins.
+5. All room areas come from one ``np.bincount`` over the label image.
+
+Sizes are in pixels of the contour image (about 100 DPI for rendered PDFs).
+"""
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+MIN_WALL_LENGTH = 20  # components shorter than this in both directions are text or symbols
+DOOR_GAP = 30  # openings up to this wide are closed (a 3 ft door at 1/8" = 1'-0" is ~37 px at 100 DPI)
+MIN_ROOM_AREA = 1000
+
+Room = namedtuple('Room', 'id area_pixels bbox centroid')
+RoomSegmentation = namedtuple('RoomSegmentation', 'labels rooms')
+
+
+def wall_mask(binary, min_length=MIN_WALL_LENGTH):
+    """The inverted threshold without components smaller than ``min_length`` in both directions."""
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    keep = np.maximum(stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]) >= min_length
+    keep[0] = False
+    return (keep[labels] * np.uint8(255)).astype(np.uint8)
+
+
+def classify_free_space(free, labels, areas, at_border, min_area=MIN_ROOM_AREA):
+    """``(exterior, fixtures)``: free-space labels outside the building, and ``{label: room label}`` inside fixtures.
+
+    Uses the ``RETR_TREE`` hierarchy of ``free``, in which free components and the wall components in
+    their holes alternate. The wall component that holds the rooms is the one whose holes directly contain
+    the most (at least two) free components of ``min_area`` or more; everything around it is exterior,
+    like the components ``at_border``. Free components whose nearest enclosing free component is a room
+    (or another fixture) are inside a fixture outline and belong to that room.
+    """
+    contours, hierarchy = cv2.findContours(free, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    exterior = {int(label) for label in np.flatnonzero(at_border)}
+    if hierarchy is None:
+        return exterior, {}
+    parent = hierarchy[0][:, 3]  # rows of the hierarchy: next, previous, first child, parent
+    depth = np.full(len(parent), -1)
+    for index in range(len(parent)):
+        chain = [index]
+        while depth[chain[-1]] < 0 and parent[chain[-1]] != -1:
+            chain.append(parent[chain[-1]])
+        base = depth[chain[-1]] if depth[chain[-1]] >= 0 else 0
+        for offset, node in enumerate(reversed(chain)):
+            depth[node] = base + offset
+    # Even depths are the outer boundaries of free components, odd depths their holes (wall components)
+    label_of = {}
+    for index in np.flatnonzero(depth % 2 == 0):
+        x, y = contours[index][0][0]
+        label_of[index] = int(labels[y, x])
+
+    # The wall component holding the rooms, and the free space around it
+    rooms_in = {}
+    for index, label in label_of.items():
+        if parent[index] != -1 and areas[label] >= min_area and label not in exterior:
+            count, total = rooms_in.get(parent[index], (0, 0))
+            rooms_in[parent[index]] = (count + 1, total + int(areas[label]))
+    holder = max(rooms_in, key=rooms_in.get, default=None)
+    if holder is not None and rooms_in[holder][0] >= 2:
+        node = parent[holder]
+        while node != -1:
+            exterior.add(label_of[node])
+            node = parent[parent[node]] if parent[node] != -1 else -1
+
+    fixtures, inside_room = {}, set()
+    for index in sorted(label_of, key=lambda index: depth[index]):
+        label = label_of[index]
+        if label in exterior:
+            continue
+        enclosing = label_of[parent[parent[index]]] if parent[index] != -1 else None
+        if enclosing in inside_room:
+            fixtures[label] = enclosing
+        elif enclosing in fixtures:
+            fixtures[label] = fixtures[enclosing]
+        else:
+            inside_room.add(label)
+    return exterior, fixtures
+
+
+def segment_rooms(binary, door_gap=DOOR_GAP, min_area=MIN_ROOM_AREA, min_wall_length=MIN_WALL_LENGTH):
+    """Rooms of an inverted threshold (walls are foreground), largest first.
+
+    Returns a ``RoomSegmentation``: the watershed label image and the ``Room`` list. Only the
+    labels listed as room ids are rooms; the others are walls, exterior or too small, and
+    watershed boundaries are -1.
+    """
+    walls = wall_mask(binary, min_wall_length)
+    closed = cv2.dilate(walls, cv2.getStructuringElement(cv2.MORPH_RECT, (door_gap, door_gap)))
+    free = cv2.bitwise_not(closed)
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(free, connectivity=8)
+
+    # Grow every free component back over the dilated band; walls keep their own marker
+    wall_marker = count
+    markers = labels.astype(np.int32)
+    markers[walls > 0] = wall_marker
+    cv2.watershed(cv2.cvtColor(walls, cv2.COLOR_GRAY2BGR), markers)
+
+    # Per-label areas in one pass (watershed boundaries are -1, shifted to bin 0)
+    areas = np.bincount(markers.ravel() + 1, minlength=count + 2)[1:count + 1]
+    height, width = binary.shape[:2]
+    left, top = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+    at_border = (left == 0) | (top == 0) | (left + stats[:, cv2.CC_STAT_WIDTH] == width) | \
+                (top + stats[:, cv2.CC_STAT_HEIGHT] == height)
+    at_border[0] = False  # label 0 is the dilated walls, never a room anyway
+    exterior, fixtures = classify_free_space(free, labels, areas, at_border, min_area)
+    if fixtures:
+        # Fixture interiors take the label of their room (the lookup is shifted by one for the -1 boundaries)
+        relabel = np.arange(-1, count + 1, dtype=np.int32)
+        for fixture, room in fixtures.items():
+            relabel[fixture + 1] = room
+            areas[room] += areas[fixture]
+        markers = relabel[markers + 1]
+    is_room = areas >= min_area
+    is_room[0] = False
+    is_room[list(exterior | fixtures.keys())] = False
+
+    # Bounding boxes of the grown rooms: the free component's box widened by the band
+    grow = door_gap // 2 + 1
+    x0 = np.clip(stats[:, cv2.CC_STAT_LEFT] - grow, 0, width)
+    y0 = np.clip(stats[:, cv2.CC_STAT_TOP] - grow, 0, height)
+    x1 = np.clip(stats[:, cv2.CC_STAT_LEFT] + stats[:, cv2.CC_STAT_WIDTH] + grow, 0, width)
+    y1 = np.clip(stats[:, cv2.CC_STAT_TOP] + stats[:, cv2.CC_STAT_HEIGHT] + grow, 0, height)
+
+    room_ids = np.flatnonzero(is_room)
+    room_ids = room_ids[np.argsort(-areas[room_ids], kind='stable')]
+    rooms = [Room(int(i), int(areas[i]), (int(x0[i]), int(y0[i]), int(x1[i] - x0[i]), int(y1[i] - y0[i])),
+                  (float(centroids[i][0]), float(centroids[i][1])))
+             for i in room_ids]
+    return RoomSegmentation(markers, rooms)
+
+
+def draw_rooms(image, segmentation, alpha=0.35, seed=0):
+    """Tint every room of ``segmentation`` with its own color on a BGR ``image`` (in place)."""
+    if not segmentation.rooms:
+        return image
+    labels = segmentation.labels
+    palette = np.zeros((int(labels.max()) + 2, 3), np.uint8)
+    is_room = np.zeros(len(palette), bool)
+    room_ids = np.array([room.id for room in segmentation.rooms])
+    palette[room_ids + 1] = np.random.default_rng(seed).integers(64, 256, (len(room_ids), 3), dtype=np.uint8)
+    is_room[room_ids + 1] = True
+    index = labels + 1  # boundaries (-1) map to entry 0
+    tinted = cv2.addWeighted(image, 1 - alpha, np.take(palette, index, axis=0), alpha, 0)
+    np.copyto(image, tinted, where=np.take(is_room, index)[..., None])
+    return image
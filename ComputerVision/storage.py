@@ -0,0 +1,191 @@
+"""Per-upload folders under the uploads folder, and a background janitor that evicts old ones.
+
+Every upload gets its own folder, ``<uploads>/<upload id>/``, which holds the
+uploaded file and everything derived from it (converted PDF pages, OpenCV
+visualizations). Analyses never share a folder, so a request only creates its
+own folder and never lists or deletes anything else: its cost does not grow
+with the number of stored files, and one user's analysis cannot remove the
+images of another that is still running.
+
+Old folders are removed by a single janitor thread every ``interval`` seconds:
+first those not used for ``ttl`` seconds, then the least recently used ones
+while the uploads folder is above ``quota_bytes``. A folder is "used" when a
+file is written to it or it is ``touch``-ed (follow-up questions do this).
+Folders ``pin``-ned by a queued or running analysis are never evicted, however
+old or large.
+
+Usage:
+    python storage.py static/uploads              # show folders, ages and sizes
+    python storage.py static/uploads --sweep --ttl 3600 --quota-mb 1024
+"""
+import argparse
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter
+
+TTL_SECONDS = 24 * 3600
+QUOTA_BYTES = 1024 * 1024 * 1024
+SWEEP_INTERVAL = 60
+
+
+def tree_size(path):
+    """Total size in bytes of the files under ``path`` (or of ``path`` itself if it is a file)."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                total += tree_size(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
+class UploadStore:
+    """Upload folders under ``root``, evicted by age and total size."""
+
+    def __init__(self, root, ttl=TTL_SECONDS, quota_bytes=QUOTA_BYTES, interval=SWEEP_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.ttl = ttl
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        self._pins = Counter()
+        self._sizes = {}  # name -> (mtime_ns, size); folders are only re-measured after they change
+        self._lock = threading.Lock()
+        self._thread = None
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self):
+        """A new, pinned upload folder; returns ``(upload_id, folder_path)``."""
+        upload_id = uuid.uuid4().hex[:12]
+        folder = os.path.join(self.root, upload_id)
+        with self._lock:
+            self._pins[upload_id] += 1
+            self._start()
+        os.makedirs(folder)
+        return upload_id, folder
+
+    def relative(self, path):
+        """``path`` relative to the uploads folder, with forward slashes (as used in URLs)."""
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def path(self, relative):
+        """Absolute path of a file given relative to the uploads folder, or None if it points outside."""
+        full = os.path.abspath(os.path.join(self.root, relative))
+        if os.path.dirname(full) == self.root or not full.startswith(self.root + os.sep):
+            return None  # outside the uploads folder, or not inside an upload folder
+        return full
+
+    def upload_id(self, relative):
+        """The upload folder a relative file path belongs to, or None if it points outside the uploads folder."""
+        normalized = os.path.normpath(relative.replace('/', os.sep))
+        first = normalized.split(os.sep, 1)[0]
+        if os.path.isabs(normalized) or first in (os.curdir, os.pardir):
+            return None
+        return first
+
+    def pin(self, upload_id):
+        """Keep the folder from being evicted until a matching ``unpin``."""
+        with self._lock:
+            self._pins[upload_id] += 1
+
+    def unpin(self, upload_id):
+        """Release a ``pin`` and mark the folder as used."""
+        self.touch(upload_id)
+        with self._lock:
+            self._pins[upload_id] -= 1
+            if self._pins[upload_id] <= 0:
+                del self._pins[upload_id]
+
+    def touch(self, upload_id):
+        """Mark the folder as just used, restarting its time to live."""
+        try:
+            os.utime(os.path.join(self.root, upload_id))
+        except OSError:
+            pass
+
+    def entries(self):
+        """``(name, mtime, size)`` of every folder (and stray file) in the uploads folder, oldest first."""
+        entries = []
+        sizes = {}
+        with os.scandir(self.root) as scan:
+            for entry in scan:
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                    cached = self._sizes.get(entry.name)
+                    if cached and cached[0] == stat.st_mtime_ns:
+                        size = cached[1]
+                    else:
+                        size = tree_size(entry.path)
+                except OSError:
+                    continue  # removed while scanning
+                sizes[entry.name] = (stat.st_mtime_ns, size)
+                entries.append((entry.name, stat.st_mtime, size))
+        self._sizes = sizes
+        entries.sort(key=lambda entry: entry[1])
+        return entries
+
+    def sweep(self, now=None):
+        """Evict expired folders, then the oldest ones until under the quota; returns the evicted names."""
+        now = now or time.time()
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        with self._lock:
+            pinned = set(self._pins)
+        evicted = []
+        for name, mtime, size in entries:
+            if name in pinned:
+                continue
+            if mtime > now - self.ttl and total <= self.quota_bytes:
+                break  # the rest are newer
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError as e:
+                print(f"Error evicting upload {name}: {e}")
+                continue
+            total -= size
+            self._sizes.pop(name, None)
+            evicted.append(name)
+        if evicted:
+            print(f"Evicted {len(evicted)} upload folder(s); {total / 1e6:.1f} MB in use")
+        return evicted
+
+    def _start(self):
+        # Started on the first upload, so importing the module (or the Flask reloader's parent) does not spawn it
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='upload-janitor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Upload janitor error: {e}")
+            time.sleep(self.interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clean an uploads folder.")
+    parser.add_argument("root")
+    parser.add_argument("--sweep", action="store_true", help="Evict expired folders and enforce the quota")
+    parser.add_argument("--ttl", type=int, default=TTL_SECONDS)
+    parser.add_argument("--quota-mb", type=int, default=QUOTA_BYTES // (1024 * 1024))
+    args = parser.parse_args()
+
+    store = UploadStore(args.root, ttl=args.ttl, quota_bytes=args.quota_mb * 1024 * 1024)
+    if args.sweep:
+        store.sweep()
+    now = time.time()
+    entries = store.entries()
+    for name, mtime, size in entries:
+        print(f"{name:<16} {(now - mtime) / 60:>8.1f} min {size / 1e6:>9.2f} MB")
+    print(f"{len(entries)} entries, {sum(size for _, _, size in entries) / 1e6:.2f} MB")
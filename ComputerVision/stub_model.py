@@ -0,0 +1,103 @@
+"""Offline stand-in for the Gemini model, for tests and benchmarks without an API key.
+
+Select it with ``LLM_MODEL=stub`` (``LLM_STUB_LATENCY`` adds a fixed delay per
+call, ``LLM_STUB_UPLOAD_MBPS`` a delay for sending the image at that bandwidth,
+so payload size shows up in latency as it would with the real API). Prompts
+asking for a JSON object get a canned area estimate; any other prompt
+(follow-up questions) gets a canned answer.
+
+``generate_content(..., stream=True)`` streams the answer a few words at a
+time like the Gemini SDK, ``LLM_STUB_CHUNK_DELAY`` seconds apart (the latency
+and upload delays come before the first chunk).
+"""
+import json
+import os
+import time
+
+DEFAULT_ESTIMATE = {
+    "found_dimensions": False,
+    "estimated_area_sqft": "1500-1600 sq ft",
+    "estimated_area_sqm": "140-150 m²",
+    "explanation": "Stub model: fixed estimate, no image analysis."
+}
+DEFAULT_ANSWER = "Stub model: this is a canned answer to the follow-up question."
+WORDS_PER_CHUNK = 3
+
+
+class StubResponse:
+    """Mimics the parts of a Gemini response the app uses."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def resolve(self):
+        pass
+
+
+class StubStreamResponse:
+    """Mimics a streamed Gemini response: iterating yields chunks with a ``text`` each."""
+
+    def __init__(self, text, first_delay, chunk_delay):
+        words = text.split(' ')
+        self.chunks = [' '.join(words[i:i + WORDS_PER_CHUNK]) + (' ' if i + WORDS_PER_CHUNK < len(words) else '')
+                       for i in range(0, len(words), WORDS_PER_CHUNK)]
+        self.first_delay = first_delay
+        self.chunk_delay = chunk_delay
+        self._done = False
+
+    def __iter__(self):
+        for i, chunk in enumerate(self.chunks):
+            time.sleep(self.first_delay if i == 0 else self.chunk_delay)
+            yield StubResponse(chunk)
+        self._done = True
+
+    def resolve(self):
+        if not self._done:
+            for _ in self:
+                pass
+
+    @property
+    def text(self):
+        return ''.join(self.chunks)
+
+
+def payload_bytes(part):
+    """Bytes sent for one non-text part: an inline blob, raw bytes or a PIL image (sent as its file)."""
+    if isinstance(part, dict):
+        return len(part['data'])
+    if isinstance(part, (bytes, bytearray)):
+        return len(part)
+    filename = getattr(part, 'filename', None)
+    if filename and os.path.isfile(filename):
+        return os.path.getsize(filename)
+    return len(part.tobytes())
+
+
+class StubModel:
+    """``generate_content`` compatible model that answers locally after ``latency`` seconds.
+
+    With ``upload_mbps``, each call also waits for its image bytes to "upload" at that bandwidth.
+    Streamed answers wait ``chunk_delay`` seconds between chunks.
+    ``calls`` and ``bytes_sent`` count the calls and image bytes received.
+    """
+
+    def __init__(self, latency=0.0, estimate=None, answer=DEFAULT_ANSWER, upload_mbps=None, chunk_delay=0.0):
+        self.latency = latency
+        self.estimate = json.dumps(estimate or DEFAULT_ESTIMATE)
+        self.answer = answer
+        self.upload_mbps = upload_mbps
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self.bytes_sent = 0
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        self.calls += 1
+        sent = sum(payload_bytes(part) for part in contents if not isinstance(part, str))
+        self.bytes_sent += sent
+        upload = sent * 8 / (self.upload_mbps * 1e6) if self.upload_mbps else 0.0
+        prompt = next((part for part in contents if isinstance(part, str)), "")
+        text = self.estimate if "JSON object" in prompt else self.answer
+        if stream:
+            return StubStreamResponse(text, self.latency + upload, self.chunk_delay)
+        time.sleep(self.latency + upload)
+        return StubResponse(text)
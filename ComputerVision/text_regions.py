@@ -0,0 +1,153 @@
+"""Text-region detection and batched OCR of the regions.
+
+Plans are mostly linework, so Tesseract is not run over the whole sheet.
+Long horizontal and vertical strokes (walls, dimension and grid lines) are
+removed from the thresholded image, the remaining glyphs are smeared into word
+and line blobs, and blobs with a text-like size and fill become regions.
+Upright glyphs are taller than wide; a vertical blob of mostly wider-than-tall
+glyphs is rotated text (a dimension string along a wall).
+
+The regions are cropped (rotated upright, dark text on white) and packed one
+per row into a few mosaic images, which are OCRed in parallel threads with
+``image_to_data`` (see ``ocr_engine.py``). Every recognized word is mapped back
+to its region by its row in the mosaic, so each text string comes with its
+bounding box on the page. One Tesseract run per mosaic instead of one per crop
+keeps the per-call overhead out of the loop.
+"""
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import ocr_engine
+
+# Sizes in pixels of the OCR image (tuned for ~300 DPI renders)
+LINE_MIN_LENGTH = 60  # strokes at least this long are linework, not glyphs
+WORD_GAP = 30  # about one text height: joins a number with its unit into one region
+MIN_TEXT_HEIGHT = 8
+MAX_TEXT_HEIGHT = 150
+MIN_FILL, MAX_FILL = 0.05, 0.85  # glyph pixels per region box
+MIN_GLYPH = 4  # smaller specks (dots, noise) do not count towards a region's orientation
+PADDING = 4
+ROW_GAP = 20  # white space between regions in a mosaic
+MOSAIC_MAX_HEIGHT = 4000
+OCR_THREADS = ocr_engine.pool_size()  # one per warm Tesseract instance
+TESSERACT_PSM = ocr_engine.PSM_SINGLE_BLOCK  # each mosaic reads as a single block of lines
+
+
+def remove_linework(binary):
+    """Glyph pixels of an inverted binary image: long horizontal and vertical strokes removed."""
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT,
+                                                                                     (LINE_MIN_LENGTH, 1)))
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT,
+                                                                                   (1, LINE_MIN_LENGTH)))
+    return cv2.subtract(binary, cv2.bitwise_or(horizontal, vertical))
+
+
+def _blobs(glyphs, glyph_labels, glyph_aspects, kernel_size, vertical):
+    """Boxes ``(x, y, w, h, vertical)`` of the glyph blobs joined by a closing with ``kernel_size``.
+
+    Only blobs whose glyphs have the matching orientation are kept (median width/height
+    above 1 for vertical text, at most 1 for horizontal text).
+    """
+    joined = cv2.morphologyEx(glyphs, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, kernel_size))
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(joined, connectivity=8)
+    # Blob of every glyph (glyphs are a subset of their blob's pixels)
+    mask = glyph_labels > 0
+    blob_of_glyph = np.zeros(len(glyph_aspects), np.int32)
+    blob_of_glyph[glyph_labels[mask]] = labels[mask]
+    boxes = []
+    for blob, (x, y, w, h, _) in enumerate(stats[1:count], start=1):
+        text_height, length = (w, h) if vertical else (h, w)
+        if not MIN_TEXT_HEIGHT <= text_height <= MAX_TEXT_HEIGHT or length < MIN_TEXT_HEIGHT:
+            continue
+        # Vertical regions must span several glyphs
+        if vertical and length < 2 * text_height:
+            continue
+        fill = cv2.countNonZero(glyphs[y:y + h, x:x + w]) / float(w * h)
+        if not MIN_FILL <= fill <= MAX_FILL:
+            continue
+        aspects = glyph_aspects[blob_of_glyph == blob]
+        aspects = aspects[~np.isnan(aspects)]
+        if len(aspects) and (np.median(aspects) > 1) == vertical:
+            boxes.append((int(x), int(y), int(w), int(h), vertical))
+    return boxes
+
+
+def find_text_regions(binary):
+    """Candidate text regions ``(x, y, w, h, vertical)`` of an inverted binary image, in reading order."""
+    glyphs = remove_linework(binary)
+    _, glyph_labels, glyph_stats, _ = cv2.connectedComponentsWithStats(glyphs, connectivity=8)
+    widths, heights = glyph_stats[:, 2].astype(float), glyph_stats[:, 3].astype(float)
+    glyph_aspects = np.where(np.maximum(widths, heights) >= MIN_GLYPH, widths / heights, np.nan)
+    glyph_aspects[0] = np.nan  # background
+    boxes = (_blobs(glyphs, glyph_labels, glyph_aspects, (WORD_GAP, 3), False) +
+             _blobs(glyphs, glyph_labels, glyph_aspects, (3, WORD_GAP), True))
+    height, width = binary.shape[:2]
+    regions = []
+    for x, y, w, h, vertical in boxes:
+        x0, y0 = max(0, x - PADDING), max(0, y - PADDING)
+        x1, y1 = min(width, x + w + PADDING), min(height, y + h + PADDING)
+        regions.append((x0, y0, x1 - x0, y1 - y0, vertical))
+    regions.sort(key=lambda r: (r[1], r[0]))
+    return regions
+
+
+def build_mosaic(binary, regions):
+    """Stack the region crops, upright and dark on white, into one image; returns it and each row's top."""
+    crops = []
+    for x, y, w, h, vertical in regions:
+        crop = 255 - binary[y:y + h, x:x + w]
+        # Vertical dimension strings read bottom to top
+        crops.append(cv2.rotate(crop, cv2.ROTATE_90_CLOCKWISE) if vertical else crop)
+    width = max(crop.shape[1] for crop in crops) + 2 * ROW_GAP
+    height = sum(crop.shape[0] for crop in crops) + ROW_GAP * (len(crops) + 1)
+    mosaic = np.full((height, width), 255, np.uint8)
+    tops, top = [], ROW_GAP
+    for crop in crops:
+        mosaic[top:top + crop.shape[0], ROW_GAP:ROW_GAP + crop.shape[1]] = crop
+        tops.append(top)
+        top += crop.shape[0] + ROW_GAP
+    return mosaic, tops
+
+
+def ocr_mosaic(binary, regions):
+    """OCR a batch of regions in one Tesseract run; returns the text of each region."""
+    mosaic, tops = build_mosaic(binary, regions)
+    data = ocr_engine.image_to_data(mosaic, TESSERACT_PSM)
+    words = [[] for _ in regions]
+    for text, left, top, height in zip(data['text'], data['left'], data['top'], data['height']):
+        text = text.strip()
+        if not text:
+            continue
+        row = bisect.bisect_right(tops, top + height / 2) - 1
+        if row >= 0:
+            words[row].append((top, left, text))
+    # Order words within a region by line, then left to right
+    return [" ".join(text for _, _, text in sorted(row, key=lambda w: (round(w[0] / MIN_TEXT_HEIGHT), w[1])))
+            for row in words]
+
+
+def _batches(regions, threads):
+    """Split regions into mosaics: at most ``MOSAIC_MAX_HEIGHT`` tall, and at least one per thread."""
+    rows_height = sum((h if not vertical else w) + ROW_GAP for _, _, w, h, vertical in regions)
+    count = max(-(-rows_height // MOSAIC_MAX_HEIGHT), min(threads, len(regions)))
+    size = -(-len(regions) // count)
+    return [regions[i:i + size] for i in range(0, len(regions), size)]
+
+
+def ocr_text_regions(binary, regions=None, threads=OCR_THREADS):
+    """Text and bounding box ``(text, (x, y, w, h))`` of every region with recognized text.
+
+    Raises ``pytesseract.TesseractNotFoundError`` if Tesseract is missing (``RuntimeError`` with tesserocr).
+    """
+    if regions is None:
+        regions = find_text_regions(binary)
+    if not regions:
+        return []
+    batches = _batches(regions, threads)
+    with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+        texts = [text for batch_texts in pool.map(lambda batch: ocr_mosaic(binary, batch), batches)
+                 for text in batch_texts]
+    return [(text, region[:4]) for text, region in zip(texts, regions) if text]
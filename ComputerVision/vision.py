@@ -0,0 +1,275 @@
+"""OCR and OpenCV stages of the floor-plan analysis.
+
+Kept apart from the Flask app so worker processes can import them without
+loading Flask, Gemini or the app configuration.
+"""
+import os
+import platform
+
+import cv2
+import pytesseract
+from dotenv import load_dotenv
+
+from analysis_context import load_views
+from dimensions import UNIT_METERS, parse_dimensions
+from rooms import MIN_ROOM_AREA, segment_rooms, draw_rooms
+from text_regions import ocr_text_regions
+
+# TESSERACT_PATH may come from .env; load it here too since worker processes import this module on its own
+load_dotenv()
+
+# --- Configure Tesseract OCR ---
+# Check if running on Windows and set Tesseract path
+if platform.system() == 'Windows':
+    # Try to get path from environment variable first
+    tesseract_path = os.getenv('TESSERACT_PATH')
+    
+    # If not set, use common installation paths
+    if not tesseract_path:
+        common_paths = [
+            r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+            r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
+            r'C:\Tesseract-OCR\tesseract.exe'
+        ]
+        
+        for path in common_paths:
+            if os.path.exists(path):
+                tesseract_path = path
+                break
+    
+    # Set the path if found
+    if tesseract_path:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_path
+        print(f"Tesseract OCR path set to: {tesseract_path}")
+    else:
+        print("WARNING: Tesseract OCR executable not found. OCR functionality may not work.")
+        print("Please set the TESSERACT_PATH environment variable or install Tesseract in a standard location.")
+
+# Function to verify file exists and log result
+def verify_file_saved(filepath, context=""):
+    if os.path.exists(filepath):
+        file_size = os.path.getsize(filepath)
+        print(f"✓ File verified [{context}]: {filepath} ({file_size} bytes)")
+        return True
+    else:
+        print(f"✗ File NOT found [{context}]: {filepath}")
+        return False
+
+def extract_dimensions_with_ocr(image, strict=False):
+    """Use OCR to extract linear dimensions (metric, feet, inches and feet-inches).
+
+    Only the text regions of the plan are OCRed (see ``text_regions.py``). Returns
+    ``Dimension`` records (see ``dimensions.py``); their ``bbox`` is the ``(x, y, w, h)`` of the
+    text in the pixels of the contour image, so dimensions can be matched to contours.
+    ``image`` is a file path or a shared analysis context (see ``analysis_context.py``).
+    Errors are logged and give ``[]``; with ``strict`` they are raised, so the caller can count them.
+    """
+    extracted_dimensions = []
+    try:
+        # Check if Tesseract is properly configured
+        if platform.system() == 'Windows' and not hasattr(pytesseract.pytesseract, 'tesseract_cmd'):
+            if strict:
+                raise RuntimeError("Tesseract OCR path not set")
+            print("WARNING: Tesseract OCR path not set. OCR dimension extraction skipped.")
+            return []
+            
+        views = load_views(image)
+        if views is None:
+            if strict:
+                raise FileNotFoundError(f"Failed to read image for OCR: {image}")
+            print(f"Failed to read image for OCR: {image}")
+            return []
+
+        # Adaptive threshold; shared with the contour detection, or a higher-DPI render for PDFs
+        binary = views.ocr_binary
+        # Region boxes are reported in contour-image pixels
+        scale = views.binary.shape[1] / binary.shape[1]
+
+        try:
+            for text, (x, y, w, h) in ocr_text_regions(binary):
+                bbox = tuple(int(round(v * scale)) for v in (x, y, w, h))
+                extracted_dimensions.extend(parse_dimensions(text, bbox))
+
+            if not extracted_dimensions:
+                print("No linear dimensions (mm, cm, m, ft, in) found with OCR.")
+            else:
+                print(f"Found linear dimensions via OCR: {[(d.value, d.unit, d.raw) for d in extracted_dimensions]}")
+            
+            return extracted_dimensions
+            
+        except pytesseract.pytesseract.TesseractNotFoundError:
+            if strict:
+                raise
+            print("Tesseract executable not found. OCR dimension extraction skipped.")
+            return []
+            
+    except Exception as e:
+        if strict:
+            raise
+        print(f"OCR dimension extraction error: {e}")
+        return []
+
+def find_room_contours(image, strict=False):
+    """Find the plan outline and its rooms, save the visualization and return the pixel measurements.
+
+    ``area_pixels`` is the area inside the outer contours (the gross footprint); the rooms
+    segmented from the walls (see ``rooms.py``) are listed with their own areas under ``rooms``.
+
+    Independent of OCR, so it can run alongside it; ``apply_scale_heuristic`` adds the scale afterwards.
+    ``image`` is a file path or a shared analysis context (see ``analysis_context.py``).
+    Errors are logged and give ``None``; with ``strict`` they are raised, so the caller can count them.
+    """
+    try:
+        views = load_views(image)
+        if views is None:
+            if strict:
+                raise FileNotFoundError(f"Failed to read image for OpenCV: {image}")
+            return None
+        image_path = views.path
+            
+        visual_img = views.bgr.copy()
+        thresh = views.binary
+        
+        # Outer contours: the plan outline(s), used for the footprint and the scale heuristic
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        outline_contours = [cnt for cnt in contours if cv2.contourArea(cnt) > MIN_ROOM_AREA]
+        
+        if not outline_contours:
+            print("OpenCV: No significant contours found.")
+            return {
+                'visual_filename': None, # No visual if no contours
+                'area_pixels': 0,
+                'num_rooms': 0,
+                'rooms': [],
+                'room_area_pixels': 0,
+                'largest_contour_dimension_px': 0,
+                'largest_contour_bbox': None
+            }
+        
+        # Rooms: the free space between the walls, with door openings closed
+        segmentation = segment_rooms(thresh)
+        rooms = [room._asdict() for room in segmentation.rooms]
+        print(f"OpenCV: {len(rooms)} rooms segmented")
+
+        # Draw rooms and outlines
+        draw_rooms(visual_img, segmentation)
+        cv2.drawContours(visual_img, outline_contours, -1, (0, 255, 0), 2)
+        total_area_px = sum(cv2.contourArea(cnt) for cnt in outline_contours)
+
+        # Find the largest contour (its longest side is matched to the largest OCR dimension)
+        largest_contour = max(outline_contours, key=cv2.contourArea)
+        x, y, w, h = cv2.boundingRect(largest_contour)
+        largest_contour_dimension_px = max(w, h)
+        
+        # --- Save Visualization --- 
+        base_name = os.path.basename(image_path)
+        name_without_ext, ext = os.path.splitext(base_name)
+        visual_filename = f"{name_without_ext}_opencv{ext}"
+        visual_path = os.path.join(os.path.dirname(image_path), visual_filename)
+        
+        # Save visualization and verify
+        print(f"Saving OpenCV visualization to: {visual_path}")
+        cv2.imwrite(visual_path, visual_img)
+        if not verify_file_saved(visual_path, "OpenCV visualization"):
+            # If saving failed, try with a full absolute path
+            alt_visual_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                                          'static', 'uploads', visual_filename)
+            print(f"Attempt to save to alternative path: {alt_visual_path}")
+            cv2.imwrite(alt_visual_path, visual_img)
+            verify_file_saved(alt_visual_path, "OpenCV visualization (alt path)")
+            # Update the filename to reflect the new location
+            visual_filename = os.path.basename(alt_visual_path)
+        
+        return {
+            'visual_filename': visual_filename,
+            'area_pixels': total_area_px,
+            'num_rooms': len(rooms),
+            'rooms': rooms,
+            'room_area_pixels': sum(room['area_pixels'] for room in rooms),
+            'largest_contour_dimension_px': largest_contour_dimension_px,
+            'largest_contour_bbox': (x, y, w, h)
+        }
+        
+    except Exception as e:
+        if strict:
+            raise
+        print(f"OpenCV processing error: {e}")
+        import traceback
+        traceback.print_exc() # Print detailed traceback
+        return None
+
+def apply_scale_heuristic(contour_results, linear_dimensions):
+    """Combine the contour measurements with the OCR dimensions into the OpenCV results."""
+    if contour_results is None:
+        return None
+    results = dict(contour_results)
+    largest_contour_dimension_px = results.pop('largest_contour_dimension_px')
+    largest_contour_bbox = results.pop('largest_contour_bbox', None)
+    total_area_px = results['area_pixels']
+    if not results['area_pixels']:
+        return {**results, 'scale_used': None, 'calculated_area_sqm': None, 'calculated_area_sqft': None,
+                'calculated_room_area_sqm': None, 'calculation_method': 'No contours found'}
+
+    # --- Heuristic Scale Calculation --- 
+    scale_used = None
+    pixels_per_meter = None
+    calculated_area_sqm = None
+    calculated_area_sqft = None
+    calculated_room_area_sqm = None
+    calculation_method = "No linear dimensions found by OCR"
+    
+    if linear_dimensions:
+        # Convert all dimensions to meters for comparison
+        dimensions_in_meters = []
+        for val, unit, raw, *bbox in linear_dimensions:
+            if unit in UNIT_METERS:
+                dimensions_in_meters.append((val * UNIT_METERS[unit], raw, bbox[0] if bbox else None))
+        
+        # Prefer dimension text placed along the largest contour over text elsewhere on the sheet
+        located = [dim for dim in dimensions_in_meters if _near_box(dim[2], largest_contour_bbox)]
+        reference = "dimension text next to the largest contour" if located else "largest contour"
+        if dimensions_in_meters:
+            # Find the largest dimension provided by OCR
+            located_or_all = located or dimensions_in_meters
+            located_or_all.sort(key=lambda x: x[0], reverse=True)
+            largest_ocr_dimension_m, ocr_ref_text, _ = located_or_all[0]
+            
+            # Heuristic: Assume largest OCR dimension corresponds to largest contour dimension
+            if largest_ocr_dimension_m > 0 and largest_contour_dimension_px > 0:
+                pixels_per_meter = largest_contour_dimension_px / largest_ocr_dimension_m
+                scale_used = f"{pixels_per_meter:.2f} px/m (derived from OCR text '{ocr_ref_text}' and {reference})"
+                calculation_method = f"Heuristic scale ({scale_used}) applied to total pixel area."
+                print(f"OpenCV Scale Calculation: {scale_used}")
+                
+                # Calculate area
+                calculated_area_sqm = total_area_px / (pixels_per_meter ** 2)
+                calculated_area_sqft = calculated_area_sqm * 10.7639
+
+                # Same scale for every room
+                square_meters_per_pixel = 1 / pixels_per_meter ** 2
+                results['rooms'] = [{**room, 'area_sqm': room['area_pixels'] * square_meters_per_pixel}
+                                    for room in results.get('rooms', [])]
+                calculated_room_area_sqm = results.get('room_area_pixels', 0) * square_meters_per_pixel
+            else:
+                 calculation_method = "Could not derive scale (dimension or contour size zero)"
+        else:
+             calculation_method = "No valid metric dimensions found after conversion"
+
+    return {
+        **results,
+        'scale_used': scale_used,
+        'calculated_area_sqm': calculated_area_sqm,
+        'calculated_area_sqft': calculated_area_sqft,
+        'calculated_room_area_sqm': calculated_room_area_sqm,
+        'calculation_method': calculation_method
+    }
+
+def _near_box(text_bbox, box, margin=0.1):
+    """Whether a text box's center lies within ``box`` grown by ``margin`` of its longest side."""
+    if not text_bbox or not box:
+        return False
+    tx, ty, tw, th = text_bbox
+    x, y, w, h = box
+    grow = margin * max(w, h)
+    cx, cy = tx + tw / 2, ty + th / 2
+    return x - grow <= cx <= x + w + grow and y - grow <= cy <= y + h + grow
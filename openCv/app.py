@@ -1,11 +1,12 @@
 import cv2
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 from pathlib import Path
 
+from measure import measure_cracks
+from profiling import NULL_PROFILER, StageProfiler
+from report import CrackReportWriter
+from tiling import ArraySource, coarse_active_tiles, copy_raster, open_raster, measure_cracks_tiled
+
 # === PARAMETERS ===
 GSD = 0.5  # mm/pixel
 CLASS_THRESHOLDS = {
@@ -14,6 +15,21 @@ CLASS_THRESHOLDS = {
     "Medium": (1.0, 3.0),
     "Wide": (3.0, 100.0),
 }
+BLUR_KSIZE = (5, 5)
+CANNY_THRESHOLDS = (50, 150)
+DILATE_KSIZE = (3, 3)
+MIN_CRACK_AREA = 12  # px, filled cracks smaller than this are treated as noise
+MAX_CRACK_WIDTH = 60  # px, widest gap between two crack edges that is filled in as crack body
+WIDTH_OFFSET = 5  # px the edge mask adds to a crack's width (Canny edge position + dilation)
+TILE_SIZE = 4096  # px, core size of each window in tiled mode
+TILE_OVERLAP = 8  # px of context read around each tile (blur radius + Sobel + NMS)
+PYRAMID_FACTOR = 4  # downscale factor of the coarse pass in pyramid mode
+PYRAMID_TILE_SIZE = 512  # px, granularity of the regions refined at full resolution
+PYRAMID_BLUR_KSIZE = (3, 3)
+PYRAMID_CANNY_THRESHOLDS = (20, 40)  # permissive: the coarse pass only has to find where to look
+PYRAMID_MARGIN = 16  # px of context around each tile in the coarse pass
+OUTLINE_COLOR = (0, 255, 0)
+OUTPUT_FORMATS = ("image", "csv", "pdf")
 
 # === HELPER FUNCTIONS ===
 
@@ -23,87 +39,190 @@ def classify_crack(width_mm):
             return name
     return "Unknown"
 
-def analyze_cracks(image_path, output_folder):
-    img = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-    edges = cv2.Canny(blurred, 50, 150)
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-    dilated = cv2.dilate(edges, kernel, iterations=1)
-
-    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    output_img = img.copy()
-    data = []
-
-    for i, cnt in enumerate(contours):
-        area = cv2.contourArea(cnt)
-        if area < 5:  # skip small noise
-            continue
-
-        length_pixels = cv2.arcLength(cnt, False)
-        length_mm = length_pixels * GSD
-
-        x, y, w, h = cv2.boundingRect(cnt)
-        width_mm = max(w, h) * GSD
-        classification = classify_crack(width_mm)
-
-        # Draw contour and label
-        cv2.drawContours(output_img, [cnt], -1, (0, 255, 0), 1)
-        cv2.putText(output_img, f"{classification}", (x, y - 5),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1)
-
-        data.append({
-            "ID": i + 1,
-            "Length (mm)": round(length_mm, 2),
-            "Max Width (mm)": round(width_mm, 2),
-            "Classification": classification,
-            "X": x,
-            "Y": y
-        })
-
-    # === Save outputs ===
+def classify_cracks(widths_mm):
+    """Vectorised ``classify_crack`` over an array of widths."""
+    names = np.array(list(CLASS_THRESHOLDS) + ["Unknown"], dtype=object)
+    lows, highs = np.array(list(CLASS_THRESHOLDS.values()), dtype=float).T
+    order = np.argsort(lows)
+    index = order[np.clip(np.digitize(widths_mm, lows[order]) - 1, 0, None)]
+    inside = (widths_mm >= lows[index]) & (widths_mm < highs[index])
+    return names[np.where(inside, index, len(CLASS_THRESHOLDS))]
+
+def detect_edges(gray, profiler=NULL_PROFILER):
+    with profiler.stage("blur"):
+        blurred = cv2.GaussianBlur(gray, BLUR_KSIZE, 0)
+    with profiler.stage("canny"):
+        edges = cv2.Canny(blurred, *CANNY_THRESHOLDS)
+    with profiler.stage("dilate"):
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, DILATE_KSIZE)
+        return cv2.dilate(edges, kernel, iterations=1)
+
+def geometry_params():
+    """Parameters that change the detected crack geometry (the cache key, see ``cache.py``)."""
+    return {
+        "blur_ksize": BLUR_KSIZE,
+        "canny_thresholds": CANNY_THRESHOLDS,
+        "dilate_ksize": DILATE_KSIZE,
+        "min_crack_area": MIN_CRACK_AREA,
+        "max_crack_width": MAX_CRACK_WIDTH,
+        "width_offset": WIDTH_OFFSET,
+    }
+
+def outline_pixels(outline, rows):
+    """Flat indices of the non-zero pixels of ``outline``, scanned ``rows`` rows at a time."""
+    width = outline.shape[1]
+    parts = [np.flatnonzero(outline[y:y + rows]) + y * width for y in range(0, outline.shape[0], rows)]
+    return np.concatenate(parts) if parts else np.zeros(0, np.int64)
+
+def analyze_cracks(image_path, output_folder, tiled=False, tile_size=TILE_SIZE, pdf_mode="auto",
+                   cache=None, profile_capture=None, formats=OUTPUT_FORMATS, pyramid=False):
+    """Detect, measure and report cracks.
+
+    Cracks are measured in bulk by ``measure.py``: length along the skeleton and
+    true max/mean width from the distance transform. With ``tiled=True`` the image
+    is processed in overlapping ``tile_size`` windows (see ``tiling.py``) so
+    gigapixel orthomosaics fit in memory; the CSV and PDF match the single-shot
+    output. ``pdf_mode`` is ``"pages"``, ``"summary"`` or ``"auto"`` (see
+    ``report.py``). ``cache`` is an optional ``cache.CrackCache``; on a hit the
+    stored crack geometry is reused and only classification and reporting run.
+
+    Per-stage wall time, CPU time and allocated bytes are written to
+    ``crack_report_profile.json`` next to the CSV; ``profile_capture`` turns on
+    a cProfile and/or tracemalloc capture for this run (see ``profiling.py``).
+
+    With ``pyramid=True`` a cheap pass over a ``PYRAMID_FACTOR`` times smaller
+    copy finds the tiles that contain any edges, and the full-resolution chain
+    only runs there. On images with sparse cracks this skips most of the work;
+    the crack list is the same unless a crack is too faint for the coarse pass.
+
+    ``formats`` selects which of ``annotated_image.jpg`` (``"image"``), the CSV
+    and the PDF are written; the paths of skipped outputs are returned as ``None``.
+    """
+    unknown = set(formats) - set(OUTPUT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown output formats: {sorted(unknown)}")
     output_folder = Path(output_folder)
     output_folder.mkdir(parents=True, exist_ok=True)
+    profiler = StageProfiler(profile_capture)
+    with profiler:
+        paths, n_cracks, cache_hit = _analyze_cracks(image_path, output_folder, tiled, tile_size, pdf_mode,
+                                                     cache, profiler, formats, pyramid)
+    profiler.write(output_folder / "crack_report_profile.json", image=Path(image_path).name,
+                   mode=("tiled" if tiled else "single") + (" + pyramid" if pyramid else ""), cracks=n_cracks,
+                   cache_hit=cache_hit)
+    return paths
+
+def _analyze_cracks(image_path, output_folder, tiled, tile_size, pdf_mode, cache, profiler, formats, pyramid):
+    canvas_path = outline_path = output_img = None
+    annotate = "image" in formats
+
+    def measure(body, x0, y0):
+        # The tiled path hands over crack bodies with their gaps already filled
+        return measure_cracks(body, MIN_CRACK_AREA, None, WIDTH_OFFSET, outline, x0, y0, color=255)
+
+    def measure_tiled(source, tile_size, canvas):
+        active = None
+        if pyramid:
+            with profiler.stage("pyramid: coarse"):
+                active = coarse_active_tiles(source, tile_size, PYRAMID_FACTOR, PYRAMID_BLUR_KSIZE,
+                                             PYRAMID_CANNY_THRESHOLDS, PYRAMID_MARGIN)
+            print(f"Pyramid: refining {int(active.sum())} of {len(active)} tiles")
+        return measure_cracks_tiled(
+            source, output_folder / "edges.tmp.npy", tile_size, TILE_OVERLAP,
+            BLUR_KSIZE, CANNY_THRESHOLDS, DILATE_KSIZE, MAX_CRACK_WIDTH, measure, canvas=canvas,
+            profiler=profiler, active=active)
+
+    entry = key = None
+    if cache is not None:
+        with profiler.stage("cache lookup"):
+            key = cache.key(image_path, geometry_params())
+            entry = cache.get(key)
+
+    if tiled:
+        source = open_raster(image_path)
+        shape = (source.height, source.width)
+        # The annotated copy and the outline mask are file-backed so they never have to fit in RAM
+        if annotate:
+            canvas_path = output_folder / "annotated_image.tmp.npy"
+            output_img = np.lib.format.open_memmap(canvas_path, mode="w+", dtype=np.uint8, shape=shape + (3,))
+        try:
+            if entry is not None and annotate:
+                with profiler.stage("decode"):
+                    copy_raster(source, output_img, tile_size)
+            elif entry is None:
+                outline_path = output_folder / "outline.tmp.npy"
+                outline = np.lib.format.open_memmap(outline_path, mode="w+", dtype=np.uint8, shape=shape)
+                cracks = measure_tiled(source, tile_size, output_img)
+        finally:
+            source.close()
+    else:
+        with profiler.stage("decode"):
+            output_img = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+        if output_img is None:
+            raise FileNotFoundError(f"Could not read image: {image_path}")
+        shape = output_img.shape[:2]
+        if entry is None and pyramid:
+            outline = np.zeros(shape, np.uint8)
+            cracks = measure_tiled(ArraySource(output_img), PYRAMID_TILE_SIZE, None)
+        elif entry is None:
+            outline = np.zeros(shape, np.uint8)
+            gray = cv2.cvtColor(output_img, cv2.COLOR_BGR2GRAY)
+            edges = detect_edges(gray, profiler)
+            with profiler.stage("measure"):
+                cracks = measure_cracks(edges, MIN_CRACK_AREA, MAX_CRACK_WIDTH, WIDTH_OFFSET, outline, color=255)
+
+    if entry is not None:
+        cracks, pixels, cached_shape = entry
+        if cached_shape != shape:
+            raise ValueError(f"Cached result for {image_path} has shape {cached_shape}, image is {shape}")
+        print(f"Cache hit: {Path(image_path).name}")
+    else:
+        with profiler.stage("outline"):
+            pixels = outline_pixels(outline, tile_size)
+        del outline
+        if outline_path is not None:
+            outline_path.unlink()
+        if cache is not None:
+            with profiler.stage("cache store"):
+                cache.put(key, cracks, pixels, shape)
+
+    with profiler.stage("classify"):
+        length_mm = cracks['length'] * GSD
+        width_mm = cracks['max_width'] * GSD
+        mean_width_mm = cracks['mean_width'] * GSD
+        classifications = classify_cracks(width_mm)
 
+    # === Save outputs ===
     # Annotated image
-    annotated_path = output_folder / "annotated_image.jpg"
-    cv2.imwrite(str(annotated_path), output_img)
-
-    # CSV
-    df = pd.DataFrame(data)
-    csv_path = output_folder / "crack_report.csv"
-    df.to_csv(csv_path, index=False)
-
-    # PDF Report
-    pdf_path = output_folder / "crack_report.pdf"
-    c = canvas.Canvas(str(pdf_path), pagesize=A4)
-    c.setFont("Helvetica", 12)
-    c.drawString(50, 800, f"Crack Detection Report")
-    c.drawString(50, 785, f"Image: {Path(image_path).name}")
-    c.drawString(50, 770, f"GSD: {GSD} mm/pixel")
-    c.drawString(50, 755, f"Total Cracks: {len(df)}")
-
-    y = 730
-    for _, row in df.iterrows():
-        if y < 100:
-            c.showPage()
-            y = 800
-        c.drawString(50, y, f"ID: {row['ID']} | Length: {row['Length (mm)']} mm | Width: {row['Max Width (mm)']} mm | Class: {row['Classification']}")
-        y -= 15
-
-    c.save()
-
-    return str(annotated_path), str(csv_path), str(pdf_path)
-
-# === RUN EXAMPLE ===
-# Provide your image path and output folder below
-image_path = r"C:\Users\User\Desktop\upwork\openCV\bridge-crack-lauderdale-co-2.webp"  # Change to your input file
-output_folder = r"C:\Users\User\Desktop\upwork\openCV"
-
-# Run only if image file exists
-from pathlib import Path
-if Path(image_path).exists():
-    analyze_cracks(image_path, output_folder)
-else:
-    print("Image not found. Please update 'image_path'.")
+    annotated_path = None
+    if annotate:
+        with profiler.stage("annotate"):
+            output_img.reshape(-1, 3)[pixels] = OUTLINE_COLOR
+            for x, y, classification in zip(cracks['x'].tolist(), cracks['y'].tolist(), classifications):
+                cv2.putText(output_img, f"{classification}", (x, y - 5),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1)
+        annotated_path = output_folder / "annotated_image.jpg"
+        with profiler.stage("encode"):
+            cv2.imwrite(str(annotated_path), output_img)
+    if canvas_path is not None:
+        del output_img
+        canvas_path.unlink()
+
+    # CSV and PDF report, streamed in chunks (see report.py)
+    csv_path = output_folder / "crack_report.csv" if "csv" in formats else None
+    pdf_path = output_folder / "crack_report.pdf" if "pdf" in formats else None
+    if csv_path or pdf_path:
+        with profiler.stage("report"), \
+                CrackReportWriter(csv_path, pdf_path, Path(image_path).name, GSD,
+                                  list(CLASS_THRESHOLDS) + ["Unknown"], total=len(classifications),
+                                  pdf_mode=pdf_mode) as report:
+            report.write(length_mm, width_mm, mean_width_mm, classifications, cracks['x'], cracks['y'])
+
+    paths = tuple(str(path) if path else None for path in (annotated_path, csv_path, pdf_path))
+    return paths, len(classifications), entry is not None
+
+# === COMMAND LINE ===
+# See cli.py: python app.py <image> <output folder> [--gsd ...]
+if __name__ == "__main__":
+    from cli import main
+    main()
@@ -0,0 +1,129 @@
+"""Batch crack analysis over a whole inspection folder.
+
+Each image is analysed in its own worker process and written to
+``<output>/<image name>/``; the per-image CSVs are then merged into one
+``<output>/crack_report.csv`` with an extra ``Image`` column.
+
+Usage:
+    python batch.py "inspections/2024-05/*.jpg" output --workers 8
+"""
+import argparse
+import csv
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp', '.bmp', '.npy'}
+
+
+def collect_images(pattern):
+    """Expand a directory (non-recursive) or glob pattern into a sorted list of image paths."""
+    if os.path.isdir(pattern):
+        paths = Path(pattern).iterdir()
+    else:
+        paths = (Path(p) for p in glob.glob(pattern, recursive=True))
+    return sorted(p for p in paths if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def _output_folders(images, output_folder):
+    """One output folder per image, named after the file and de-duplicated."""
+    folders, seen = [], {}
+    for image in images:
+        name = image.name.replace('.', '_')
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{name}_{seen[name]}"
+        folders.append(Path(output_folder) / name)
+    return folders
+
+
+def _init_worker():
+    # One OpenCV thread per process: the pool already saturates the cores, and
+    # OpenCV's own thread pool would oversubscribe them and stop linear scaling.
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def _analyze_one(job):
+    image_path, output_folder, tiled, tile_size, pdf_mode, cache_folder, profile_capture, pyramid = job
+    from app import analyze_cracks
+    from cache import CrackCache
+    try:
+        cache = CrackCache(cache_folder) if cache_folder else None
+        _, csv_path, _ = analyze_cracks(image_path, output_folder, tiled=tiled, tile_size=tile_size,
+                                          pdf_mode=pdf_mode, cache=cache, profile_capture=profile_capture,
+                                          pyramid=pyramid)
+        return image_path, csv_path, None
+    except Exception as e:
+        return image_path, None, str(e)
+
+
+def run_batch(pattern, output_folder, workers=None, tiled=False, tile_size=None, pdf_mode="auto",
+              cache_folder=None, profile_capture=None, pyramid=False):
+    """Analyse every image matching ``pattern`` across ``workers`` processes.
+
+    With ``cache_folder``, unchanged images reuse their cached crack geometry
+    (see ``cache.py``). Returns the merged CSV path and a list of
+    ``(image_path, error)`` failures.
+    """
+    from app import TILE_SIZE
+
+    images = collect_images(pattern)
+    if not images:
+        raise FileNotFoundError(f"No images found for: {pattern}")
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    jobs = [(str(image), str(folder), tiled, tile_size or TILE_SIZE, pdf_mode, cache_folder,
+             profile_capture, pyramid)
+            for image, folder in zip(images, _output_folders(images, output_folder))]
+
+    workers = workers or os.cpu_count()
+    merged_path = output_folder / "crack_report.csv"
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool, \
+            open(merged_path, 'w', newline='') as merged:
+        writer = None
+        # map() keeps input order, so the merged report is deterministic
+        for done, (image_path, csv_path, error) in enumerate(pool.map(_analyze_one, jobs), 1):
+            if error:
+                print(f"[{done}/{len(jobs)}] FAILED {image_path}: {error}")
+                failures.append((image_path, error))
+                continue
+            print(f"[{done}/{len(jobs)}] {image_path}")
+            with open(csv_path, newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if not header:
+                    continue  # empty report file
+                if writer is None:
+                    writer = csv.writer(merged)
+                    writer.writerow(["Image"] + header)
+                name = Path(image_path).name
+                writer.writerows([name] + row for row in reader)
+
+    print(f"Merged report: {merged_path} ({len(jobs) - len(failures)} images, {len(failures)} failed)")
+    if cache_folder:
+        from cache import CrackCache
+        stats = CrackCache(cache_folder).stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    return str(merged_path), failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch crack analysis over a folder or glob of images.")
+    parser.add_argument("input", help="Directory or glob pattern, e.g. 'inspections/**/*.jpg'")
+    parser.add_argument("output", help="Output folder for per-image results and the merged report")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--tiled", action="store_true", help="Use the tiled, out-of-core mode per image")
+    parser.add_argument("--tile-size", type=int, default=None, help="Tile size in pixels for --tiled")
+    parser.add_argument("--pdf-mode", choices=("auto", "pages", "summary"), default="auto",
+                        help="Per-crack PDF pages, a per-class summary, or auto by crack count")
+    parser.add_argument("--cache", default=None, help="Folder for cached crack geometry (see cache.py)")
+    parser.add_argument("--profile", choices=("cprofile", "tracemalloc", "all"), default=None,
+                        help="Also capture a cProfile dump and/or tracemalloc allocation sites per image")
+    parser.add_argument("--pyramid", action="store_true",
+                        help="Coarse downscaled pass first; full-resolution detection only where it finds edges")
+    args = parser.parse_args()
+    run_batch(args.input, args.output, args.workers, args.tiled, args.tile_size, args.pdf_mode, args.cache,
+              args.profile, args.pyramid)
@@ -0,0 +1,192 @@
+"""Performance and accuracy benchmark for the crack pipeline on synthetic images.
+
+For every size, a synthetic image with known cracks (see ``synthetic.py``) is
+analysed in a fresh process, so peak RSS is per size. Stage timings come from
+the profile sidecar ``analyze_cracks`` writes (see ``profiling.py``); images
+above ``--tiled-above`` MP run in tiled mode, whose stages are the tiled passes.
+Measured cracks are compared with the ground truth (detection rate, length and
+width error).
+
+Results are printed as a table and written to JSON; with ``--baseline`` the run
+is compared to an earlier JSON and regressions in stage times, peak RSS,
+detection rate, length or width error are flagged (exit status 1).
+
+Usage:
+    python benchmark.py --sizes 1 4 16 64 400 --output bench.json
+    python benchmark.py --sizes 1 4 16 --baseline bench.json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TIME_TOLERANCE = 1.2  # a stage (or peak RSS) may grow 20% over the baseline before it is flagged
+ACCURACY_TOLERANCE = 0.02  # absolute slack on detection rate, relative length error and width error (px)
+RSS_SLACK_MB = 10  # ignore peak RSS growth below this, like the 10 ms floor on stage times
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or ``None`` when unavailable."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().peak_wset / (1 << 20)
+
+
+def _run(image_path, output_folder, tiled):
+    """Run ``analyze_cracks``; returns the cracks in pixels and the stage timings from its profile sidecar."""
+    import app
+    from measure import FIELDS
+
+    _, csv_path, _ = app.analyze_cracks(image_path, output_folder, tiled=tiled)
+    profile = json.loads((Path(output_folder) / "crack_report_profile.json").read_text())
+    stages = {stage["name"]: stage["wall_s"] for stage in profile["stages"]}
+    # Recover pixel geometry from the report: benchmark accuracy in the same units as the ground truth
+    table = np.genfromtxt(csv_path, delimiter=",", names=True, dtype=None, encoding=None, ndmin=1)
+    cracks = {field: np.zeros(len(table)) for field in FIELDS}
+    if len(table):
+        cracks.update(length=table["Length_mm"] / app.GSD, max_width=table["Max_Width_mm"] / app.GSD,
+                      mean_width=table["Mean_Width_mm"] / app.GSD, x=table["X"], y=table["Y"])
+    return cracks, stages
+
+
+def accuracy(cracks, truth, cell):
+    """Compare detections with the ground truth, one crack per grid cell.
+
+    The largest detection whose anchor ``(x, y)`` lies in a crack's cell is its
+    match; any other detection counts as a false positive.
+    """
+    found, length_error, width_error = 0, [], []
+    cells = {}
+    for i, (x, y) in enumerate(zip(np.asarray(cracks['x']).tolist(), np.asarray(cracks['y']).tolist())):
+        cells.setdefault((int(x) // cell, int(y) // cell), []).append(i)
+    for crack in truth:
+        candidates = cells.get(tuple(crack["cell"]), [])
+        if not candidates:
+            continue
+        best = max(candidates, key=lambda i: cracks['length'][i])
+        found += 1
+        length_error.append(abs(cracks['length'][best] - crack["length"]) / crack["length"])
+        width_error.append(abs(cracks['mean_width'][best] - crack["width"]))
+    return {
+        "detection_rate": found / len(truth) if truth else 1.0,
+        "false_positives": len(cracks['length']) - found,
+        "length_error_median": float(np.median(length_error)) if length_error else None,
+        "length_error_p95": float(np.percentile(length_error, 95)) if length_error else None,
+        "width_error_px_mean": float(np.mean(width_error)) if width_error else None,
+    }
+
+
+def run_size(megapixels, image_path, tiled):
+    """Analyse and score one generated image (runs in a fresh worker process)."""
+    image_path = Path(image_path)
+    truth = json.loads(image_path.with_suffix(".json").read_text())
+    output_folder = image_path.parent / f"out_{megapixels:g}mp"
+    output_folder.mkdir(exist_ok=True)
+    cracks, stages = _run(image_path, output_folder, tiled)
+    return {
+        "megapixels": megapixels,
+        "mode": "tiled" if tiled else "single",
+        "cracks_true": len(truth["cracks"]),
+        "cracks_found": len(cracks['length']),
+        "stages_s": stages,
+        "total_s": sum(stages.values()),
+        "peak_rss_mb": peak_rss_mb(),
+        **accuracy(cracks, truth["cracks"], truth["cell"]),
+    }
+
+
+def regressions(results, baseline):
+    """Human-readable list of slowdowns and accuracy losses against a baseline run."""
+    previous = {(r["megapixels"], r["mode"]): r for r in baseline}
+    problems = []
+    for result in results:
+        before = previous.get((result["megapixels"], result["mode"]))
+        if before is None:
+            continue
+        label = f"{result['megapixels']:g} MP {result['mode']}"
+        for name, seconds in result["stages_s"].items():
+            old = before["stages_s"].get(name)
+            if old and seconds > TIME_TOLERANCE * old and seconds - old > 0.01:
+                problems.append(f"{label}: {name} {old:.3f}s -> {seconds:.3f}s")
+        if result["detection_rate"] < before["detection_rate"] - ACCURACY_TOLERANCE:
+            problems.append(f"{label}: detection rate {before['detection_rate']:.3f} -> {result['detection_rate']:.3f}")
+        old, new = before["length_error_median"], result["length_error_median"]
+        if old is not None and new is not None and new > old + ACCURACY_TOLERANCE:
+            problems.append(f"{label}: median length error {old:.3f} -> {new:.3f}")
+        old, new = before.get("width_error_px_mean"), result["width_error_px_mean"]
+        if old is not None and new is not None and new > old + ACCURACY_TOLERANCE:
+            problems.append(f"{label}: mean width error {old:.2f} px -> {new:.2f} px")
+        old, new = before.get("peak_rss_mb"), result["peak_rss_mb"]
+        if old is not None and new is not None and new > TIME_TOLERANCE * old and new - old > RSS_SLACK_MB:
+            problems.append(f"{label}: peak RSS {old:.0f} MB -> {new:.0f} MB")
+    return problems
+
+
+def print_table(results):
+    stage_names = list(dict.fromkeys(name for r in results for name in r["stages_s"]))
+    header = ["MP", "mode", "found/true", *stage_names, "total s", "RSS MB", "det.", "len err", "width err px"]
+    print(" | ".join(header))
+    for r in results:
+        stages = [f"{r['stages_s'][name]:.3f}" if name in r["stages_s"] else "-" for name in stage_names]
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "-"
+        length = f"{r['length_error_median']:.3f}" if r["length_error_median"] is not None else "-"
+        width = f"{r['width_error_px_mean']:.2f}" if r["width_error_px_mean"] is not None else "-"
+        print(" | ".join([f"{r['megapixels']:g}", r["mode"], f"{r['cracks_found']}/{r['cracks_true']}", *stages,
+                          f"{r['total_s']:.3f}", rss, f"{r['detection_rate']:.3f}", length, width]))
+
+
+def run_benchmark(sizes, tiled_above=64, workdir=None, seed=0):
+    import synthetic
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for megapixels in sizes:
+            tiled = megapixels > tiled_above
+            image_path = Path(tmp) / (f"synthetic_{megapixels:g}mp" + (".npy" if tiled else ".png"))
+            start = time.perf_counter()
+            synthetic.generate(megapixels, image_path, seed)
+            generate_time = time.perf_counter() - start
+            # A fresh process per size keeps generation and earlier sizes out of its peak RSS
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(run_size, megapixels, str(image_path), tiled).result()
+            result["generate_s"] = generate_time
+            image_path.unlink()
+            print(f"{megapixels:g} MP: {result['total_s']:.2f}s", flush=True)
+            results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the crack pipeline on synthetic images.")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 16], help="Image sizes in MP")
+    parser.add_argument("--tiled-above", type=float, default=64, help="Use tiled mode above this many MP")
+    parser.add_argument("--output", default="benchmark.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=None, help="Earlier JSON results to check for regressions")
+    parser.add_argument("--workdir", default=None, help="Scratch folder for generated images (default: temp)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.tiled_above, args.workdir, args.seed)
+    print_table(results)
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        problems = regressions(results, json.loads(Path(args.baseline).read_text()))
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        sys.exit(1 if problems else 0)
@@ -0,0 +1,138 @@
+"""On-disk cache of measured crack geometry.
+
+Entries are keyed by the SHA-256 of the image file plus every parameter that
+changes the detected geometry (blur, Canny, dilation, area and width settings).
+They hold the crack records in pixels and the outline pixels of the annotated
+image, so a re-run only has to convert to millimetres, classify and write the
+reports. ``GSD`` and ``CLASS_THRESHOLDS`` are applied after loading and are
+therefore not part of the key: changing them still hits the cache.
+
+Entries are ``<key>.npz`` files; a hit refreshes the file's mtime and the least
+recently used entries are evicted once the directory exceeds ``max_bytes``.
+
+Usage:
+    python cache.py .crack_cache            # show entries, size and hit/miss counts
+    python cache.py .crack_cache --clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from measure import FIELDS
+
+CACHE_VERSION = 1  # bump when the measurement code changes its results
+MAX_BYTES = 1 << 30
+HASH_CHUNK = 1 << 20
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CrackCache:
+    """LRU, size-bounded cache of ``(records, outline_pixels, shape)`` per image and parameters."""
+
+    def __init__(self, folder, max_bytes=MAX_BYTES):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._stats_path = self.folder / "stats.json"
+
+    def key(self, image_path, params):
+        """Cache key for an image file and a dict of geometry parameters."""
+        payload = json.dumps({"version": CACHE_VERSION, "image": file_digest(image_path), "params": params},
+                             sort_keys=True, default=list)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Return ``(records, outline, shape)`` or ``None``; ``outline`` holds flat pixel indices."""
+        path = self.folder / f"{key}.npz"
+        try:
+            with np.load(path) as entry:
+                records = {field: entry[field] for field in FIELDS}
+                outline, shape = entry["outline"], tuple(entry["shape"].tolist())
+            os.utime(path)  # mark as recently used
+        except (OSError, KeyError, ValueError):
+            self._count("misses")
+            return None
+        self._count("hits")
+        return records, outline, shape
+
+    def put(self, key, records, outline, shape):
+        # Write to a temporary file first so concurrent batch workers never see a partial entry
+        fd, tmp = tempfile.mkstemp(suffix=".npz.tmp", dir=self.folder)
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, outline=outline, shape=np.asarray(shape), **records)
+        os.replace(tmp, self.folder / f"{key}.npz")
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for path in self.folder.glob("*.npz"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue  # evicted by another process
+            entries.append((st.st_mtime, st.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in ``max_bytes``."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self._count("evictions")
+
+    def clear(self):
+        for _, _, path in self._entries():
+            path.unlink(missing_ok=True)
+        self._stats_path.unlink(missing_ok=True)
+
+    def _count(self, name):
+        # Best effort: counters shared by concurrent processes may lose an increment
+        stats = self._read_stats()
+        stats[name] = stats.get(name, 0) + 1
+        tmp = self._stats_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(stats))
+        os.replace(tmp, self._stats_path)
+
+    def _read_stats(self):
+        try:
+            return json.loads(self._stats_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def stats(self):
+        """Hit/miss/eviction counters plus the current number and size of entries."""
+        entries = self._entries()
+        stats = {"hits": 0, "misses": 0, "evictions": 0, **self._read_stats()}
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(entries=len(entries), bytes=sum(size for _, size, _ in entries),
+                     max_bytes=self.max_bytes, hit_rate=stats["hits"] / lookups if lookups else 0.0)
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the crack analysis cache.")
+    parser.add_argument("folder", help="Cache folder")
+    parser.add_argument("--clear", action="store_true", help="Delete all entries and counters")
+    args = parser.parse_args()
+    cache = CrackCache(args.folder)
+    if args.clear:
+        cache.clear()
+    for name, value in cache.stats().items():
+        print(f"{name}: {value}")
@@ -0,0 +1,87 @@
+"""Command line entry point for crack analysis.
+
+Only ``argparse`` is imported at start-up; OpenCV and NumPy load once the
+arguments are valid, and reportlab only when a PDF is requested, so ``--help``
+and argument errors return immediately.
+
+Usage:
+    python cli.py deck.jpg output
+    python cli.py deck.jpg output --gsd 0.8 --formats csv
+    python cli.py deck.jpg output --thresholds "Hairline=0:0.3,Fine=0.3:1,Medium=1:3,Wide=3:100"
+    python cli.py orthomosaic.tif output --tiled --pdf-mode summary
+    python cli.py sparse_deck.tif output --pyramid
+"""
+import argparse
+
+FORMATS = ("image", "csv", "pdf")  # mirrors app.OUTPUT_FORMATS without importing app
+
+
+def parse_thresholds(text):
+    """``"Name=low:high,..."`` -> ``{"Name": (low, high), ...}`` in mm."""
+    thresholds = {}
+    for item in text.split(","):
+        try:
+            name, bounds = item.split("=")
+            low, high = (float(value) for value in bounds.split(":"))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Expected Name=low:high, got {item!r}")
+        if not low < high:
+            raise argparse.ArgumentTypeError(f"Empty range for {name.strip()!r}: {low} >= {high}")
+        thresholds[name.strip()] = (low, high)
+    return thresholds
+
+
+def parse_formats(text):
+    formats = tuple(dict.fromkeys(f.strip() for f in text.split(",") if f.strip()))
+    unknown = set(formats) - set(FORMATS)
+    if not formats or unknown:
+        raise argparse.ArgumentTypeError(f"Formats must be a comma-separated subset of {','.join(FORMATS)}")
+    return formats
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Detect, measure and classify cracks in an inspection image.")
+    parser.add_argument("input", help="Image to analyse (.jpg, .png, .webp, .tif, .npy, ...)")
+    parser.add_argument("output", help="Output folder")
+    parser.add_argument("--gsd", type=float, default=None, help="Ground sample distance in mm/pixel (default: 0.5)")
+    parser.add_argument("--thresholds", type=parse_thresholds, default=None,
+                        help="Width classes in mm, e.g. 'Hairline=0:0.3,Fine=0.3:1,Medium=1:3,Wide=3:100'")
+    parser.add_argument("--formats", type=parse_formats, default=FORMATS,
+                        help="Outputs to write: any of image,csv,pdf (default: all)")
+    parser.add_argument("--pdf-mode", choices=("auto", "pages", "summary"), default="auto",
+                        help="Per-crack PDF pages, a per-class summary, or auto by crack count")
+    parser.add_argument("--tiled", action="store_true", help="Tiled, out-of-core mode for large orthomosaics")
+    parser.add_argument("--tile-size", type=int, default=None, help="Tile size in pixels for --tiled")
+    parser.add_argument("--pyramid", action="store_true",
+                        help="Coarse downscaled pass first; full-resolution detection only where it finds edges")
+    parser.add_argument("--cache", default=None, help="Folder for cached crack geometry (see cache.py)")
+    parser.add_argument("--profile", choices=("cprofile", "tracemalloc", "all"), default=None,
+                        help="Also capture a cProfile dump and/or tracemalloc allocation sites")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    import app
+
+    if args.gsd is not None:
+        app.GSD = args.gsd
+    if args.thresholds is not None:
+        app.CLASS_THRESHOLDS = args.thresholds
+    cache = None
+    if args.cache:
+        from cache import CrackCache
+        cache = CrackCache(args.cache)
+
+    paths = app.analyze_cracks(args.input, args.output, tiled=args.tiled, tile_size=args.tile_size or app.TILE_SIZE,
+                               pdf_mode=args.pdf_mode, cache=cache, profile_capture=args.profile,
+                               formats=args.formats, pyramid=args.pyramid)
+    for path in paths:
+        if path:
+            print(path)
+    return paths
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Crack growth between two inspection epochs of the same element.
+
+1. The later image is registered onto the earlier one with ORB features and a
+   RANSAC homography (estimated on downscaled copies, then scaled back up).
+2. Every skeleton pixel of the later cracks is mapped into the earlier image and
+   paired with the earlier skeleton pixels within the match tolerance through a
+   uniform grid (cell = tolerance), so matching is linear in the number of
+   skeleton pixels rather than quadratic in the number of cracks.
+3. Two cracks match when enough of their skeletons overlap. A crack can match
+   several cracks of the other epoch (cracks that joined up or split); growth is
+   then measured against all of them together.
+
+Each epoch is measured in its own pixels with its own GSD, so a change of
+camera distance does not show up as growth.
+
+Usage:
+    python compare.py inspections/2024-05/pier3.jpg inspections/2024-11/pier3.jpg output
+"""
+import argparse
+import csv
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import app
+from measure import measure_cracks
+
+REGISTER_MAX_SIDE = 2000  # px, images are downscaled to this for feature matching
+ORB_FEATURES = 10000
+RATIO_TEST = 0.75
+MIN_INLIERS = 12
+RANSAC_THRESHOLD = 3.0  # px in the downscaled images
+MATCH_TOLERANCE = 10.0  # px in the earlier image, max distance between matched skeleton pixels
+MIN_OVERLAP = 0.5  # share of the shorter skeleton that must lie on the other crack
+QUERY_CHUNK = 50000  # skeleton pixels matched per batch, bounds the candidate-pair buffer
+
+COLUMNS = ["ID (after)", "IDs (before)", "Status", "Length before (mm)", "Length after (mm)",
+           "Length growth (mm)", "Max Width before (mm)", "Max Width after (mm)", "Width growth (mm)",
+           "X", "Y"]
+
+
+def load_epoch(image_path):
+    """Read an image and measure its cracks; returns ``(gray, records, skeleton points)``."""
+    img = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+    if img is None:
+        raise FileNotFoundError(f"Could not read image: {image_path}")
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    records, points = measure_cracks(app.detect_edges(gray), app.MIN_CRACK_AREA, app.MAX_CRACK_WIDTH,
+                                     app.WIDTH_OFFSET, skeleton_points=True)
+    return gray, records, points
+
+
+def _downscale(gray):
+    scale = min(1.0, REGISTER_MAX_SIDE / max(gray.shape))
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+
+def register(gray_before, gray_after):
+    """Homography mapping pixel coordinates of ``gray_after`` onto ``gray_before``."""
+    small_before, scale_before = _downscale(gray_before)
+    small_after, scale_after = _downscale(gray_after)
+    orb = cv2.ORB_create(ORB_FEATURES)
+    kp_before, des_before = orb.detectAndCompute(small_before, None)
+    kp_after, des_after = orb.detectAndCompute(small_after, None)
+    if des_before is None or des_after is None:
+        raise ValueError("No features found to register the two epochs")
+
+    matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+    good = [m for m, *rest in matcher.knnMatch(des_after, des_before, k=2)
+            if len(rest) == 1 and m.distance < RATIO_TEST * rest[0].distance]
+    if len(good) < MIN_INLIERS:
+        raise ValueError(f"Only {len(good)} feature matches, cannot register the two epochs")
+    src = np.float32([kp_after[m.queryIdx].pt for m in good])
+    dst = np.float32([kp_before[m.trainIdx].pt for m in good])
+    homography, inliers = cv2.findHomography(src, dst, cv2.RANSAC, RANSAC_THRESHOLD)
+    if homography is None or inliers.sum() < MIN_INLIERS:
+        raise ValueError("Could not find a consistent homography between the two epochs")
+
+    # Full-resolution mapping: upscale(before) . H . downscale(after)
+    return np.diag([1 / scale_before, 1 / scale_before, 1]) @ homography @ np.diag([scale_after, scale_after, 1])
+
+
+def _grid_keys(cells):
+    return (cells[:, 0] << 32) + (cells[:, 1] + (1 << 31))
+
+
+def pairs_within(ref_xy, query_xy, radius):
+    """Yield ``(query_index, ref_index)`` arrays of all point pairs at most ``radius`` apart.
+
+    The reference points are bucketed into a grid of ``radius``-sized cells
+    sorted by cell key; each query only looks at its own and the 8 adjacent cells.
+    Queries are visited in cell order too, which keeps the binary searches cache
+    friendly.
+    """
+    if not len(ref_xy) or not len(query_xy):
+        return
+    ref_keys = _grid_keys(np.floor(ref_xy / radius).astype(np.int64))
+    order = np.argsort(ref_keys, kind='stable')
+    cell_keys, cell_start, cell_count = np.unique(ref_keys[order], return_index=True, return_counts=True)
+    query_cells = np.floor(query_xy / radius).astype(np.int64)
+    query_order = np.argsort(_grid_keys(query_cells), kind='stable')
+    offsets = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)], np.int64)
+
+    for start in range(0, len(query_xy), QUERY_CHUNK):
+        index = query_order[start:start + QUERY_CHUNK]
+        query, cells = query_xy[index], query_cells[index]
+        for offset in offsets:
+            keys = _grid_keys(cells + offset)
+            cell = np.minimum(np.searchsorted(cell_keys, keys), len(cell_keys) - 1)
+            counts = np.where(cell_keys[cell] == keys, cell_count[cell], 0)
+            # Expand each query's run of reference points into explicit candidate pairs
+            q = np.repeat(np.arange(len(query)), counts)
+            within = np.arange(len(q)) - np.repeat(np.cumsum(counts) - counts, counts)
+            r = order[np.repeat(cell_start[cell], counts) + within]
+            close = ((query[q] - ref_xy[r]) ** 2).sum(axis=1) <= radius * radius
+            yield index[q[close]], r[close]
+
+
+def _crack_points(records, points):
+    """Skeleton pixels as ``(crack, xy)``; cracks whose skeleton thinned away keep their first pixel."""
+    crack = points['crack']
+    xy = np.stack([points['x'], points['y']], axis=1)
+    empty = np.flatnonzero(np.bincount(crack, minlength=len(records['length'])) == 0)
+    crack = np.concatenate([crack, empty])
+    xy = np.concatenate([xy, np.stack([records['start_x'][empty], records['start_y'][empty]], axis=1)])
+    return crack, xy.astype(np.float64)
+
+
+def match_cracks(before, points_before, after, points_after, homography, tolerance=MATCH_TOLERANCE):
+    """Pairs ``(after_index, before_index)`` of cracks whose skeletons overlap after registration."""
+    n_before, n_after = len(before['length']), len(after['length'])
+    crack_before, before_xy = _crack_points(before, points_before)
+    crack_after, after_xy = _crack_points(after, points_after)
+    if len(after_xy):
+        after_xy = cv2.perspectiveTransform(after_xy[None], homography)[0]
+
+    # Each after-skeleton pixel votes once for every earlier crack within tolerance;
+    # (pixel, crack) pairs are packed into one int64 so duplicates drop with a 1-D unique
+    votes = [np.unique(q * n_before + crack_before[r]) for q, r in pairs_within(before_xy, after_xy, tolerance)]
+    votes = np.unique(np.concatenate(votes)) if votes else np.zeros(0, np.int64)
+    pairs, count = np.unique(crack_after[votes // n_before] * n_before + votes % n_before, return_counts=True)
+    pairs = np.stack([pairs // n_before, pairs % n_before], axis=1)
+    size_after = np.bincount(crack_after, minlength=n_after)
+    size_before = np.bincount(crack_before, minlength=n_before)
+    shorter = np.minimum(size_after[pairs[:, 0]], size_before[pairs[:, 1]])
+    return pairs[count >= MIN_OVERLAP * shorter]
+
+
+def compare_epochs(before_path, after_path, output_folder, gsd_before=None, gsd_after=None):
+    """Register two epochs, match their cracks and write ``crack_growth.csv``.
+
+    Returns the CSV path. Cracks only found after are ``New``; cracks only found
+    before are ``Not found`` (repaired, or hidden by debris or lighting).
+    """
+    gsd_before = app.GSD if gsd_before is None else gsd_before
+    gsd_after = app.GSD if gsd_after is None else gsd_after
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    gray_before, before, points_before = load_epoch(before_path)
+    gray_after, after, points_after = load_epoch(after_path)
+    homography = register(gray_before, gray_after)
+    n_before, n_after = len(before['length']), len(after['length'])
+    pairs = match_cracks(before, points_before, after, points_after, homography)
+
+    length_before, width_before = before['length'] * gsd_before, before['max_width'] * gsd_before
+    length_after, width_after = after['length'] * gsd_after, after['max_width'] * gsd_after
+    # Joined or split cracks: compare total length and the widest of the matched cracks
+    matched_length = np.bincount(pairs[:, 0], weights=length_before[pairs[:, 1]], minlength=n_after)
+    matched_width = np.zeros(n_after)
+    np.maximum.at(matched_width, pairs[:, 0], width_before[pairs[:, 1]])
+    has_match = np.bincount(pairs[:, 0], minlength=n_after) > 0
+    matched_ids = [[] for _ in range(n_after)]
+    for a, b in pairs.tolist():
+        matched_ids[a].append(str(b + 1))
+
+    csv_path = output_folder / "crack_growth.csv"
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(COLUMNS)
+        for i in range(n_after):
+            if has_match[i]:
+                writer.writerow([i + 1, ";".join(matched_ids[i]), "Matched",
+                                 round(matched_length[i], 2), round(length_after[i], 2),
+                                 round(length_after[i] - matched_length[i], 2),
+                                 round(matched_width[i], 2), round(width_after[i], 2),
+                                 round(width_after[i] - matched_width[i], 2),
+                                 int(after['x'][i]), int(after['y'][i])])
+            else:
+                writer.writerow([i + 1, "", "New", "", round(length_after[i], 2), round(length_after[i], 2),
+                                 "", round(width_after[i], 2), round(width_after[i], 2),
+                                 int(after['x'][i]), int(after['y'][i])])
+        lost = np.ones(n_before, bool)
+        lost[pairs[:, 1]] = False
+        for j in np.flatnonzero(lost).tolist():
+            writer.writerow(["", j + 1, "Not found", round(length_before[j], 2), "", "",
+                             round(width_before[j], 2), "", "", int(before['x'][j]), int(before['y'][j])])
+
+    print(f"{n_after} cracks after: {int(has_match.sum())} matched, {n_after - int(has_match.sum())} new; "
+          f"{int(lost.sum())} of {n_before} earlier cracks not found -> {csv_path}")
+    return str(csv_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crack growth between two inspection epochs.")
+    parser.add_argument("before", help="Earlier image")
+    parser.add_argument("after", help="Later image of the same element")
+    parser.add_argument("output", help="Output folder for crack_growth.csv")
+    parser.add_argument("--gsd-before", type=float, default=None, help="mm/pixel of the earlier image")
+    parser.add_argument("--gsd-after", type=float, default=None, help="mm/pixel of the later image")
+    args = parser.parse_args()
+    compare_epochs(args.before, args.after, args.output, args.gsd_before, args.gsd_after)
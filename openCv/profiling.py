@@ -0,0 +1,105 @@
+"""Per-stage timing and allocation tracking for the crack pipeline.
+
+Wrap each stage in ``with profiler.stage(name):``. Every stage records wall
+time, CPU time (of the whole process, so OpenCV's worker threads count) and the
+peak bytes allocated through Python/NumPy while it ran, via ``tracemalloc``
+(NumPy and OpenCV's returned arrays are traced; OpenCV's internal scratch
+buffers are not). Repeated stages, e.g. one per tile, accumulate.
+
+``capture`` adds heavier, opt-in diagnostics for a single run:
+
+* ``"cprofile"``: a ``cProfile`` dump of the whole run (open with ``pstats`` or snakeviz);
+* ``"tracemalloc"``: the top allocation sites still live after each stage;
+* ``"all"``: both.
+"""
+import cProfile
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+CAPTURE_MODES = (None, "cprofile", "tracemalloc", "all")
+TOP_ALLOCATIONS = 10
+
+
+class StageProfiler:
+    """Collect per-stage measurements for one run; use as a context manager around the run."""
+
+    def __init__(self, capture=None):
+        if capture not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture mode: {capture}")
+        self.capture = capture
+        self.stages = {}
+        self.allocations = {}
+        self._profile = cProfile.Profile() if capture in ("cprofile", "all") else None
+        self._owns_tracemalloc = False
+        self.peak_bytes = 0
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._start = (time.perf_counter(), time.process_time())
+        if self._profile is not None:
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self._profile is not None:
+            self._profile.disable()
+        self.wall_s = time.perf_counter() - self._start[0]
+        self.cpu_s = time.process_time() - self._start[1]
+        self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name):
+        self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak_bytes = max(self.peak_bytes, peak)
+            allocated = peak - base
+            record = self.stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "allocated_bytes": 0, "calls": 0})
+            record["wall_s"] += wall
+            record["cpu_s"] += cpu
+            record["allocated_bytes"] = max(record["allocated_bytes"], allocated)
+            record["calls"] += 1
+            if self.capture in ("tracemalloc", "all"):
+                top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+                self.allocations[name] = [{"site": str(stat.traceback[0]), "bytes": stat.size, "count": stat.count}
+                                          for stat in top]
+
+    def write(self, path, **info):
+        """Write the measurements (plus ``info``) as JSON; the cProfile dump goes to ``<path>.prof``."""
+        path = Path(path)
+        result = {
+            **info,
+            "total": {"wall_s": self.wall_s, "cpu_s": self.cpu_s, "peak_traced_bytes": self.peak_bytes},
+            "stages": [{"name": name, **record} for name, record in self.stages.items()],
+        }
+        if self._profile is not None:
+            prof_path = path.with_suffix(".prof")
+            self._profile.dump_stats(prof_path)
+            result["cprofile"] = prof_path.name
+        if self.allocations:
+            result["live_allocations_after_stage"] = self.allocations
+        path.write_text(json.dumps(result, indent=2))
+        return str(path)
+
+
+class NullProfiler:
+    """Stand-in for callers that do not profile."""
+
+    def stage(self, name):
+        return nullcontext()
+
+
+NULL_PROFILER = NullProfiler()
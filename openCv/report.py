@@ -0,0 +1,131 @@
+"""Streaming CSV/PDF crack reports.
+
+Rows go from the measurement arrays straight into the CSV and PDF in chunks;
+no DataFrame or per-crack dicts are built. The PDF is written one page at a
+time, either listing every crack (``"pages"``) or, for very large detection
+counts, only a per-class summary (``"summary"``).
+"""
+import csv
+
+import numpy as np
+
+CSV_COLUMNS = ["ID", "Length (mm)", "Max Width (mm)", "Mean Width (mm)", "Classification", "X", "Y"]
+CHUNK_SIZE = 10000  # rows formatted per write
+PDF_DETAIL_LIMIT = 5000  # "auto" mode switches to a summary-only PDF above this many cracks
+LINE_HEIGHT = 15
+PAGE_TOP, PAGE_BOTTOM = 800, 100
+
+
+class CrackReportWriter:
+    """Write ``crack_report.csv`` and ``crack_report.pdf`` incrementally.
+
+    Feed chunks of cracks with ``write()``; totals and per-class statistics are
+    kept as running sums and drawn when the writer is closed. ``pdf_mode`` is
+    ``"pages"``, ``"summary"`` or ``"auto"`` (summary when ``total`` exceeds
+    ``PDF_DETAIL_LIMIT``). Either path may be ``None`` to skip that file;
+    reportlab is only imported when a PDF is written. Use as a context manager.
+    """
+
+    def __init__(self, csv_path, pdf_path, image_name, gsd, class_names, total=None, pdf_mode="auto"):
+        if pdf_mode == "auto":
+            pdf_mode = "summary" if total is not None and total > PDF_DETAIL_LIMIT else "pages"
+        if pdf_mode not in ("pages", "summary"):
+            raise ValueError(f"Unknown pdf_mode: {pdf_mode}")
+        self.pdf_mode = pdf_mode
+        self.count = 0
+        self.stats = {name: [0, 0.0, 0.0] for name in class_names}  # count, total length, max width
+
+        self._csv_file = self._csv = self._pdf = self._text = None
+        self._total_drawn = False
+        if csv_path is not None:
+            self._csv_file = open(csv_path, "w", newline="")
+            self._csv = csv.writer(self._csv_file, lineterminator="\n")
+            self._csv.writerow(CSV_COLUMNS)
+
+        if pdf_path is not None:
+            from reportlab.lib.pagesizes import A4
+            from reportlab.pdfgen import canvas
+
+            self._pdf = canvas.Canvas(str(pdf_path), pagesize=A4)
+            self._pdf.setFont("Helvetica", 12)
+            self._pdf.drawString(50, 800, "Crack Detection Report")
+            self._pdf.drawString(50, 785, f"Image: {image_name}")
+            self._pdf.drawString(50, 770, f"GSD: {gsd} mm/pixel")
+            if total is not None:
+                self._pdf.drawString(50, 755, f"Total Cracks: {total}")
+                self._total_drawn = True
+            self._y = 730
+
+    def write(self, length_mm, max_width_mm, mean_width_mm, classifications, x, y):
+        """Append one chunk of cracks (equal-length arrays; ``classifications`` may be a list)."""
+        classifications = np.asarray(classifications, dtype=object)
+        length_mm = np.round(length_mm, 2)
+        max_width_mm = np.round(max_width_mm, 2)
+        mean_width_mm = np.round(mean_width_mm, 2)
+
+        for name, (count, total_length, max_width) in self.stats.items():
+            hit = classifications == name
+            if hit.any():
+                self.stats[name] = [count + int(hit.sum()), total_length + float(length_mm[hit].sum()),
+                                    max(max_width, float(max_width_mm[hit].max()))]
+
+        for start in range(0, len(classifications), CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            ids = range(self.count + start + 1, self.count + start + 1 + len(classifications[chunk]))
+            rows = zip(ids, length_mm[chunk].tolist(), max_width_mm[chunk].tolist(),
+                       mean_width_mm[chunk].tolist(), classifications[chunk].tolist(),
+                       np.asarray(x[chunk]).tolist(), np.asarray(y[chunk]).tolist())
+            if self._pdf is None or self.pdf_mode == "summary":
+                if self._csv is not None:
+                    self._csv.writerows(rows)
+                continue
+            rows = list(rows)
+            if self._csv is not None:
+                self._csv.writerows(rows)
+            for crack_id, length, width, mean_width, classification, _, _ in rows:
+                self._line(f"ID: {crack_id} | Length: {length} mm | Width: {width} mm (mean {mean_width} mm)"
+                           f" | Class: {classification}")
+        self.count += len(classifications)
+
+    def _line(self, text):
+        # One text object per page: far fewer PDF operators than a drawString per line
+        if self._y < PAGE_BOTTOM:
+            self._end_page()
+            self._pdf.showPage()
+            self._pdf.setFont("Helvetica", 12)
+            self._y = PAGE_TOP
+        if self._text is None:
+            self._text = self._pdf.beginText(50, self._y)
+            self._text.setLeading(LINE_HEIGHT)
+        self._text.textLine(text)
+        self._y -= LINE_HEIGHT
+
+    def _end_page(self):
+        if self._text is not None:
+            self._pdf.drawText(self._text)
+            self._text = None
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+        if self._pdf is None:
+            return
+        if self.pdf_mode == "summary":
+            if not self._total_drawn:
+                self._line(f"Total Cracks: {self.count}")
+            if self._csv is not None:
+                self._line("Per-crack details are in the CSV report.")
+            if not self._total_drawn or self._csv is not None:
+                self._line("")
+            for name, (count, total_length, max_width) in self.stats.items():
+                if count:
+                    self._line(f"{name}: {count} cracks | Total length: {total_length:.2f} mm"
+                               f" | Max width: {max_width:.2f} mm")
+        self._end_page()
+        self._pdf.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
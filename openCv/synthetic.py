@@ -0,0 +1,119 @@
+"""Synthetic concrete images with known cracks, for benchmarks and accuracy checks.
+
+The surface is a smooth shading pattern plus per-pixel grain. Each crack is a
+random-walk polyline of constant width drawn in its own grid cell, so cracks
+never touch and every detection can be traced back to one ground-truth crack.
+Images are generated in horizontal bands, and large ones can be written straight
+into a memory-mapped ``.npy`` file, so 400 MP images need no more than a band of
+RAM.
+
+Usage:
+    python synthetic.py 16 synthetic_16mp.png      # 16 MP image + synthetic_16mp.json
+"""
+import argparse
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+CELL_SIZE = 256  # px, one crack per cell
+WIDTH_RANGE = (3, 12)  # px, crack widths (inclusive)
+STEP_RANGE = (8, 16)  # px, random-walk segment length
+MAX_TURN = 0.3  # rad per segment
+BAND_ROWS = 1024
+SURFACE_GRAY = 140
+CRACK_COLOR = (58, 60, 64)  # BGR
+
+
+def image_size(megapixels, aspect=4 / 3):
+    """``(width, height)`` of an image of about ``megapixels`` MP."""
+    height = int(round(np.sqrt(megapixels * 1e6 / aspect)))
+    return int(round(height * aspect)), height
+
+
+def crack_polylines(width, height, seed=0, cell=CELL_SIZE):
+    """Ground truth: one dict per crack with ``points`` (int px), ``width`` and ``length`` (px)."""
+    rng = np.random.default_rng(seed)
+    cracks = []
+    margin = WIDTH_RANGE[1] + 4
+    for cy in range(0, height - cell + 1, cell):
+        for cx in range(0, width - cell + 1, cell):
+            lo_x, hi_x, lo_y, hi_y = cx + margin, cx + cell - margin, cy + margin, cy + cell - margin
+            x, y = rng.uniform(lo_x, hi_x), rng.uniform(lo_y, hi_y)
+            heading = rng.uniform(0, 2 * np.pi)
+            target = rng.uniform(0.4, 1.2) * cell
+            points, length = [(round(x), round(y))], 0.0
+            while length < target:
+                step = rng.uniform(*STEP_RANGE)
+                heading += rng.uniform(-MAX_TURN, MAX_TURN)
+                nx, ny = round(x + step * np.cos(heading)), round(y + step * np.sin(heading))
+                if not (lo_x <= nx < hi_x and lo_y <= ny < hi_y):
+                    break
+                length += np.hypot(nx - points[-1][0], ny - points[-1][1])
+                x, y = nx, ny
+                points.append((nx, ny))
+            if len(points) < 3:
+                continue
+            cracks.append({"points": points, "width": int(rng.integers(WIDTH_RANGE[0], WIDTH_RANGE[1] + 1)),
+                           "length": length, "cell": [cx // cell, cy // cell]})
+    return cracks
+
+
+def render_band(width, y0, y1, cracks, seed=0):
+    """BGR pixels of rows ``y0:y1``; bands rendered separately tile the full image exactly."""
+    rng = np.random.default_rng([seed, y0])
+    xs = np.arange(width, dtype=np.float32)
+    ys = np.arange(y0, y1, dtype=np.float32)
+    shade = SURFACE_GRAY + 10 * np.sin(xs / 97)[None, :] * np.cos(ys / 131)[:, None]
+    shade += rng.normal(0, 5, shade.shape).astype(np.float32)
+    gray = np.clip(shade, 0, 255).astype(np.uint8)
+    band = cv2.merge([gray, gray, cv2.add(gray, 6)])
+
+    for crack in cracks:
+        points = np.asarray(crack["points"], np.int32)
+        pad = crack["width"]
+        if points[:, 1].max() + pad < y0 or points[:, 1].min() - pad >= y1:
+            continue
+        cv2.polylines(band, [points - (0, y0)], False, CRACK_COLOR, crack["width"])
+    return band
+
+
+def generate(megapixels, path=None, seed=0):
+    """Generate a synthetic image of about ``megapixels`` MP.
+
+    Without ``path`` the image is returned in memory. With a ``.npy`` path it is
+    written band by band into a memmap; any other extension is encoded with
+    ``cv2.imwrite``. A ``<path>.json`` ground-truth file is written next to it.
+    Returns ``(image or path, cracks)``.
+    """
+    width, height = image_size(megapixels)
+    cracks = crack_polylines(width, height, seed)
+    if path is not None and str(path).lower().endswith(".npy"):
+        image = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(height, width, 3))
+    else:
+        image = np.empty((height, width, 3), np.uint8)
+    for y0 in range(0, height, BAND_ROWS):
+        y1 = min(y0 + BAND_ROWS, height)
+        image[y0:y1] = render_band(width, y0, y1, cracks, seed)
+
+    if path is None:
+        return image, cracks
+    if isinstance(image, np.memmap):
+        image.flush()
+    elif not cv2.imwrite(str(path), image):
+        raise ValueError(f"Could not write image: {path}")
+    del image
+    Path(path).with_suffix(".json").write_text(json.dumps({"width": width, "height": height, "cell": CELL_SIZE,
+                                                           "cracks": cracks}))
+    return str(path), cracks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic cracked-concrete image with ground truth.")
+    parser.add_argument("megapixels", type=float, help="Image size in MP, e.g. 1, 16 or 400")
+    parser.add_argument("output", help="Output image (.png, .jpg, ... or .npy for out-of-core sizes)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    _, cracks = generate(args.megapixels, args.output, args.seed)
+    print(f"{args.output}: {len(cracks)} cracks")
@@ -0,0 +1,439 @@
+"""Tiled, out-of-core crack detection for images too large to process in one piece.
+
+The single-shot chain is ``GaussianBlur -> Canny -> dilate -> measure``. Every
+step except Canny's hysteresis and the final crack grouping only looks at a
+few pixels of neighbourhood, so the image is walked in square tiles read with a
+small ``overlap`` of context:
+
+1. Per tile, blur and run ``Canny(low, low)`` / ``Canny(high, high)``. These give
+   the non-maximum-suppressed candidate pixels and the strong pixels; Canny's
+   result is exactly the candidate components that contain a strong pixel.
+   The classes are written to a disk-backed scratch raster.
+2. Candidate components that cross tile seams are linked with a union-find over
+   the core edge rows/columns, so hysteresis is resolved globally. The scratch
+   raster is rewritten with the final edge map.
+3. Per tile, the edge map is dilated and its background is labelled. Whether a
+   background region is a narrow gap between crack edges (see
+   ``measure.fill_holes``) is also a global property, so regions are linked
+   across seams the same way and the filled crack body is written back.
+4. Per tile, cracks are measured from the filled body. Cracks inside a tile core
+   are kept as they are; cracks touching a seam are linked and measured once
+   from a window covering their bounding box.
+
+The result is identical to the single-shot path. Working memory depends on the
+tile size (and on the largest seam-crossing crack), not on the image size, as
+long as the raster source supports windowed reads.
+"""
+import os
+
+import cv2
+import numpy as np
+
+from measure import concat_records, select_records
+from profiling import NULL_PROFILER
+
+
+# === RASTER SOURCES ===
+
+class ArraySource:
+    """Windows over an in-memory or memory-mapped ``(H, W[, 3])`` uint8 array."""
+
+    def __init__(self, array):
+        self.array = array
+        self.height, self.width = array.shape[:2]
+
+    def read(self, x, y, w, h):
+        window = self.array[y:y + h, x:x + w]
+        if window.ndim == 2:
+            return cv2.cvtColor(np.ascontiguousarray(window), cv2.COLOR_GRAY2BGR)
+        return np.ascontiguousarray(window)
+
+    def close(self):
+        pass
+
+
+class RasterioSource:
+    """Windowed reads from a (Geo)TIFF through rasterio, returned as BGR."""
+
+    def __init__(self, path):
+        import rasterio
+
+        self.dataset = rasterio.open(path)
+        self.width, self.height = self.dataset.width, self.dataset.height
+        if self.dataset.dtypes[0] != 'uint8':
+            raise ValueError(f"Only 8-bit rasters are supported, got {self.dataset.dtypes[0]}")
+        # Band order is RGB(A); read it back to front so the result is BGR like cv2.imread
+        self.indexes = [3, 2, 1] if self.dataset.count >= 3 else [1]
+
+    def read(self, x, y, w, h):
+        from rasterio.windows import Window
+
+        bands = self.dataset.read(self.indexes, window=Window(x, y, w, h))
+        window = np.ascontiguousarray(np.moveaxis(bands, 0, -1))
+        if window.shape[2] == 1:
+            return cv2.cvtColor(window, cv2.COLOR_GRAY2BGR)
+        return window
+
+    def close(self):
+        self.dataset.close()
+
+
+def open_raster(image_path):
+    """Open an image for windowed reads.
+
+    ``.npy`` files are memory-mapped and TIFFs go through rasterio when it is
+    installed; both are truly out-of-core. Anything else falls back to a full
+    ``cv2.imread`` decode, after which only the tile-sized working buffers are
+    bounded.
+    """
+    path = str(image_path)
+    suffix = path.lower().rsplit('.', 1)[-1]
+    if suffix == 'npy':
+        return ArraySource(np.load(path, mmap_mode='r'))
+    if suffix in ('tif', 'tiff'):
+        try:
+            return RasterioSource(path)
+        except ImportError:  # windowed GeoTIFF reads are optional
+            pass
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise FileNotFoundError(f"Could not read image: {path}")
+    return ArraySource(img)
+
+
+# === SEAM LINKING ===
+
+def _link_strips(parent, a, b, shifts):
+    """Union the components on two facing seam strips."""
+    pairs = []
+    for shift in shifts:
+        if shift < 0:
+            left, right = a[1:], b[:-1]
+        elif shift > 0:
+            left, right = a[:-1], b[1:]
+        else:
+            left, right = a, b
+        hit = (left >= 0) & (right >= 0)
+        if hit.any():
+            pairs.append(np.stack([left[hit], right[hit]], axis=1))
+    if not pairs:
+        return
+    pairs = np.concatenate(pairs)
+    # Strips are mostly runs of one label: drop repeated neighbours before the (row-sorting) unique
+    changed = np.ones(len(pairs), bool)
+    changed[1:] = (pairs[1:] != pairs[:-1]).any(axis=1)
+    pairs = np.unique(pairs[changed], axis=0)
+    for p, q in pairs.tolist():
+        root_p, root_q = _find(parent, p), _find(parent, q)
+        if root_p != root_q:
+            parent[root_q] = root_p
+
+
+def _find(parent, key):
+    root = key
+    while parent[root] != root:
+        root = parent[root]
+    while parent[key] != root:
+        parent[key], key = root, parent[key]
+    return root
+
+
+class _SeamLinker:
+    """Union-find over labelled components that touch tile seams.
+
+    Tiles must be added in row-major order. Components are keyed globally as
+    ``tile_id << 32 | label``; only the core edge strips are kept between tiles.
+    """
+
+    def __init__(self, width, height, connectivity=8):
+        self.width, self.height = width, height
+        self.shifts = (-1, 0, 1) if connectivity == 8 else (0,)
+        self.parent = {}
+        self._top = self._bottom = self._prev_bottom = self._prev_right = None
+
+    def add(self, tile_id, labels, tx, ty):
+        """Register a tile's labels; returns ``{label: (key, seed_x, seed_y)}`` for seam labels."""
+        h, w = labels.shape
+        x1, y1 = tx + w, ty + h
+        if tx == 0:
+            self._end_row()
+            self._top = np.full(self.width, -1, np.int64)
+            self._bottom = np.full(self.width, -1, np.int64)
+            self._prev_right = None
+
+        offset = tile_id << 32
+        keyed = lambda strip: np.where(strip > 0, offset + strip.astype(np.int64), -1)
+        seam = {}
+        edges = (
+            (tx > 0, labels[:, 0], lambda i: (tx, ty + i)),
+            (ty > 0, labels[0], lambda i: (tx + i, ty)),
+            (x1 < self.width, labels[:, -1], lambda i: (x1 - 1, ty + i)),
+            (y1 < self.height, labels[-1], lambda i: (tx + i, y1 - 1)),
+        )
+        for is_seam, strip, to_global in edges:
+            if not is_seam or not strip.any():
+                continue
+            values, first = np.unique(strip, return_index=True)
+            for label, i in zip(values.tolist(), first.tolist()):
+                if label and label not in seam:
+                    seam[label] = (offset + label, *to_global(i))
+                    self.parent[offset + label] = offset + label
+
+        self._top[tx:x1], self._bottom[tx:x1] = keyed(labels[0]), keyed(labels[-1])
+        left = keyed(labels[:, 0])
+        if self._prev_right is not None:
+            _link_strips(self.parent, self._prev_right, left, self.shifts)
+        self._prev_right = keyed(labels[:, -1])
+        return seam
+
+    def _end_row(self):
+        if self._top is None:
+            return
+        if self._prev_bottom is not None:
+            _link_strips(self.parent, self._prev_bottom, self._top, self.shifts)
+        self._prev_bottom = self._bottom
+        self._top = None
+
+    def finish(self):
+        self._end_row()
+
+    def find(self, key):
+        return _find(self.parent, key)
+
+    def roots(self, keys):
+        return {self.find(key) for key in keys}
+
+
+# === TILED EXTRACTION ===
+
+def iter_tiles(width, height, tile_size):
+    """Yield ``(tile_id, x0, y0, x1, y1)`` tile cores in row-major order."""
+    tile_id = 0
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            yield tile_id, x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height)
+            tile_id += 1
+
+
+def copy_raster(source, canvas, tile_size):
+    """Copy ``source`` into an ``(H, W, 3)`` array (typically a memmap) tile by tile."""
+    for _, x0, y0, x1, y1 in iter_tiles(source.width, source.height, tile_size):
+        canvas[y0:y1, x0:x1] = source.read(x0, y0, x1 - x0, y1 - y0)
+
+
+def coarse_active_tiles(source, tile_size, factor, blur_ksize, canny_thresholds, margin):
+    """Flag the tiles worth running full-resolution detection on.
+
+    Each tile plus ``margin`` px is downscaled by ``factor`` (area averaging)
+    and run through a cheap blur + Canny; a tile is active when any edge pixel
+    shows up. Returns booleans indexed by tile id.
+    """
+    active = []
+    for _, x0, y0, x1, y1 in iter_tiles(source.width, source.height, tile_size):
+        wx0, wy0, wx1, wy1 = _window(x0, y0, x1, y1, margin, source.width, source.height)
+        gray = cv2.cvtColor(source.read(wx0, wy0, wx1 - wx0, wy1 - wy0), cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, ((wx1 - wx0 + factor - 1) // factor, (wy1 - wy0 + factor - 1) // factor),
+                           interpolation=cv2.INTER_AREA)
+        edges = cv2.Canny(cv2.GaussianBlur(small, blur_ksize, 0), *canny_thresholds)
+        active.append(bool(edges.any()))
+    return np.array(active, bool)
+
+
+def _window(x0, y0, x1, y1, margin, width, height):
+    return max(x0 - margin, 0), max(y0 - margin, 0), min(x1 + margin, width), min(y1 + margin, height)
+
+
+EDGE, BODY = 1, 2  # bit flags in the scratch raster once hysteresis is resolved
+
+
+def measure_cracks_tiled(source, scratch_path, tile_size, overlap, blur_ksize, canny_thresholds,
+                         dilate_ksize, max_width, measure, canvas=None, profiler=NULL_PROFILER, active=None):
+    """Tiled equivalent of ``measure.measure_cracks(dilate(Canny(GaussianBlur(gray))), ...)``.
+
+    ``measure(body, x0, y0)`` is ``measure.measure_cracks`` bound to its parameters
+    with ``max_width=None`` (and to ``canvas`` for outlines); it is called on each
+    tile core and on each seam-crossing crack with the already filled crack body.
+    ``max_width`` is the gap width filled in as crack body. ``scratch_path`` is a
+    temporary ``.npy`` file holding one byte per pixel; it is removed before
+    returning. ``overlap`` must cover the blur radius plus 2 px for Sobel and
+    non-maximum suppression. When ``canvas`` (an ``(H, W, 3)`` array, typically a
+    memmap) is given, the source pixels are copied into it tile by tile. Each pass
+    is reported to ``profiler`` as a ``tiled: ...`` stage.
+
+    ``active`` (booleans indexed by tile id, see ``coarse_active_tiles``) skips
+    edge detection in the other tiles, which then count as crack-free. Their
+    edge maps are all zero, so the later passes skip them too unless an edge
+    in a neighbouring tile dilates across the seam.
+
+    Returns the same records, in the same order, as the single-shot call (with
+    ``active``: as long as no crack pixels fall in skipped tiles).
+    """
+    width, height = source.width, source.height
+    canny_low, canny_high = canny_thresholds
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, dilate_ksize)
+    ring = max(dilate_ksize) // 2
+    gap_radius = (max_width + 1) / 2
+    gap_margin = int(np.ceil(gap_radius)) + 1
+    # An edge-free tile core wider than a gap is one background region with a
+    # pixel further than gap_radius from any edge, so it never needs filling
+    skip_empty = tile_size > 2 * gap_radius + 1
+    scratch = np.lib.format.open_memmap(scratch_path, mode='w+', dtype=np.uint8, shape=(height, width))
+
+    def dilated(x0, y0, x1, y1):
+        wx0, wy0, wx1, wy1 = _window(x0, y0, x1, y1, ring, width, height)
+        edges = np.asarray(scratch[wy0:wy1, wx0:wx1]) & EDGE
+        mask = cv2.dilate(edges * np.uint8(255), kernel, iterations=1)
+        return np.ascontiguousarray(mask[y0 - wy0:y1 - wy0, x0 - wx0:x1 - wx0])
+
+    def edges_around(x0, y0, x1, y1):
+        # Edges in the ring around a tile core, the only ones a skipped (edge-free) tile's dilation can see
+        wx0, wy0, wx1, wy1 = _window(x0, y0, x1, y1, ring, width, height)
+        strips = (scratch[wy0:y0, wx0:wx1], scratch[y1:wy1, wx0:wx1], scratch[y0:y1, wx0:x0], scratch[y0:y1, x1:wx1])
+        return any((np.asarray(strip) & EDGE).any() for strip in strips)
+
+    def skipped(tile_id):
+        return active is not None and not active[tile_id]
+
+    try:
+        with profiler.stage("tiled: read + canny"):
+            # Pass 1: candidate (1) / strong (2) Canny classes, linking candidates across seams
+            linker = _SeamLinker(width, height)
+            seam_labels = {}
+            strong = set()
+            for tile_id, x0, y0, x1, y1 in iter_tiles(width, height, tile_size):
+                if skipped(tile_id):
+                    if canvas is not None:
+                        canvas[y0:y1, x0:x1] = source.read(x0, y0, x1 - x0, y1 - y0)
+                    linker.add(tile_id, np.zeros((y1 - y0, x1 - x0), np.int32), x0, y0)
+                    seam_labels[tile_id] = []
+                    continue
+                wx0, wy0, wx1, wy1 = _window(x0, y0, x1, y1, overlap, width, height)
+                window = source.read(wx0, wy0, wx1 - wx0, wy1 - wy0)
+                core = np.s_[y0 - wy0:y1 - wy0, x0 - wx0:x1 - wx0]
+                if canvas is not None:
+                    canvas[y0:y1, x0:x1] = window[core]
+                blurred = cv2.GaussianBlur(cv2.cvtColor(window, cv2.COLOR_BGR2GRAY), blur_ksize, 0)
+                candidates = np.ascontiguousarray(cv2.Canny(blurred, canny_low, canny_low)[core])
+                is_strong = cv2.Canny(blurred, canny_high, canny_high)[core] > 0
+                scratch[y0:y1, x0:x1] = (candidates > 0).astype(np.uint8) + is_strong
+
+                n, labels = cv2.connectedComponents(candidates, connectivity=8)
+                has_strong = np.zeros(n, bool)
+                has_strong[labels[is_strong]] = True
+                seam = linker.add(tile_id, labels, x0, y0)
+                seam_labels[tile_id] = [(label, key) for label, (key, _, _) in seam.items()]
+                strong.update(key for label, (key, _, _) in seam.items() if has_strong[label])
+            linker.finish()
+            strong = linker.roots(strong)
+
+        with profiler.stage("tiled: hysteresis"):
+            # Pass 2: hysteresis, keeping candidate components that reach a strong pixel anywhere
+            for tile_id, x0, y0, x1, y1 in iter_tiles(width, height, tile_size):
+                if skipped(tile_id) or not scratch[y0:y1, x0:x1].any():
+                    continue
+                classes = np.asarray(scratch[y0:y1, x0:x1])
+                n, labels = cv2.connectedComponents((classes > 0).astype(np.uint8), connectivity=8)
+                keep = np.zeros(n, bool)
+                keep[labels[classes == 2]] = True
+                for label, key in seam_labels[tile_id]:
+                    keep[label] = linker.find(key) in strong
+                keep[0] = False
+                scratch[y0:y1, x0:x1] = keep[labels].astype(np.uint8) * EDGE
+
+        with profiler.stage("tiled: fill"):
+            # Pass 3: background regions of the dilated edges; a region is filled when it
+            # never reaches the image border and stays within gap_radius of an edge
+            linker = _SeamLinker(width, height, connectivity=4)
+            seam_labels, local_fill = {}, {}
+            open_or_wide = set()
+            for tile_id, x0, y0, x1, y1 in iter_tiles(width, height, tile_size):
+                # A skipped tile without edges next to it has no dilated edges either: no need to read it
+                empty = skip_empty and skipped(tile_id) and not edges_around(x0, y0, x1, y1)
+                if not empty:
+                    wx0, wy0, wx1, wy1 = _window(x0, y0, x1, y1, gap_margin, width, height)
+                    mask = dilated(wx0, wy0, wx1, wy1)
+                    core = np.s_[y0 - wy0:y1 - wy0, x0 - wx0:x1 - wx0]
+                    empty = skip_empty and not mask[core].any()
+                if empty:
+                    labels = np.ones((y1 - y0, x1 - x0), np.int32)
+                    seam = linker.add(tile_id, labels, x0, y0)
+                    seam_labels[tile_id] = [(1, key) for key, _, _ in seam.values()]
+                    open_or_wide.update(key for key, _, _ in seam.values())
+                    local_fill[tile_id] = None
+                    continue
+                dist = cv2.distanceTransform(cv2.bitwise_not(mask), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+                background = np.where(mask[core] == 0, 255, 0).astype(np.uint8)
+                n, labels = cv2.connectedComponents(background, connectivity=4)
+                fill = np.ones(n, bool)
+                fill[labels[dist[core] > gap_radius]] = False
+                for at_border, strip in ((x0 == 0, labels[:, 0]), (y0 == 0, labels[0]),
+                                         (x1 == width, labels[:, -1]), (y1 == height, labels[-1])):
+                    if at_border:
+                        fill[strip] = False
+                fill[0] = False
+                seam = linker.add(tile_id, labels, x0, y0)
+                seam_labels[tile_id] = [(label, key) for label, (key, _, _) in seam.items()]
+                open_or_wide.update(key for label, (key, _, _) in seam.items() if not fill[label])
+                local_fill[tile_id] = fill
+            linker.finish()
+            open_or_wide = linker.roots(open_or_wide)
+            edge_free = {tile_id for tile_id, fill in local_fill.items() if fill is None}
+
+            for tile_id, x0, y0, x1, y1 in iter_tiles(width, height, tile_size):
+                fill = local_fill.pop(tile_id)
+                if fill is None:
+                    continue  # edge-free, nothing to fill
+                mask = dilated(x0, y0, x1, y1)
+                background = np.where(mask == 0, 255, 0).astype(np.uint8)
+                _, labels = cv2.connectedComponents(background, connectivity=4)
+                for label, key in seam_labels[tile_id]:
+                    fill[label] = linker.find(key) not in open_or_wide
+                body = (mask > 0) | fill[labels]
+                scratch[y0:y1, x0:x1] |= body.astype(np.uint8) * BODY
+            del seam_labels, open_or_wide
+
+        def filled(x0, y0, x1, y1):
+            return np.where(np.asarray(scratch[y0:y1, x0:x1]) & BODY, 255, 0).astype(np.uint8)
+
+        with profiler.stage("tiled: measure"):
+            # Pass 4: measure, deferring cracks that touch a seam
+            parts = []
+            linker = _SeamLinker(width, height)
+            groups = {}  # key -> [x0, y0, x1, y1, seed_x, seed_y]
+            for tile_id, x0, y0, x1, y1 in iter_tiles(width, height, tile_size):
+                # Tiles without dilated edges got no crack body in the fill pass
+                body = np.zeros((y1 - y0, x1 - x0), np.uint8) if tile_id in edge_free else filled(x0, y0, x1, y1)
+                if not body.any():
+                    linker.add(tile_id, np.zeros(body.shape, np.int32), x0, y0)
+                    continue
+                n, labels, stats, _ = cv2.connectedComponentsWithStats(body, connectivity=8)
+                seam = linker.add(tile_id, labels, x0, y0)
+                for label, (key, seed_x, seed_y) in seam.items():
+                    bx, by, bw, bh, _ = stats[label]
+                    groups[key] = [x0 + bx, y0 + by, x0 + bx + bw, y0 + by + bh, seed_x, seed_y]
+                if seam:
+                    body[np.isin(labels, list(seam))] = 0
+                parts.append(measure(body, x0, y0))
+            linker.finish()
+
+            merged = {}
+            for key, box in groups.items():
+                root = linker.find(key)
+                if root not in merged:
+                    merged[root] = box
+                else:
+                    other = merged[root]
+                    other[0], other[1] = min(other[0], box[0]), min(other[1], box[1])
+                    other[2], other[3] = max(other[2], box[2]), max(other[3], box[3])
+
+            for gx0, gy0, gx1, gy1, seed_x, seed_y in merged.values():
+                _, labels = cv2.connectedComponents(filled(gx0, gy0, gx1, gy1), connectivity=8)
+                crack = np.where(labels == labels[seed_y - gy0, seed_x - gx0], 255, 0).astype(np.uint8)
+                parts.append(measure(crack, gx0, gy0))
+    finally:
+        del scratch
+        os.remove(scratch_path)
+
+    records = concat_records(parts)
+    order = np.lexsort((records['start_x'], records['start_y']))
+    return select_records(records, order)